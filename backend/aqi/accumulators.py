@@ -0,0 +1,197 @@
+import math
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+
+class Moments:
+    """
+    Count, mean, sum of squared deviations (M2), min and max for every cell of a grid.
+    Batches are folded in with Welford/Chan updates, so two Moments over the same grid (e.g. from two tiles,
+    workers or AOIs) merge exactly without keeping the values.
+    """
+
+    def __init__(self, shape: Tuple[int, ...]):
+        self.count = np.zeros(shape, dtype=np.int64)
+        self.mean = np.zeros(shape)
+        self.m2 = np.zeros(shape)
+        self.min = np.full(shape, np.inf)
+        self.max = np.full(shape, -np.inf)
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        return self.count.shape
+
+    @classmethod
+    def from_values(cls, shape: Tuple[int, ...], index: Tuple[np.ndarray, ...], values) -> "Moments":
+        """ Moments of one batch; `index` holds the cell coordinates of each value (as for np.add.at). """
+        batch = cls(shape)
+        values = np.asarray(values, dtype=float)
+        np.add.at(batch.count, index, 1)
+        np.add.at(batch.mean, index, values)
+        batch.mean = np.divide(batch.mean, batch.count, out=np.zeros(shape), where=batch.count > 0)
+        # Second pass over the batch around its own cell means keeps M2 numerically stable
+        np.add.at(batch.m2, index, (values - batch.mean[index]) ** 2)
+        np.minimum.at(batch.min, index, values)
+        np.maximum.at(batch.max, index, values)
+        return batch
+
+    def merge(self, other: "Moments") -> "Moments":
+        """ Fold `other` (same shape) into this accumulator in place. """
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        weight = other.count / np.maximum(total, 1)
+        self.mean = self.mean + delta * weight
+        self.m2 = self.m2 + other.m2 + delta ** 2 * self.count * weight
+        self.count = total
+        self.min = np.minimum(self.min, other.min)
+        self.max = np.maximum(self.max, other.max)
+        return self
+
+    def resize(self, shape: Tuple[int, ...]) -> "Moments":
+        """ Grow the grid to `shape`, keeping existing cells at their coordinates; new cells are empty. """
+        if shape == self.shape:
+            return self
+        grown = Moments(shape)
+        region = tuple(slice(0, size) for size in self.shape)
+        for name in ("count", "mean", "m2", "min", "max"):
+            getattr(grown, name)[region] = getattr(self, name)
+        return grown
+
+    def take(self, rows, axis: int = 0) -> "Moments":
+        taken = Moments(self.shape)
+        for name in ("count", "mean", "m2", "min", "max"):
+            setattr(taken, name, np.take(getattr(self, name), rows, axis=axis))
+        return taken
+
+    def reduce(self, axis: int = 0) -> "Moments":
+        """ Merge all cells along `axis`, e.g. every period of each pollutant. """
+        count = self.count.sum(axis=axis)
+        total = np.divide((self.count * self.mean).sum(axis=axis), count, out=np.zeros(count.shape), where=count > 0)
+        spread = (self.count * (self.mean - np.expand_dims(total, axis)) ** 2).sum(axis=axis)
+
+        reduced = Moments(count.shape)
+        reduced.count = count
+        reduced.mean = total
+        reduced.m2 = self.m2.sum(axis=axis) + spread
+        # initial= keeps an empty axis (no periods at all) valid: the result is simply empty cells
+        reduced.min = self.min.min(axis=axis, initial=np.inf)
+        reduced.max = self.max.max(axis=axis, initial=-np.inf)
+        return reduced
+
+    def variance(self, ddof: int = 0) -> np.ndarray:
+        """ Variance per cell; NaN where a cell has no more than `ddof` values. """
+        return np.divide(self.m2, self.count - ddof, out=np.full(self.shape, np.nan), where=self.count > ddof)
+
+    def std(self, ddof: int = 0) -> np.ndarray:
+        return np.sqrt(self.variance(ddof))
+
+
+class QuantileSketch:
+    """
+    Mergeable quantile sketch with relative-error guarantees (DDSketch): values fall into logarithmic buckets
+    of ratio gamma, so any quantile is returned within `relative_accuracy` of a true value at that rank.
+    Memory is bounded by `max_bins`; past that the buckets closest to zero are collapsed together.
+    Sketches merge exactly when they share the same accuracy.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01, max_bins: int = 512):
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.positive: Dict[int, int] = {}
+        self.negative: Dict[int, int] = {}
+        self.zeros = 0
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def _key(self, magnitude: float) -> int:
+        return math.ceil(math.log(magnitude) / self.log_gamma)
+
+    def _value(self, key: int) -> float:
+        # Midpoint (in relative terms) of bucket (gamma^(key-1), gamma^key]
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def add(self, value: float, count: int = 1) -> "QuantileSketch":
+        if value != value:  # NaN
+            return self
+        if value > 0:
+            key = self._key(value)
+            self.positive[key] = self.positive.get(key, 0) + count
+        elif value < 0:
+            key = self._key(-value)
+            self.negative[key] = self.negative.get(key, 0) + count
+        else:
+            self.zeros += count
+        self.count += count
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        self._collapse()
+        return self
+
+    def update(self, values: Iterable[float]) -> "QuantileSketch":
+        """ Add many values at once; bucket keys are computed in one vectorised pass. """
+        values = np.asarray(list(values) if not isinstance(values, np.ndarray) else values, dtype=float)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return self
+
+        for store, magnitudes in ((self.positive, values[values > 0]), (self.negative, -values[values < 0])):
+            if len(magnitudes):
+                keys, counts = np.unique(np.ceil(np.log(magnitudes) / self.log_gamma).astype(np.int64),
+                                         return_counts=True)
+                for key, count in zip(keys.tolist(), counts.tolist()):
+                    store[key] = store.get(key, 0) + count
+
+        self.zeros += int((values == 0).sum())
+        self.count += len(values)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self._collapse()
+        return self
+
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        if other.gamma != self.gamma:
+            raise ValueError("Only sketches with the same relative accuracy can be merged")
+        for store, incoming in ((self.positive, other.positive), (self.negative, other.negative)):
+            for key, count in incoming.items():
+                store[key] = store.get(key, 0) + count
+        self.zeros += other.zeros
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._collapse()
+        return self
+
+    def _collapse(self):
+        for store in (self.positive, self.negative):
+            excess = len(store) - self.max_bins // 2
+            if excess > 0:
+                keys = sorted(store)
+                merged = sum(store.pop(key) for key in keys[:excess])
+                store[keys[excess]] += merged
+
+    def quantile(self, q: float) -> Optional[float]:
+        """ Approximate q-quantile (0 <= q <= 1); None for an empty sketch. """
+        if not 0 <= q <= 1:
+            raise ValueError(f"Quantile must be between 0 and 1, got {q}")
+        if self.count == 0:
+            return None
+
+        rank = q * (self.count - 1)
+        seen = 0
+        # Most negative first: larger magnitude keys come first on the negative side
+        for key in sorted(self.negative, reverse=True):
+            seen += self.negative[key]
+            if seen > rank:
+                return max(-self._value(key), self.min)
+        seen += self.zeros
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.positive):
+            seen += self.positive[key]
+            if seen > rank:
+                return min(self._value(key), self.max)
+        return self.max
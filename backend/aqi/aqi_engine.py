@@ -0,0 +1,142 @@
+from typing import Dict, List, Mapping, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+# Breakpoint rows are (lo_concentration, hi_concentration, lo_index, hi_index), in ascending order.
+
+# CPCB - India. µg/m³, CO in mg/m³
+CPCB_BREAKPOINTS = {
+    "PM2.5": [(0, 30, 0, 50), (31, 60, 51, 100), (61, 90, 101, 200), (91, 120, 201, 300), (121, 250, 301, 400), (251, 500, 401, 500)],
+    "PM10": [(0, 50, 0, 50), (51, 100, 51, 100), (101, 250, 101, 200), (251, 350, 201, 300), (351, 430, 301, 400), (431, 1000, 401, 500)],
+    "NO2": [(0, 40, 0, 50), (41, 80, 51, 100), (81, 180, 101, 200), (181, 280, 201, 300), (281, 400, 301, 400), (401, 1000, 401, 500)],
+    "SO2": [(0, 40, 0, 50), (41, 80, 51, 100), (81, 380, 101, 200), (381, 800, 201, 300), (801, 1600, 301, 400), (1601, 10000, 401, 500)],
+    "CO": [(0, 1, 0, 50), (1.1, 2, 51, 100), (2.1, 10, 101, 200), (10.1, 17, 201, 300), (17.1, 34, 301, 400), (34.1, 100, 401, 500)],
+    "O3": [(0, 50, 0, 50), (51, 100, 51, 100), (101, 168, 101, 200), (169, 208, 201, 300), (209, 748, 301, 400), (749, 1000, 401, 500)],
+}
+
+# US EPA (2024 PM2.5 revision). PM µg/m³ (24 h), O3 ppm (8 h), CO ppm (8 h), SO2 and NO2 ppb (1 h)
+US_EPA_BREAKPOINTS = {
+    "PM2.5": [(0.0, 9.0, 0, 50), (9.1, 35.4, 51, 100), (35.5, 55.4, 101, 150), (55.5, 125.4, 151, 200), (125.5, 225.4, 201, 300), (225.5, 325.4, 301, 500)],
+    "PM10": [(0, 54, 0, 50), (55, 154, 51, 100), (155, 254, 101, 150), (255, 354, 151, 200), (355, 424, 201, 300), (425, 604, 301, 500)],
+    "O3": [(0.0, 0.054, 0, 50), (0.055, 0.070, 51, 100), (0.071, 0.085, 101, 150), (0.086, 0.105, 151, 200), (0.106, 0.200, 201, 300)],
+    "CO": [(0.0, 4.4, 0, 50), (4.5, 9.4, 51, 100), (9.5, 12.4, 101, 150), (12.5, 15.4, 151, 200), (15.5, 30.4, 201, 300), (30.5, 50.4, 301, 500)],
+    "SO2": [(0, 35, 0, 50), (36, 75, 51, 100), (76, 185, 101, 150), (186, 304, 151, 200), (305, 604, 201, 300), (605, 1004, 301, 500)],
+    "NO2": [(0, 53, 0, 50), (54, 100, 51, 100), (101, 360, 101, 150), (361, 649, 151, 200), (650, 1249, 201, 300), (1250, 2049, 301, 500)],
+}
+
+# Common Air Quality Index (hourly grid), µg/m³; values past the last row are extrapolated above 100
+EU_CAQI_BREAKPOINTS = {
+    "NO2": [(0, 50, 0, 25), (50, 100, 25, 50), (100, 200, 50, 75), (200, 400, 75, 100)],
+    "PM10": [(0, 25, 0, 25), (25, 50, 25, 50), (50, 90, 50, 75), (90, 180, 75, 100)],
+    "PM2.5": [(0, 15, 0, 25), (15, 30, 25, 50), (30, 55, 50, 75), (55, 110, 75, 100)],
+    "O3": [(0, 60, 0, 25), (60, 120, 25, 50), (120, 180, 50, 75), (180, 240, 75, 100)],
+    "CO": [(0, 5000, 0, 25), (5000, 7500, 25, 50), (7500, 10000, 50, 75), (10000, 20000, 75, 100)],
+    "SO2": [(0, 50, 0, 25), (50, 100, 25, 50), (100, 350, 50, 75), (350, 500, 75, 100)],
+}
+
+
+class BreakpointTable(NamedTuple):
+    """ One pollutant's breakpoints as parallel arrays, sorted by lower concentration. """
+    lo_c: np.ndarray
+    hi_c: np.ndarray
+    lo_i: np.ndarray
+    hi_i: np.ndarray
+
+
+class Standard(NamedTuple):
+    name: str
+    tables: Dict[str, BreakpointTable]
+    category_limits: np.ndarray  # inclusive upper index of every category but the last
+    categories: np.ndarray
+    cap: Optional[float]  # index for concentrations above the last row; None extrapolates the last row
+
+
+def compile_table(rows: List[Tuple[float, float, float, float]]) -> BreakpointTable:
+    rows = sorted(rows)
+    lo_c, hi_c, lo_i, hi_i = (np.asarray(column, dtype=float) for column in zip(*rows))
+    return BreakpointTable(lo_c, hi_c, lo_i, hi_i)
+
+
+def compile_standard(name: str, breakpoints: Mapping[str, List[Tuple[float, float, float, float]]],
+                     categories: List[Tuple[Optional[float], str]], cap: Optional[float]) -> Standard:
+    return Standard(
+        name=name,
+        tables={pollutant: compile_table(rows) for pollutant, rows in breakpoints.items()},
+        category_limits=np.asarray([limit for limit, _ in categories[:-1]], dtype=float),
+        categories=np.asarray([label for _, label in categories]),
+        cap=cap,
+    )
+
+
+STANDARDS = {
+    "CPCB": compile_standard("CPCB", CPCB_BREAKPOINTS, [
+        (50, "Good"), (100, "Satisfactory"), (200, "Moderate"), (300, "Poor"), (400, "Very Poor"), (None, "Severe"),
+    ], cap=500),
+    "US_EPA": compile_standard("US_EPA", US_EPA_BREAKPOINTS, [
+        (50, "Good"), (100, "Moderate"), (150, "Unhealthy for Sensitive Groups"), (200, "Unhealthy"),
+        (300, "Very Unhealthy"), (None, "Hazardous"),
+    ], cap=500),
+    "EU_CAQI": compile_standard("EU_CAQI", EU_CAQI_BREAKPOINTS, [
+        (25, "Very Low"), (50, "Low"), (75, "Medium"), (100, "High"), (None, "Very High"),
+    ], cap=None),
+}
+
+UNKNOWN_CATEGORY = "Unknown"
+
+
+def get_standard(standard: str) -> Standard:
+    try:
+        return STANDARDS[standard]
+    except KeyError:
+        raise ValueError(f"Unsupported AQI standard: {standard}") from None
+
+
+def sub_index(pollutant: str, concentrations, standard: str = "CPCB") -> np.ndarray:
+    """
+    Sub-index of every concentration in one vectorised pass, rounded to whole index points.
+    The row is found with searchsorted on the lower bounds; values in the gaps between published rows
+    (e.g. 40 < NO2 < 41 for CPCB) take the top of the lower row. Negative and NaN inputs give NaN.
+    """
+    compiled = get_standard(standard)
+    table = compiled.tables.get(pollutant)
+    if table is None:
+        raise ValueError(f"No {standard} breakpoints defined for pollutant: {pollutant}")
+
+    values = np.asarray(concentrations, dtype=float)
+    row = np.clip(np.searchsorted(table.lo_c, values, side='right') - 1, 0, len(table.lo_c) - 1)
+    lo_c, hi_c, lo_i, hi_i = table.lo_c[row], table.hi_c[row], table.lo_i[row], table.hi_i[row]
+
+    above_top = values > table.hi_c[-1]
+    clamped = np.where(above_top, values, np.minimum(values, hi_c))
+    index = (clamped - lo_c) / (hi_c - lo_c) * (hi_i - lo_i) + lo_i
+    if compiled.cap is not None:
+        index = np.where(above_top, compiled.cap, index)
+
+    index = np.where((values < table.lo_c[0]) | np.isnan(values), np.nan, index)
+    return np.round(index)
+
+
+def overall_index(columns: Mapping[str, np.ndarray], standard: str = "CPCB") -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Overall index (highest sub-index) and the dominant pollutant for aligned concentration columns.
+    Pollutants the standard does not cover are ignored; rows without any valid sub-index give NaN / None.
+    """
+    compiled = get_standard(standard)
+    pollutants = [pollutant for pollutant in columns if pollutant in compiled.tables]
+    if not pollutants:
+        raise ValueError(f"None of {list(columns)} is covered by {standard}")
+
+    stacked = np.vstack([sub_index(pollutant, columns[pollutant], standard) for pollutant in pollutants])
+    has_value = ~np.isnan(stacked).all(axis=0)
+    dominant_row = np.argmax(np.where(np.isnan(stacked), -np.inf, stacked), axis=0)
+
+    index = np.where(has_value, np.nanmax(np.where(has_value, stacked, 0), axis=0), np.nan)
+    dominant = np.where(has_value, np.asarray(pollutants, dtype=object)[dominant_row], None)
+    return index, dominant
+
+
+def categorize(index, standard: str = "CPCB") -> np.ndarray:
+    compiled = get_standard(standard)
+    index = np.asarray(index, dtype=float)
+    positions = np.searchsorted(compiled.category_limits, np.nan_to_num(index), side='left')
+    return np.where(np.isnan(index), UNKNOWN_CATEGORY, compiled.categories[positions])
@@ -0,0 +1,156 @@
+import contextlib
+import hashlib
+import hmac
+import json
+import os
+import re
+import secrets
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from typing import Dict, List, NamedTuple, Optional
+
+from config import ARTIFACT_DIR, ARTIFACT_SIGNING_KEY, ARTIFACT_LINK_TTL_HOURS, ARTIFACT_MAX_AGE_DAYS, PUBLIC_BASE_URL
+from aqi.pdf_renderer import TEMPLATE_VERSION, render_pool
+
+KEY_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+
+class Artifact(NamedTuple):
+    key: str
+    path: str
+    size: int
+
+
+def artifact_key(region: str, period_reports: List[Dict], scales: Dict[str, float],
+                 narrative: Optional[Dict[str, str]] = None, statistics: Optional[Dict[str, Dict]] = None) -> str:
+    """ Content hash of everything that shapes a report; identical inputs share one PDF. """
+    payload = json.dumps({
+        "region": region,
+        "periods": period_reports,
+        "scales": scales,
+        "narrative": narrative,
+        "statistics": statistics,
+        "template": TEMPLATE_VERSION,
+    }, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ArtifactStore:
+    """
+    Content-addressed store for rendered reports under `root/<key[:2]>/<key>.pdf`.
+    Renders go through the PDF render pool; concurrent submits of the same key share one render.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.lock = threading.Lock()
+        self.pending: Dict[str, Future] = {}
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}.pdf")
+
+    def get(self, key: str) -> Optional[Artifact]:
+        if not KEY_PATTERN.match(key):
+            return None
+        path = self.path_for(key)
+        try:
+            return Artifact(key, path, os.path.getsize(path))
+        except OSError:
+            return None
+
+    def submit(self, region: str, period_reports: List[Dict], scales: Dict[str, float],
+               narrative: Optional[Dict[str, str]] = None, statistics: Optional[Dict[str, Dict]] = None) -> Future:
+        """ Future resolving to the stored Artifact, rendering it only when it is not stored yet. """
+        key = artifact_key(region, period_reports, scales, narrative, statistics)
+
+        with self.lock:
+            pending = self.pending.get(key)
+            if pending is not None:
+                return pending
+
+            artifact = self.get(key)
+            if artifact is not None:
+                print(f"♻️ Report {key[:12]} already rendered, reusing {artifact.path}")
+                # purge() goes by modification time, so a reused report is kept as long as a fresh one
+                self._touch(artifact.path)
+                done = Future()
+                done.set_result(artifact)
+                return done
+
+            result = Future()
+            self.pending[key] = result
+
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Render under a temporary name so readers never see a partial file
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+
+        def finish(render: Future):
+            error = render.exception()
+            if error is None:
+                try:
+                    os.replace(temp_path, path)
+                    print(f"✅ PDF report stored as {path}")
+                except OSError as e:
+                    # Runs as a done-callback: raising here would leave `result` unresolved and its waiters hanging
+                    error = e
+            if error is not None:
+                with contextlib.suppress(OSError):
+                    os.remove(temp_path)
+
+            # Only forget the pending render once the file is in place, so no caller re-renders it
+            with self.lock:
+                self.pending.pop(key, None)
+            artifact = self.get(key) if error is None else None
+            if artifact is not None:
+                result.set_result(artifact)
+            else:
+                result.set_exception(error or FileNotFoundError(f"Rendered report {key[:12]} is missing from {path}"))
+
+        render_pool.submit(region, period_reports, scales, file_path=temp_path, narrative=narrative, statistics=statistics).add_done_callback(finish)
+        return result
+
+    def purge(self, max_age_days: float = ARTIFACT_MAX_AGE_DAYS) -> int:
+        """ Delete artifacts neither written nor reused for `max_age_days`; they are re-rendered on the next request. """
+        cutoff = time.time() - max_age_days * 86400
+        removed = 0
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                path = os.path.join(directory, name)
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                        removed += 1
+                except FileNotFoundError:
+                    # Renamed or removed meanwhile (a finished render, another process purging)
+                    continue
+        return removed
+
+    @staticmethod
+    def _touch(path: str):
+        try:
+            os.utime(path)
+        except OSError as e:
+            print(f"⚠️ Failed to refresh {path}: {e}")
+
+
+store = ArtifactStore(ARTIFACT_DIR)
+
+# Without a configured key, links stay valid only for the lifetime of this process, and links signed by
+# worker.py processes would not verify in the API; both refuse to start without one when workers run apart
+_signing_key = (ARTIFACT_SIGNING_KEY or secrets.token_hex(32)).encode()
+
+
+def sign(key: str, expires: int) -> str:
+    return hmac.new(_signing_key, f"{key}:{expires}".encode(), hashlib.sha256).hexdigest()
+
+
+def verify(key: str, expires: int, signature: str) -> bool:
+    return expires >= time.time() and hmac.compare_digest(sign(key, expires), signature)
+
+
+def download_url(key: str, ttl_hours: float = ARTIFACT_LINK_TTL_HOURS) -> str:
+    expires = int(time.time() + ttl_hours * 3600)
+    return f"{PUBLIC_BASE_URL}/api/report/artifacts/{key}?expires={expires}&signature={sign(key, expires)}"
@@ -0,0 +1,106 @@
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional
+
+from config import EE_PROJECT, EE_SERVICE_ACCOUNT, EE_PRIVATE_KEY_FILE
+
+# Substrings of errors that mean the session is missing or its credentials went stale
+AUTH_ERROR_MARKERS = (
+    "401",
+    "unauthenticated",
+    "invalid_grant",
+    "invalid credentials",
+    "not initialized",
+    "please authorize",
+    "token has been expired",
+)
+
+
+def is_auth_error(error: Exception) -> bool:
+    message = str(error).lower()
+    return any(marker in message for marker in AUTH_ERROR_MARKERS)
+
+
+class EarthEngineClient:
+    """
+    Process-wide Earth Engine session.
+    Initialised once (normally from the FastAPI lifespan) and re-initialised only after an auth failure.
+    """
+
+    def __init__(self, project: str, service_account: Optional[str] = None, private_key_file: Optional[str] = None):
+        self.project = project
+        self.service_account = service_account
+        self.private_key_file = private_key_file
+        self.lock = threading.Lock()
+        self.initialized = False
+        self.initialized_at: Optional[datetime] = None
+        self.last_error: Optional[str] = None
+
+    # The Earth Engine SDK takes about half a second to import, so it is loaded on first use, not at app import
+
+    def _credentials(self):
+        import ee
+
+        if self.service_account and self.private_key_file:
+            return ee.ServiceAccountCredentials(self.service_account, self.private_key_file)
+        return None  # Fall back to the persistent credentials from `earthengine authenticate`
+
+    def initialize(self, force: bool = False):
+        import ee
+
+        with self.lock:
+            if self.initialized and not force:
+                return
+            try:
+                ee.Initialize(credentials=self._credentials(), project=self.project)
+            except Exception as e:
+                self.initialized = False
+                self.last_error = str(e)
+                print(f"⚠️ Earth Engine Initialization Failed: {e}")
+                raise
+            self.initialized = True
+            self.initialized_at = datetime.now(timezone.utc)
+            self.last_error = None
+            print(f"✅ Earth Engine Initialized with project '{self.project}'")
+
+    def ensure_initialized(self):
+        if not self.initialized:
+            self.initialize()
+
+    def call(self, fn: Callable, *args, **kwargs):
+        """ Run an EE call; on an auth failure re-initialise once and retry. """
+        self.ensure_initialized()
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            if not is_auth_error(e):
+                raise
+            print(f"🔑 Earth Engine auth failure, re-initialising: {e}")
+            self.initialize(force=True)
+            return fn(*args, **kwargs)
+
+    def health_check(self) -> Dict:
+        """ Cheap round trip proving the session works. """
+        import ee
+
+        started = time.perf_counter()
+        try:
+            self.call(ee.Number(1).getInfo)
+        except Exception as e:
+            return {
+                "status": "error",
+                "project": self.project,
+                "initialized": self.initialized,
+                "error": str(e),
+            }
+        return {
+            "status": "ok",
+            "project": self.project,
+            "initialized": self.initialized,
+            "initialized_at": self.initialized_at.isoformat() if self.initialized_at else None,
+            "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+
+
+client = EarthEngineClient(EE_PROJECT, EE_SERVICE_ACCOUNT, EE_PRIVATE_KEY_FILE)
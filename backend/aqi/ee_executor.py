@@ -0,0 +1,123 @@
+import contextvars
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Hashable, Optional
+
+from config import EE_MAX_WORKERS, EE_REQUESTS_PER_SECOND, EE_BURST, EE_MAX_RETRIES, EE_BACKOFF_BASE_SECONDS
+from aqi.ee_client import client
+from aqi.ee_metrics import record_call
+
+# Substrings Earth Engine uses when a request is rejected for quota or concurrency reasons
+QUOTA_ERROR_MARKERS = (
+    "429",
+    "too many requests",
+    "quota",
+    "rate limit",
+    "too many concurrent",
+    "resource_exhausted",
+)
+
+# Substrings of errors caused by a single computation being too large for Earth Engine
+RESOURCE_ERROR_MARKERS = (
+    "memory limit exceeded",
+    "out of memory",
+    "computation timed out",
+    "too many pixels",
+    "deadline exceeded",
+)
+
+
+class TokenBucket:
+    """ Thread-safe token bucket: `rate` tokens per second, at most `capacity` banked. """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+limiter = TokenBucket(EE_REQUESTS_PER_SECOND, EE_BURST)
+
+
+def is_quota_error(error: Exception) -> bool:
+    message = str(error).lower()
+    return any(marker in message for marker in QUOTA_ERROR_MARKERS)
+
+
+def is_resource_error(error: Exception) -> bool:
+    message = str(error).lower()
+    return any(marker in message for marker in RESOURCE_ERROR_MARKERS)
+
+
+def call_with_backoff(fn: Callable, *args, retries: int = EE_MAX_RETRIES, **kwargs):
+    """
+    Run an Earth Engine call under the shared rate limiter.
+    Quota/429 errors are retried with exponential backoff and jitter; other errors propagate.
+    """
+    attempt = 0
+    while True:
+        limiter.acquire()
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            if not is_quota_error(e) or attempt >= retries:
+                raise
+            delay = EE_BACKOFF_BASE_SECONDS * (2 ** attempt) * (1 + random.random())
+            print(f"   ⏳ Earth Engine quota hit, retrying in {delay:.1f}s ({attempt + 1}/{retries}): {e}")
+            time.sleep(delay)
+            attempt += 1
+
+
+def get_info(ee_object):
+    """
+    Rate-limited, quota-aware replacement for `ee_object.getInfo()` that re-authenticates on auth errors.
+    Every attempt is recorded in ee_metrics with its latency and response size.
+    """
+    def timed_call():
+        started = time.perf_counter()
+        try:
+            result = client.call(ee_object.getInfo)
+        except Exception:
+            record_call(time.perf_counter() - started, 0, error=True)
+            raise
+        record_call(time.perf_counter() - started, len(json.dumps(result, default=str)), error=False)
+        return result
+
+    return call_with_backoff(timed_call)
+
+
+def run_parallel(tasks: Dict[Hashable, Callable], max_workers: Optional[int] = None) -> Dict[Hashable, object]:
+    """
+    Run independent callables on a bounded thread pool.
+    Returns a dict with each task's result, or the exception it raised.
+    """
+    workers = max(1, min(max_workers or EE_MAX_WORKERS, len(tasks) or 1))
+    results = {}
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ee-worker") as pool:
+        # Each task runs in a copy of the caller's context so request metrics follow it into the pool
+        futures = {key: pool.submit(contextvars.copy_context().run, task) for key, task in tasks.items()}
+        for key, future in futures.items():
+            try:
+                results[key] = future.result()
+            except Exception as e:
+                results[key] = e
+
+    return results
@@ -0,0 +1,131 @@
+import threading
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+# Pollutant name used when a call happens outside pollutant_scope
+UNSCOPED = "_request"
+
+
+class CallStats:
+    """ Counters for a group of Earth Engine calls. """
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.payload_bytes = 0
+
+    def add(self, seconds: float, payload_bytes: int, error: bool):
+        self.calls += 1
+        self.errors += int(error)
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.payload_bytes += payload_bytes
+
+    def summary(self) -> Dict:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "total_seconds": round(self.total_seconds, 3),
+            "mean_seconds": round(self.total_seconds / self.calls, 3) if self.calls else 0.0,
+            "max_seconds": round(self.max_seconds, 3),
+            "payload_bytes": self.payload_bytes,
+        }
+
+
+class RequestMetrics:
+    """ Earth Engine usage of one report request, broken down by pollutant. """
+
+    def __init__(self, label: str):
+        self.request_id = uuid.uuid4().hex
+        self.label = label
+        self.lock = threading.Lock()
+        self.by_pollutant: Dict[str, CallStats] = {}
+
+    def record(self, pollutant: str, seconds: float, payload_bytes: int, error: bool):
+        with self.lock:
+            self.by_pollutant.setdefault(pollutant, CallStats()).add(seconds, payload_bytes, error)
+
+    def summary(self) -> Dict:
+        with self.lock:
+            total = CallStats()
+            for stats in self.by_pollutant.values():
+                total.calls += stats.calls
+                total.errors += stats.errors
+                total.total_seconds += stats.total_seconds
+                total.max_seconds = max(total.max_seconds, stats.max_seconds)
+                total.payload_bytes += stats.payload_bytes
+            return {
+                "request_id": self.request_id,
+                "label": self.label,
+                "total": total.summary(),
+                "pollutants": {name: stats.summary() for name, stats in self.by_pollutant.items()},
+            }
+
+
+current_request: ContextVar[Optional[RequestMetrics]] = ContextVar("ee_current_request", default=None)
+current_pollutant: ContextVar[str] = ContextVar("ee_current_pollutant", default=UNSCOPED)
+
+process_totals = CallStats()
+process_lock = threading.Lock()
+
+
+def log_usage(metrics: RequestMetrics):
+    total = metrics.summary()["total"]
+    print(f"📈 EE usage for {metrics.label}: {total['calls']} calls, {total['errors']} errors, "
+          f"{total['total_seconds']}s, {total['payload_bytes']} bytes")
+
+
+@contextmanager
+def use_request(metrics: RequestMetrics):
+    """
+    Attribute the enclosed calls to `metrics`.
+    Generators use this around each step instead of holding the context variable across yields.
+    """
+    token = current_request.set(metrics)
+    try:
+        yield metrics
+    finally:
+        current_request.reset(token)
+
+
+@contextmanager
+def track_request(label: str):
+    """ Collect EE usage for the enclosed work; nested calls reuse the outer request. """
+    existing = current_request.get()
+    if existing is not None:
+        yield existing
+        return
+
+    metrics = RequestMetrics(label)
+    try:
+        with use_request(metrics):
+            yield metrics
+    finally:
+        log_usage(metrics)
+
+
+@contextmanager
+def pollutant_scope(name: str):
+    token = current_pollutant.set(name)
+    try:
+        yield
+    finally:
+        current_pollutant.reset(token)
+
+
+def record_call(seconds: float, payload_bytes: int, error: bool):
+    with process_lock:
+        process_totals.add(seconds, payload_bytes, error)
+
+    metrics = current_request.get()
+    if metrics is not None:
+        metrics.record(current_pollutant.get(), seconds, payload_bytes, error)
+
+
+def process_summary() -> Dict:
+    with process_lock:
+        return process_totals.summary()
@@ -1,123 +1,729 @@
 import ee
-from datetime import datetime
-from typing import List, Dict, Literal
+import math
+import numpy as np
+from datetime import date, datetime
+from functools import partial
+from typing import Iterator, List, Dict, Literal, Optional, Tuple
 
-# Initialize Earth Engine
+from config import RESULT_CACHE_ENABLED, TILE_PIXEL_THRESHOLD, DAILY_BASE_ENABLED
+from aqi import progress, result_cache
+from aqi.ee_client import client
+from aqi.ee_executor import get_info, is_resource_error, run_parallel
+from aqi.ee_metrics import RequestMetrics, current_request, log_usage, pollutant_scope, track_request, use_request
+from aqi.geometry import polygon_area_m2
+from aqi.periods import Period, generate_periods, to_date
+from aqi.pixel_plan import ReducePlan, ScaleMode, plan_reduction
+from aqi.pollutants import POLLUTANTS
+from aqi.rollup import roll_up
+from aqi.tiling import MIN_FALLBACK_TILES, split_aoi, tile_count
+
+# Initialize Earth Engine (no-op once the process-wide session is up)
 def initialize_earth_engine():
+    client.ensure_initialized()
+
+def generate_date_ranges(start_date: str, end_date: str, interval: Literal['day', 'week', 'month', 'year']) -> List[Period]:
+    """ Generate date ranges based on the interval type, computed locally without Earth Engine calls. """
+    return generate_periods(start_date, end_date, interval)
+
+def ee_range(period: Period):
+    return ee.Date(period.start.isoformat()), ee.Date(period.end.isoformat())
+
+def filtered_collection(pollutant: Dict, aoi_geometry: ee.Geometry, start_date: ee.Date, end_date: ee.Date) -> ee.ImageCollection:
+    return ee.ImageCollection(pollutant['dataset']) \
+        .filterBounds(aoi_geometry) \
+        .filterDate(start_date, end_date) \
+        .select(pollutant['band'])
+
+# Upper bound on periods materialised by a single batched getInfo call
+BATCH_MAX_PERIODS = 500
+
+def build_batch_collection(pollutant: Dict, aoi_geometry: ee.Geometry, start_date: ee.Date, end_date: ee.Date,
+                           date_ranges: List[Period], plan: ReducePlan) -> ee.FeatureCollection:
+    """ Build one FeatureCollection holding the AOI mean of a pollutant for every period. """
+    ranges = ee.List([
+        ee.List([period.start.isoformat(), period.end.isoformat(), period.label]) for period in date_ranges
+    ])
+    collection = filtered_collection(pollutant, aoi_geometry, start_date, end_date)
+
+    def reduce_period(date_range):
+        date_range = ee.List(date_range)
+        start = ee.Date(date_range.get(0))
+        end = ee.Date(date_range.get(1))
+        stats = collection.filterDate(start, end).mean().clip(aoi_geometry).reduceRegion(
+            reducer=ee.Reducer.mean(),
+            geometry=aoi_geometry,
+            **plan.reduce_kwargs()
+        )
+        # Empty periods produce an image without bands; keep them as null values
+        value = ee.Algorithms.If(stats.contains(pollutant['band']), stats.get(pollutant['band']), None)
+        return ee.Feature(None, {
+            'period': date_range.get(2),
+            'pollutant': pollutant['name'],
+            'value': value,
+        })
+
+    return ee.FeatureCollection(ranges.map(reduce_period))
+
+def make_record(pollutant: Dict, period_label: str, value, interval: Literal['day', 'week', 'month', 'year'],
+                plan: ReducePlan) -> Dict:
+    return {
+        "period": period_label,
+        "pollutant": pollutant['name'],
+        "value": value,
+        "interval": interval,
+        "scale": plan.scale
+    }
+
+def empty_records(pollutant: Dict, date_ranges: List[Period], interval: Literal['day', 'week', 'month', 'year'],
+                  plan: ReducePlan) -> List[Dict]:
+    return [make_record(pollutant, period.label, None, interval, plan) for period in date_ranges]
+
+def fetch_period_sequential(pollutant: Dict, collection: ee.ImageCollection, aoi_geometry: ee.Geometry,
+                            date_ranges: List[Period], interval: Literal['day', 'week', 'month', 'year'],
+                            plan: ReducePlan) -> List[Dict]:
+    """ Compute one pollutant period by period, one getInfo round trip each. """
+    records = []
+
+    for period in date_ranges:
+        start, end = ee_range(period)
+        period_label = period.label
+
+        print(f"   📊 Processing {interval}: {period_label}")
+
+        period_image = collection.filterDate(start, end).mean().clip(aoi_geometry)
+
+        try:
+            mean_value = get_info(period_image.reduceRegion(
+                reducer=ee.Reducer.mean(),
+                geometry=aoi_geometry,
+                **plan.reduce_kwargs()
+            ).get(pollutant['band']))
+
+            print(f"      ✅ {pollutant['name']} average for {period_label}: {mean_value}")
+
+            records.append(make_record(pollutant, period_label, mean_value, interval, plan))
+
+        except Exception as e:
+            print(f"      ⚠️ Failed to compute mean for {pollutant['name']} in {period_label}: {e}")
+            records.append(make_record(pollutant, period_label, None, interval, plan))
+
+    return records
+
+def fetch_pollutant_batched(pollutant: Dict, aoi_geometry: ee.Geometry, start_date: ee.Date, end_date: ee.Date,
+                            date_ranges: List[Period], interval: Literal['day', 'week', 'month', 'year'],
+                            plan: ReducePlan, aoi: Optional[Dict] = None) -> List[Dict]:
+    """
+    Evaluate every period of one pollutant server-side, one getInfo per chunk of periods.
+    When `aoi` is given, chunks that fail on memory or timeouts are retried as tiles.
+    """
+    records = []
+
+    for offset in range(0, len(date_ranges), BATCH_MAX_PERIODS):
+        chunk = date_ranges[offset:offset + BATCH_MAX_PERIODS]
+        print(f"   🧮 {pollutant['name']}: batched request for periods {offset + 1}-{offset + len(chunk)} of {len(date_ranges)}")
+
+        try:
+            features = get_info(build_batch_collection(
+                pollutant, aoi_geometry, start_date, end_date, chunk, plan
+            ))['features']
+        except Exception as e:
+            if aoi is not None and is_resource_error(e):
+                tiles = max(MIN_FALLBACK_TILES, tile_count(plan.estimated_pixels))
+                print(f"   ⚠️ {pollutant['name']}: batched request hit an Earth Engine limit, retrying as {tiles} tiles: {e}")
+                records.extend(fetch_pollutant_tiled(pollutant, aoi, start_date, end_date, chunk, interval, plan, tiles))
+                continue
+
+            # Fall back to per-period calls so a single bad period only costs its own value
+            print(f"   ⚠️ {pollutant['name']}: batched request failed, falling back to sequential mode: {e}")
+            collection = filtered_collection(pollutant, aoi_geometry, start_date, end_date)
+            records.extend(fetch_period_sequential(pollutant, collection, aoi_geometry, chunk, interval, plan))
+            continue
+
+        for feature in features:
+            properties = feature['properties']
+            records.append(make_record(pollutant, properties['period'], properties.get('value'), interval, plan))
+
+    return records
+
+def build_tile_collection(pollutant: Dict, tile_geometry: ee.Geometry, start_date: ee.Date, end_date: ee.Date,
+                          date_ranges: List[Period], plan: ReducePlan) -> ee.FeatureCollection:
+    """
+    Per period, the pixel-weighted sum of the band over one tile and the matching sum of weights.
+    reduceRegion weights edge pixels by their coverage, so pixels shared by neighbouring tiles are split
+    between them and sum(sums) / sum(weights) over all tiles equals the AOI mean.
+    """
+    ranges = ee.List([
+        ee.List([period.start.isoformat(), period.end.isoformat(), period.label]) for period in date_ranges
+    ])
+    collection = filtered_collection(pollutant, tile_geometry, start_date, end_date)
+    # Stand-in for periods without images so every feature carries both properties
+    empty = ee.Image.constant(0).updateMask(0).rename(pollutant['band'])
+
+    def reduce_period(date_range):
+        date_range = ee.List(date_range)
+        period_collection = collection.filterDate(ee.Date(date_range.get(0)), ee.Date(date_range.get(1)))
+        image = ee.Image(ee.Algorithms.If(period_collection.size().gt(0), period_collection.mean(), empty))
+        weight = ee.Image.constant(1).updateMask(image.mask()).rename('weight')
+        stats = image.addBands(weight).reduceRegion(
+            reducer=ee.Reducer.sum(),
+            geometry=tile_geometry,
+            **plan.reduce_kwargs()
+        )
+        return ee.Feature(None, {
+            'period': date_range.get(2),
+            'sum': stats.get(pollutant['band']),
+            'weight': stats.get('weight'),
+        })
+
+    return ee.FeatureCollection(ranges.map(reduce_period))
+
+def partial_mean(partial_sum: Optional[Tuple[float, float]]) -> Optional[float]:
+    if partial_sum is None or partial_sum[1] <= 0:
+        return None
+    return partial_sum[0] / partial_sum[1]
+
+def reduce_partial_sums(pollutant: Dict, aoi: Dict, start_date: ee.Date, end_date: ee.Date,
+                        date_ranges: List[Period], plan: ReducePlan) -> Dict[str, Tuple[float, float]]:
+    """ (weighted sum, weight) per period label over one polygon, one getInfo per chunk of periods. """
+    geometry = ee.Geometry.Polygon(aoi['coordinates'])
+    partials = {}
+    for offset in range(0, len(date_ranges), BATCH_MAX_PERIODS):
+        chunk = date_ranges[offset:offset + BATCH_MAX_PERIODS]
+        features = get_info(build_tile_collection(pollutant, geometry, start_date, end_date, chunk, plan))['features']
+        for feature in features:
+            properties = feature['properties']
+            partials[properties['period']] = (properties.get('sum') or 0.0, properties.get('weight') or 0.0)
+    return partials
+
+def fetch_partial_sums(pollutant: Dict, aoi: Dict, start_date: ee.Date, end_date: ee.Date,
+                       date_ranges: List[Period], plan: ReducePlan, tiles: int = 1) -> Dict[str, Tuple[float, float]]:
+    """
+    Partial sums over the whole AOI, reduced as `tiles` tiles in parallel when tiles > 1.
+    Raises when any tile fails, since a missing tile would bias the mean.
+    """
+    # Partial sums are only additive at one fixed scale, so bestEffort must not rescale any reduction
+    fixed_plan = plan._replace(best_effort=False, max_pixels=max(plan.max_pixels, 1e13))
+    if tiles <= 1:
+        return reduce_partial_sums(pollutant, aoi, start_date, end_date, date_ranges, fixed_plan)
+
+    tile_aois = split_aoi(aoi, tiles)
+    print(f"   🧩 {pollutant['name']}: reducing {len(tile_aois)} tiles for {len(date_ranges)} periods")
+    results = run_parallel({
+        index: partial(reduce_partial_sums, pollutant, tile_aoi, start_date, end_date, date_ranges, fixed_plan)
+        for index, tile_aoi in enumerate(tile_aois)
+    })
+
+    merged = {}
+    for index, result in results.items():
+        if isinstance(result, Exception):
+            raise RuntimeError(f"tile {index + 1}/{len(tile_aois)} failed: {result}") from result
+        for label, (tile_sum, tile_weight) in result.items():
+            merged_sum, merged_weight = merged.get(label, (0.0, 0.0))
+            merged[label] = (merged_sum + tile_sum, merged_weight + tile_weight)
+    return merged
+
+def fetch_pollutant_tiled(pollutant: Dict, aoi: Dict, start_date: ee.Date, end_date: ee.Date,
+                          date_ranges: List[Period], interval: Literal['day', 'week', 'month', 'year'],
+                          plan: ReducePlan, tiles: int) -> List[Dict]:
+    """ Reduce an AOI too large for one reduceRegion as tiles in parallel, then merge the partial sums exactly. """
     try:
-        ee.Initialize(project='ee-raazifaisal')
-        print("✅ Earth Engine Initialized with project 'ee-raazifaisal'")
+        partials = fetch_partial_sums(pollutant, aoi, start_date, end_date, date_ranges, plan, tiles)
     except Exception as e:
-        print(f"⚠️ Earth Engine Initialization Failed: {e}")
-        raise e
-
-# Define the pollutants and their datasets
-POLLUTANTS = [
-    {'name': 'NO2', 'dataset': 'COPERNICUS/S5P/OFFL/L3_NO2', 'band': 'NO2_column_number_density'},
-    {'name': 'CO', 'dataset': 'COPERNICUS/S5P/OFFL/L3_CO', 'band': 'CO_column_number_density'},
-    {'name': 'HCHO', 'dataset': 'COPERNICUS/S5P/OFFL/L3_HCHO', 'band': 'tropospheric_HCHO_column_number_density'},
-    {'name': 'CH4', 'dataset': 'COPERNICUS/S5P/OFFL/L3_CH4', 'band': 'CH4_column_volume_mixing_ratio_dry_air'},
-    {'name': 'SO2', 'dataset': 'COPERNICUS/S5P/OFFL/L3_SO2', 'band': 'SO2_column_number_density'},
-    {'name': 'AOD', 'dataset': 'MODIS/061/MCD19A2_GRANULES', 'band': 'Optical_Depth_047'},
-    {'name': 'O3', 'dataset': 'COPERNICUS/S5P/OFFL/L3_O3', 'band': 'O3_column_number_density'},
-]
-
-def generate_date_ranges(start_date: ee.Date, end_date: ee.Date, interval: Literal['day', 'week', 'month', 'year']):
-    """ Generate date ranges based on the interval type. """
-    ranges = []
-    current = start_date
-
-    while current.millis().lt(end_date.millis()).getInfo():
-        if interval == 'day':
-            next_date = current.advance(1, 'day')
-        elif interval == 'week':
-            next_date = current.advance(1, 'week')
-        elif interval == 'month':
-            next_date = current.advance(1, 'month')
-        elif interval == 'year':
-            next_date = current.advance(1, 'year')
-        else:
-            raise ValueError(f"Unsupported interval: {interval}")
+        print(f"   ⚠️ {pollutant['name']}: tiled reduction failed: {e}")
+        return empty_records(pollutant, date_ranges, interval, plan)
 
-        ranges.append((current, next_date))
-        current = next_date
+    return [
+        make_record(pollutant, period.label, partial_mean(partials.get(period.label)), interval, plan)
+        for period in date_ranges
+    ]
 
-    return ranges
+def fetch_daily_partials(pollutant: Dict, aoi: Dict, days: List[Period], plan: ReducePlan) -> Dict[str, Tuple[float, float]]:
+    """ Daily partial sums, tiled up front for large AOIs or after a single reduction hits an Earth Engine limit. """
+    start_date = ee.Date(days[0].start.isoformat())
+    end_date = ee.Date(days[-1].end.isoformat())
+    tiles = tile_count(plan.estimated_pixels) if plan.estimated_pixels > TILE_PIXEL_THRESHOLD else 1
 
-def fetch_pollutant_data(aoi: Dict, start_date: str, end_date: str, interval: Literal['day', 'week', 'month', 'year']) -> List[Dict]:
-    initialize_earth_engine()
+    try:
+        return fetch_partial_sums(pollutant, aoi, start_date, end_date, days, plan, tiles)
+    except Exception as e:
+        if tiles > 1 or not is_resource_error(e):
+            raise
+        tiles = max(MIN_FALLBACK_TILES, tile_count(plan.estimated_pixels))
+        print(f"   ⚠️ {pollutant['name']}: daily reduction hit an Earth Engine limit, retrying as {tiles} tiles: {e}")
+        return fetch_partial_sums(pollutant, aoi, start_date, end_date, days, plan, tiles)
 
-    print("\n🚀 Fetching pollutant data for AOI and time range:")
-    print(f"   Start Date: {start_date}")
-    print(f"   End Date: {end_date}")
-    print(f"   Interval: {interval}")
-    print(f"   AOI: {aoi['coordinates']}")
+def fetch_pollutant_rollup(pollutant: Dict, aoi: Dict, date_ranges: List[Period],
+                           interval: Literal['day', 'week', 'month', 'year'], plan: ReducePlan,
+                           request_end: date, aoi_key: Optional[str] = None) -> List[Dict]:
+    """
+    One pollutant from the daily base series: cached days are reused, missing days are computed
+    (and stored when `aoi_key` is set), then everything is rolled up to `interval` locally.
+    """
+    with pollutant_scope(pollutant['name']):
+        print(f"\n🔎 Processing pollutant: {pollutant['name']} from dataset: {pollutant['dataset']} using band: {pollutant['band']}")
+        print(f"   📐 Scale {plan.scale} m, daily base series rolled up to {interval}s")
 
-    aoi_geometry = ee.Geometry.Polygon(aoi['coordinates'])
-    start_date = ee.Date(start_date)
-    end_date = ee.Date(end_date)
+        days = generate_periods(date_ranges[0].start, min(date_ranges[-1].end, request_end), 'day')
 
-    date_ranges = generate_date_ranges(start_date, end_date, interval)
-    print(f"📆 Total {interval}s in range: {len(date_ranges)}")
+        cached = {}
+        if aoi_key:
+            try:
+                cached = result_cache.load_daily_base(aoi_key, pollutant, plan.scale, days)
+            except Exception as e:
+                print(f"   ⚠️ {pollutant['name']}: daily base cache unavailable, computing every day: {e}")
 
-    all_data = []
+        missing = [day for day in days if day.start not in cached]
+        if aoi_key:
+            print(f"   💾 {pollutant['name']}: {len(days) - len(missing)} cached days, {len(missing)} to compute")
 
-    for pollutant in POLLUTANTS:
+        computed = {}
+        if missing:
+            try:
+                computed = fetch_daily_partials(pollutant, aoi, missing, plan)
+            except Exception as e:
+                # Reduce each period directly instead, so one failed day series does not blank the whole chunk
+                print(f"   ⚠️ {pollutant['name']}: failed to compute daily base series, falling back to per-{interval} reductions: {e}")
+                return fetch_pollutant_series(
+                    pollutant, ee.Geometry.Polygon(aoi['coordinates']), ee.Date(date_ranges[0].start.isoformat()),
+                    ee.Date(days[-1].end.isoformat()), date_ranges, interval, 'batch', plan, aoi_key=aoi_key,
+                    request_end=request_end, aoi=aoi
+                )
+            if aoi_key and computed:
+                try:
+                    result_cache.store_daily_base(aoi_key, pollutant, plan.scale, missing, computed)
+                except Exception as e:
+                    print(f"   ⚠️ {pollutant['name']}: failed to store daily base series: {e}")
+
+        sums = np.zeros(len(days))
+        weights = np.zeros(len(days))
+        known = np.zeros(len(days), dtype=bool)
+        for index, day in enumerate(days):
+            partial_sum = cached.get(day.start) or computed.get(day.label)
+            if partial_sum is not None:
+                sums[index], weights[index] = partial_sum
+                known[index] = True
+
+        values = roll_up(days, sums, weights, known, date_ranges)
+        return [make_record(pollutant, period.label, value, interval, plan) for period, value in zip(date_ranges, values)]
+
+def compute_pollutant_series(pollutant: Dict, aoi_geometry: ee.Geometry, start_date: ee.Date, end_date: ee.Date,
+                             date_ranges: List[Period], interval: Literal['day', 'week', 'month', 'year'],
+                             mode: Literal['batch', 'sequential'], plan: ReducePlan,
+                             aoi: Optional[Dict] = None) -> List[Dict]:
+    if aoi is not None and plan.estimated_pixels > TILE_PIXEL_THRESHOLD:
+        return fetch_pollutant_tiled(pollutant, aoi, start_date, end_date, date_ranges, interval, plan,
+                                     tile_count(plan.estimated_pixels))
+
+    if mode == 'batch':
+        return fetch_pollutant_batched(pollutant, aoi_geometry, start_date, end_date, date_ranges, interval, plan, aoi=aoi)
+
+    collection = filtered_collection(pollutant, aoi_geometry, start_date, end_date)
+    return fetch_period_sequential(pollutant, collection, aoi_geometry, date_ranges, interval, plan)
+
+def fetch_pollutant_series(pollutant: Dict, aoi_geometry: ee.Geometry, start_date: ee.Date, end_date: ee.Date,
+                           date_ranges: List[Period], interval: Literal['day', 'week', 'month', 'year'],
+                           mode: Literal['batch', 'sequential'], plan: ReducePlan, aoi_key: Optional[str] = None,
+                           request_end: Optional[date] = None, aoi: Optional[Dict] = None) -> List[Dict]:
+    """ Fetch one pollutant, computing only the periods missing from the result cache when `aoi_key` is set. """
+    with pollutant_scope(pollutant['name']):
         print(f"\n🔎 Processing pollutant: {pollutant['name']} from dataset: {pollutant['dataset']} using band: {pollutant['band']}")
+        print(f"   📐 Scale {plan.scale} m, tileScale {plan.tile_scale}, bestEffort {plan.best_effort}, ~{plan.estimated_pixels} pixels")
+
+        cached = {}
+        if aoi_key:
+            try:
+                cached = result_cache.load_cached(aoi_key, pollutant, interval, plan.scale, date_ranges, request_end)
+            except Exception as e:
+                print(f"   ⚠️ {pollutant['name']}: result cache unavailable, computing every period: {e}")
+
+        missing = [
+            period for period in date_ranges
+            if (period.start, result_cache.effective_end(period, request_end)) not in cached
+        ] if cached else date_ranges
+
+        if aoi_key:
+            print(f"   💾 {pollutant['name']}: {len(date_ranges) - len(missing)} cached, {len(missing)} to compute")
+
+        computed = []
+        if missing:
+            computed = compute_pollutant_series(pollutant, aoi_geometry, start_date, end_date, missing, interval, mode, plan,
+                                                aoi=aoi)
+            if aoi_key:
+                try:
+                    result_cache.store_results(aoi_key, pollutant, interval, plan.scale, missing, request_end, computed)
+                except Exception as e:
+                    print(f"   ⚠️ {pollutant['name']}: failed to store results in cache: {e}")
+
+        if not cached:
+            return computed
 
-        collection = ee.ImageCollection(pollutant['dataset']) \
-            .filterBounds(aoi_geometry) \
-            .filterDate(start_date, end_date) \
-            .select(pollutant['band'])
-
-        print(f"   ✅ Collection Filtered - Found {collection.size().getInfo()} images for {pollutant['name']}")
-
-        for start, end in date_ranges:
-            if interval == 'day':
-                period_label = start.format('YYYY-MM-dd').getInfo()
-            elif interval == 'week':
-                year = start.get('year').format().getInfo()
-                week = start.get('week').format().getInfo()  # Week 1 to 52
-                period_label = f"{year}-W{week.zfill(2)}"
-            elif interval == 'month':
-                period_label = start.format('YYYY-MM').getInfo()
-            elif interval == 'year':
-                period_label = start.format('YYYY').getInfo()
+        computed_by_period = {record['period']: record for record in computed}
+        records = []
+        for period in date_ranges:
+            key = (period.start, result_cache.effective_end(period, request_end))
+            if key in cached:
+                records.append(make_record(pollutant, period.label, cached[key], interval, plan))
             else:
-                raise ValueError(f"Unsupported interval: {interval}")
+                records.append(computed_by_period.get(period.label) or make_record(pollutant, period.label, None, interval, plan))
+        return records
 
-            print(f"   📊 Processing {interval}: {period_label}")
+# Streaming chunks start this small so the first records arrive quickly, then double up to BATCH_MAX_PERIODS
+STREAM_FIRST_CHUNK_PERIODS = 8
 
-            period_image = collection.filterDate(start, end).mean().clip(aoi_geometry)
+def period_chunks(date_ranges: List[Period], first_chunk: int) -> Iterator[List[Period]]:
+    offset, size = 0, max(1, first_chunk)
+    while offset < len(date_ranges):
+        yield date_ranges[offset:offset + size]
+        offset += size
+        size = min(size * 2, max(BATCH_MAX_PERIODS, first_chunk))
 
-            try:
-                mean_value = period_image.reduceRegion(
-                    reducer=ee.Reducer.mean(),
-                    geometry=aoi_geometry,
-                    scale=1000,
-                    maxPixels=1e13
-                ).get(pollutant['band']).getInfo()
-
-                print(f"      ✅ {pollutant['name']} average for {period_label}: {mean_value}")
-
-                all_data.append({
-                    "period": period_label,
-                    "pollutant": pollutant['name'],
-                    "value": mean_value,
-                    "interval": interval
-                })
+def iter_pollutant_data(aoi: Dict, start_date: str, end_date: str, interval: Literal['day', 'week', 'month', 'year'],
+                        mode: Literal['batch', 'sequential'] = 'batch', max_workers: Optional[int] = None,
+                        use_cache: bool = RESULT_CACHE_ENABLED,
+                        backend: Literal['ee', 's5p_local'] = 'ee',
+                        scale_mode: ScaleMode = 'fast',
+                        first_chunk: Optional[int] = STREAM_FIRST_CHUNK_PERIODS,
+                        daily_base: bool = DAILY_BASE_ENABLED) -> Iterator[Dict]:
+    """
+    Yield pollutant records as they are computed.
+    Periods are fetched in chunks (all pollutants in parallel per chunk) and only the current chunk is held
+    in memory; `first_chunk=None` computes every period in one chunk.
+    With `daily_base` (batch mode only) every interval is rolled up from the cached daily base series.
+    """
+    if backend == 's5p_local':
+        # Imported lazily so the EE path does not require netCDF4
+        from aqi.s5p_local import iter_pollutant_data_local
+        yield from iter_pollutant_data_local(aoi, start_date, end_date, interval)
+        return
+    elif backend != 'ee':
+        raise ValueError(f"Unsupported backend: {backend}")
+
+    if mode not in ('batch', 'sequential'):
+        raise ValueError(f"Unsupported mode: {mode}")
+
+    # The context variable is only set around each step: a consumer may resume the generator in another context
+    metrics = current_request.get()
+    owns_metrics = metrics is None
+    if owns_metrics:
+        metrics = RequestMetrics(f"{interval} report {start_date}..{end_date}")
+
+    try:
+        with use_request(metrics):
+            initialize_earth_engine()
+
+        print("\n🚀 Fetching pollutant data for AOI and time range:")
+        print(f"   Start Date: {start_date}")
+        print(f"   End Date: {end_date}")
+        print(f"   Interval: {interval}")
+        use_daily_base = daily_base and mode == 'batch'
+        print(f"   Mode: {mode}, scale mode: {scale_mode}, daily base: {use_daily_base}")
+        print(f"   AOI: {aoi['coordinates']}")
+
+        aoi_geometry = ee.Geometry.Polygon(aoi['coordinates'])
+        aoi_key = result_cache.aoi_hash(aoi) if use_cache else None
+        date_ranges = generate_date_ranges(start_date, end_date, interval)
+        request_end = to_date(end_date)
+        print(f"📆 Total {interval}s in range: {len(date_ranges)}")
+
+        area_m2 = polygon_area_m2(aoi)
+        plans = {pollutant['name']: plan_reduction(pollutant, area_m2, scale_mode) for pollutant in POLLUTANTS}
+        print(f"📏 AOI area: {area_m2 / 1e6:.1f} km²")
+
+        chunks = list(period_chunks(date_ranges, first_chunk or len(date_ranges)))
+        progress.emit("periods_planned", periods=len(date_ranges), interval=interval, pollutants=len(POLLUTANTS))
+        # One step per pollutant and chunk; a whole-range report is "pollutant N of 7"
+        pollutants_done = progress.StepCounter("pollutant_done", len(POLLUTANTS) * len(chunks), key="pollutant")
+
+        total = 0
+        for chunk in chunks:
+            chunk_start = ee.Date(chunk[0].start.isoformat())
+            chunk_end = ee.Date(min(chunk[-1].end, request_end).isoformat())
+
+            # Pollutants hit independent collections, so they are fetched concurrently
+            if use_daily_base:
+                tasks = {
+                    pollutant['name']: partial(
+                        fetch_pollutant_rollup, pollutant, aoi, chunk, interval, plans[pollutant['name']], request_end,
+                        aoi_key=aoi_key
+                    )
+                    for pollutant in POLLUTANTS
+                }
+            else:
+                tasks = {
+                    pollutant['name']: partial(
+                        fetch_pollutant_series, pollutant, aoi_geometry, chunk_start, chunk_end, chunk, interval, mode,
+                        plans[pollutant['name']], aoi_key=aoi_key, request_end=request_end, aoi=aoi
+                    )
+                    for pollutant in POLLUTANTS
+                }
+
+            tasks = {name: pollutants_done.wrap(name, task) for name, task in tasks.items()}
+            with use_request(metrics):
+                results = run_parallel(tasks, max_workers=max_workers)
+
+            for pollutant in POLLUTANTS:
+                result = results.pop(pollutant['name'])
+                if isinstance(result, Exception):
+                    print(f"   ⚠️ Failed to fetch {pollutant['name']}: {result}")
+                    result = empty_records(pollutant, chunk, interval, plans[pollutant['name']])
+                total += len(result)
+                yield from result
+
+        print("\n✅ Data fetching complete. Total records:", total)
 
+    finally:
+        if owns_metrics:
+            log_usage(metrics)
+
+def fetch_pollutant_data(aoi: Dict, start_date: str, end_date: str, interval: Literal['day', 'week', 'month', 'year'],
+                         mode: Literal['batch', 'sequential'] = 'batch', max_workers: Optional[int] = None,
+                         use_cache: bool = RESULT_CACHE_ENABLED,
+                         backend: Literal['ee', 's5p_local'] = 'ee',
+                         scale_mode: ScaleMode = 'fast',
+                         daily_base: bool = DAILY_BASE_ENABLED) -> List[Dict]:
+    """ Collect every record in one pass; use iter_pollutant_data to stream them instead. """
+    return list(iter_pollutant_data(
+        aoi, start_date, end_date, interval, mode=mode, max_workers=max_workers, use_cache=use_cache,
+        backend=backend, scale_mode=scale_mode, first_chunk=None, daily_base=daily_base
+    ))
+
+
+# Upper bound on features (sites × periods) materialised by a single multi-AOI getInfo call
+MULTI_MAX_FEATURES = 5000
+
+def build_multi_collection(pollutant: Dict, sites: ee.FeatureCollection, start_date: ee.Date, end_date: ee.Date,
+                           date_ranges: List[Period], plan: ReducePlan) -> ee.FeatureCollection:
+    """ One reduceRegions pass over every site per period, flattened into a site × period FeatureCollection. """
+    ranges = ee.List([
+        ee.List([period.start.isoformat(), period.end.isoformat(), period.label]) for period in date_ranges
+    ])
+    collection = ee.ImageCollection(pollutant['dataset']) \
+        .filterBounds(sites) \
+        .filterDate(start_date, end_date) \
+        .select(pollutant['band'])
+
+    def reduce_period(date_range):
+        date_range = ee.List(date_range)
+        start = ee.Date(date_range.get(0))
+        end = ee.Date(date_range.get(1))
+        reduced = collection.filterDate(start, end).mean().reduceRegions(
+            collection=sites,
+            reducer=ee.Reducer.mean(),
+            scale=plan.scale,
+            tileScale=plan.tile_scale
+        )
+        return reduced.map(lambda feature: ee.Feature(None, {
+            'site': feature.get('site'),
+            'period': date_range.get(2),
+            'value': feature.get('mean'),
+        }))
+
+    return ee.FeatureCollection(ranges.map(reduce_period)).flatten()
+
+def fetch_pollutant_multi(pollutant: Dict, aois: List[Dict], sites: ee.FeatureCollection, start_date: ee.Date,
+                          end_date: ee.Date, date_ranges: List[Period], interval: Literal['day', 'week', 'month', 'year'],
+                          plan: ReducePlan) -> List[List[Dict]]:
+    """ Records for one pollutant, one list per AOI in input order. """
+    with pollutant_scope(pollutant['name']):
+        print(f"\n🔎 Processing pollutant: {pollutant['name']} for {len(aois)} sites at scale {plan.scale} m")
+
+        per_site = [[] for _ in aois]
+        periods_per_call = max(1, MULTI_MAX_FEATURES // len(aois))
+
+        for offset in range(0, len(date_ranges), periods_per_call):
+            chunk = date_ranges[offset:offset + periods_per_call]
+
+            try:
+                features = get_info(build_multi_collection(pollutant, sites, start_date, end_date, chunk, plan))['features']
             except Exception as e:
-                print(f"      ⚠️ Failed to compute mean for {pollutant['name']} in {period_label}: {e}")
-                all_data.append({
-                    "period": period_label,
-                    "pollutant": pollutant['name'],
-                    "value": None,
-                    "interval": interval
-                })
-
-    print("\n✅ Data fetching complete. Total records:", len(all_data))
-    return all_data
+                # Fall back to one batched series per site for this chunk
+                print(f"   ⚠️ {pollutant['name']}: reduceRegions request failed, falling back to per-site requests: {e}")
+                for index, aoi in enumerate(aois):
+                    per_site[index].extend(fetch_pollutant_batched(
+                        pollutant, ee.Geometry.Polygon(aoi['coordinates']), start_date, end_date, chunk, interval, plan,
+                        aoi=aoi
+                    ))
+                continue
+
+            values = {
+                (int(f['properties']['site']), f['properties']['period']): f['properties'].get('value') for f in features
+            }
+            for index in range(len(aois)):
+                per_site[index].extend(
+                    make_record(pollutant, period.label, values.get((index, period.label)), interval, plan)
+                    for period in chunk
+                )
+
+        return per_site
+
+def fetch_pollutant_data_multi(aois: List[Dict], start_date: str, end_date: str,
+                               interval: Literal['day', 'week', 'month', 'year'],
+                               scale_mode: ScaleMode = 'fast', max_workers: Optional[int] = None) -> List[List[Dict]]:
+    """
+    Fetch pollutant records for many AOIs over the same dates.
+    Each pollutant × period is one reduceRegions call covering every AOI; returns one record list per AOI.
+    """
+    with track_request(f"{interval} batch report for {len(aois)} sites {start_date}..{end_date}"):
+        initialize_earth_engine()
+
+        print(f"\n🚀 Fetching pollutant data for {len(aois)} AOIs:")
+        print(f"   Start Date: {start_date}")
+        print(f"   End Date: {end_date}")
+        print(f"   Interval: {interval}")
+        print(f"   Scale mode: {scale_mode}")
+
+        sites = ee.FeatureCollection([
+            ee.Feature(ee.Geometry.Polygon(aoi['coordinates']), {'site': index}) for index, aoi in enumerate(aois)
+        ])
+        date_ranges = generate_date_ranges(start_date, end_date, interval)
+        start_date = ee.Date(start_date)
+        end_date = ee.Date(end_date)
+        print(f"📆 Total {interval}s in range: {len(date_ranges)}")
+
+        # reduceRegions uses one scale for all sites, so plan for the largest AOI
+        largest_area = max(polygon_area_m2(aoi) for aoi in aois)
+        plans = {pollutant['name']: plan_reduction(pollutant, largest_area, scale_mode) for pollutant in POLLUTANTS}
+        progress.emit("periods_planned", periods=len(date_ranges), interval=interval, pollutants=len(POLLUTANTS),
+                      sites=len(aois))
+
+        pollutants_done = progress.StepCounter("pollutant_done", len(POLLUTANTS), key="pollutant")
+        results = run_parallel({
+            pollutant['name']: pollutants_done.wrap(pollutant['name'], partial(
+                fetch_pollutant_multi, pollutant, aois, sites, start_date, end_date, date_ranges, interval,
+                plans[pollutant['name']]
+            ))
+            for pollutant in POLLUTANTS
+        }, max_workers=max_workers)
+
+        all_data = [[] for _ in aois]
+        for pollutant in POLLUTANTS:
+            result = results[pollutant['name']]
+            if isinstance(result, Exception):
+                print(f"   ⚠️ Failed to fetch {pollutant['name']}: {result}")
+                result = [empty_records(pollutant, date_ranges, interval, plans[pollutant['name']]) for _ in aois]
+            for index, records in enumerate(result):
+                all_data[index].extend(records)
+
+        print(f"\n✅ Data fetching complete. Total records: {sum(len(records) for records in all_data)}")
+        return all_data
+
+
+def estimate_request_cost(aoi: Dict, start_date: str, end_date: str, interval: Literal['day', 'week', 'month', 'year'],
+                          mode: Literal['batch', 'sequential'] = 'batch', scale_mode: ScaleMode = 'fast',
+                          daily_base: bool = DAILY_BASE_ENABLED, first_chunk: Optional[int] = None) -> Dict:
+    """
+    Dry-run estimate of an iter_pollutant_data call, computed locally without any Earth Engine request.
+    `first_chunk` is the streaming chunk size (None for reports, which fetch every period at once).
+    Pixels are AOI pixels at the planned scale per reduced period (per day with the daily base);
+    cached periods and fallbacks after failed calls are not counted.
+    """
+    date_ranges = generate_date_ranges(start_date, end_date, interval)
+    request_end = to_date(end_date)
+    use_daily_base = daily_base and mode == 'batch'
+    area_m2 = polygon_area_m2(aoi)
+
+    # Chunks are fetched separately (see iter_pollutant_data); with the daily base each chunk reduces its days
+    chunks = list(period_chunks(date_ranges, first_chunk or len(date_ranges)))
+    if use_daily_base:
+        chunk_sizes = [len(generate_periods(chunk[0].start, min(chunk[-1].end, request_end), 'day')) for chunk in chunks]
+    else:
+        chunk_sizes = [len(chunk) for chunk in chunks]
+    reduced_periods = sum(chunk_sizes)
+
+    pollutants = {}
+    for pollutant in POLLUTANTS:
+        plan = plan_reduction(pollutant, area_m2, scale_mode)
+        tiles = tile_count(plan.estimated_pixels) if plan.estimated_pixels > TILE_PIXEL_THRESHOLD else 1
+        if tiles > 1 or mode == 'batch':
+            calls = tiles * sum(math.ceil(size / BATCH_MAX_PERIODS) for size in chunk_sizes)
+        else:
+            calls = reduced_periods
+        pollutants[pollutant['name']] = {
+            "scale": plan.scale,
+            "tile_scale": plan.tile_scale,
+            "tiles": tiles,
+            "calls": calls,
+            "pixels": plan.estimated_pixels * reduced_periods,
+        }
+
+    return {
+        "periods": len(date_ranges),
+        "reduced_periods": reduced_periods,
+        "daily_base": use_daily_base,
+        "area_km2": round(area_m2 / 1e6, 2),
+        "calls": sum(item["calls"] for item in pollutants.values()),
+        "pixels": sum(item["pixels"] for item in pollutants.values()),
+        "pollutants": pollutants,
+    }
+
+
+def estimate_multi_request_cost(aois: List[Dict], start_date: str, end_date: str,
+                                interval: Literal['day', 'week', 'month', 'year'],
+                                scale_mode: ScaleMode = 'fast') -> Dict:
+    """
+    Dry-run estimate of a fetch_pollutant_data_multi call for all AOIs together. Every site is reduced at the
+    scale planned for the largest AOI; per-site fallbacks after a failed reduceRegions call are not counted.
+    """
+    date_ranges = generate_date_ranges(start_date, end_date, interval)
+    areas = [polygon_area_m2(aoi) for aoi in aois]
+    periods_per_call = max(1, MULTI_MAX_FEATURES // len(aois))
+
+    pollutants = {}
+    for pollutant in POLLUTANTS:
+        plan = plan_reduction(pollutant, max(areas), scale_mode)
+        pollutants[pollutant['name']] = {
+            "scale": plan.scale,
+            "tile_scale": plan.tile_scale,
+            "calls": math.ceil(len(date_ranges) / periods_per_call),
+            "pixels": math.ceil(sum(areas) / plan.scale ** 2) * len(date_ranges),
+        }
+
+    return {
+        "periods": len(date_ranges),
+        "sites": len(aois),
+        "area_km2": round(sum(areas) / 1e6, 2),
+        "calls": sum(item["calls"] for item in pollutants.values()),
+        "pixels": sum(item["pixels"] for item in pollutants.values()),
+        "pollutants": pollutants,
+    }
+
+
+def load_cached_pollutant_data(aoi: Dict, start_date: str, end_date: str,
+                               interval: Literal['day', 'week', 'month', 'year'],
+                               scale_mode: ScaleMode = 'fast', daily_base: bool = DAILY_BASE_ENABLED) -> Optional[List[Dict]]:
+    """
+    The records iter_pollutant_data would produce (batch mode), read from the result cache only.
+    No Earth Engine request is made; returns None as soon as any pollutant is missing a period (or day).
+    """
+    aoi_key = result_cache.aoi_hash(aoi)
+    date_ranges = generate_date_ranges(start_date, end_date, interval)
+    request_end = to_date(end_date)
+    area_m2 = polygon_area_m2(aoi)
+    if not date_ranges:
+        return []
+
+    records = []
+    for pollutant in POLLUTANTS:
+        plan = plan_reduction(pollutant, area_m2, scale_mode)
+
+        if daily_base:
+            days = generate_periods(date_ranges[0].start, min(date_ranges[-1].end, request_end), 'day')
+            cached = result_cache.load_daily_base(aoi_key, pollutant, plan.scale, days)
+            if len(cached) < len(days):
+                return None
+            sums = np.array([cached[day.start][0] for day in days])
+            weights = np.array([cached[day.start][1] for day in days])
+            values = roll_up(days, sums, weights, np.ones(len(days), dtype=bool), date_ranges)
+        else:
+            cached = result_cache.load_cached(aoi_key, pollutant, interval, plan.scale, date_ranges, request_end)
+            keys = [(period.start, result_cache.effective_end(period, request_end)) for period in date_ranges]
+            if any(key not in cached for key in keys):
+                return None
+            values = [cached[key] for key in keys]
+
+        records.extend(make_record(pollutant, period.label, value, interval, plan)
+                       for period, value in zip(date_ranges, values))
+    return records
 
 
 # # Test block
@@ -0,0 +1,51 @@
+import hashlib
+import json
+import math
+from typing import Dict, List, Tuple
+
+
+def canonical_ring(ring: List[List[float]]) -> List[Tuple[float, float]]:
+    """
+    Normalise a polygon ring so equivalent AOIs hash identically:
+    rounded to ~10 cm, closing vertex dropped, counter-clockwise, starting at the smallest vertex.
+    """
+    points = [(round(lon, 6), round(lat, 6)) for lon, lat in ring]
+    if len(points) > 1 and points[0] == points[-1]:
+        points = points[:-1]
+
+    signed_area = sum(
+        x1 * y2 - x2 * y1
+        for (x1, y1), (x2, y2) in zip(points, points[1:] + points[:1])
+    )
+    if signed_area < 0:
+        points.reverse()
+
+    start = points.index(min(points))
+    return points[start:] + points[:start]
+
+
+def aoi_hash(aoi: Dict) -> str:
+    rings = [canonical_ring(ring) for ring in aoi['coordinates']]
+    payload = json.dumps({"type": aoi.get('type', 'Polygon'), "coordinates": rings}, separators=(',', ':'))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+EARTH_RADIUS_M = 6371008.8
+
+
+def ring_area_m2(ring: List[List[float]]) -> float:
+    """ Spherical area of a lon/lat ring (Chamberlain & Duquette), unsigned. """
+    points = [(math.radians(lon), math.radians(lat)) for lon, lat in ring]
+    if len(points) > 1 and points[0] == points[-1]:
+        points = points[:-1]
+
+    total = 0.0
+    for (lon1, lat1), (lon2, lat2) in zip(points, points[1:] + points[:1]):
+        total += (lon2 - lon1) * (2 + math.sin(lat1) + math.sin(lat2))
+    return abs(total) * EARTH_RADIUS_M ** 2 / 2
+
+
+def polygon_area_m2(aoi: Dict) -> float:
+    """ Outer ring area minus holes. """
+    rings = aoi['coordinates']
+    return max(0.0, ring_area_m2(rings[0]) - sum(ring_area_m2(ring) for ring in rings[1:]))
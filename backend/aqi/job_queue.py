@@ -0,0 +1,179 @@
+import json
+import os
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional
+
+from config import (
+    JOB_LEASE_SECONDS, JOB_MAX_ATTEMPTS, JOB_RETRY_BASE_SECONDS, JOB_RETRY_MAX_SECONDS, JOB_POLL_SECONDS,
+    JOB_WORKER_CONCURRENCY,
+)
+from db.database import SessionLocal
+from db.crud import claim_report_job, enqueue_report_job, extend_report_job_lease, finish_report_job
+from db.models import ReportJob
+from aqi import progress
+
+# Job kind -> handler called with the job payload as keyword arguments; its return value is stored as JSON
+handlers: Dict[str, Callable[..., Optional[Dict]]] = {}
+
+
+def register(kind: str):
+    def decorator(fn: Callable[..., Optional[Dict]]):
+        handlers[kind] = fn
+        return fn
+    return decorator
+
+
+def enqueue(kind: str, payload: Dict, dedupe_key: Optional[str] = None, user_id: Optional[str] = None,
+            max_attempts: int = JOB_MAX_ATTEMPTS) -> ReportJob:
+    """ Persist a job for the workers; an identical queued or running job (same `dedupe_key` and user) is reused. """
+    db = SessionLocal()
+    try:
+        return enqueue_report_job(db, kind, json.dumps(payload), datetime.now(timezone.utc),
+                                  dedupe_key=dedupe_key, user_id=user_id, max_attempts=max_attempts)
+    finally:
+        db.close()
+
+
+def retry_delay(attempts: int) -> float:
+    return min(JOB_RETRY_BASE_SECONDS * 2 ** (attempts - 1), JOB_RETRY_MAX_SECONDS)
+
+
+class Worker:
+    """
+    Runs queued jobs on `concurrency` threads. Any number of workers (threads in the API process or separate
+    `worker.py` processes on other hosts) can share the queue: each job is leased to one worker at a time and
+    the lease is renewed while it runs. Failed jobs are retried with exponential backoff up to their
+    max_attempts; jobs of a worker that died are picked up again once their lease expires.
+    """
+
+    def __init__(self, concurrency: int = JOB_WORKER_CONCURRENCY, lease_seconds: float = JOB_LEASE_SECONDS,
+                 poll_seconds: float = JOB_POLL_SECONDS, kinds: Optional[List[str]] = None):
+        self.concurrency = concurrency
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self.kinds = kinds
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.stopping = threading.Event()
+        self.heartbeat_stopping = threading.Event()
+        self.lock = threading.Lock()
+        self.running: Dict[str, str] = {}  # job id -> kind
+        self.threads: List[threading.Thread] = []
+        self.heartbeat: Optional[threading.Thread] = None
+
+    def start(self):
+        self.stopping.clear()
+        self.heartbeat_stopping.clear()
+        self.threads = [
+            threading.Thread(target=self._loop, name=f"job-worker-{index}", daemon=True)
+            for index in range(self.concurrency)
+        ]
+        self.heartbeat = threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True)
+        for thread in self.threads + [self.heartbeat]:
+            thread.start()
+        print(f"👷 Job worker {self.worker_id} started with {self.concurrency} slot(s)")
+
+    def stop(self, timeout: Optional[float] = None):
+        """ Stop claiming jobs and wait for the running ones to finish; leases are renewed until they do. """
+        self.stopping.set()
+        for thread in self.threads:
+            thread.join(timeout)
+        self.heartbeat_stopping.set()
+        if self.heartbeat is not None:
+            self.heartbeat.join(timeout)
+        self.threads, self.heartbeat = [], None
+
+    def _loop(self):
+        while not self.stopping.is_set():
+            job = self.claim()
+            if job is None:
+                self.stopping.wait(self.poll_seconds)
+                continue
+            self.run(job)
+
+    def claim(self) -> Optional[ReportJob]:
+        db = SessionLocal()
+        try:
+            return claim_report_job(db, self.worker_id, datetime.now(timezone.utc), self.lease_seconds,
+                                    kinds=self.kinds or list(handlers))
+        except Exception as e:
+            print(f"⚠️ Failed to claim a job: {e}")
+            return None
+        finally:
+            db.close()
+
+    def run(self, job: ReportJob):
+        with self.lock:
+            self.running[job.id] = job.kind
+        print(f"▶️ Job {job.id} ({job.kind}) attempt {job.attempts}/{job.max_attempts}")
+
+        # Events of earlier attempts are kept, so watchers see one continuous log
+        job_progress = progress.JobProgress(job.id, self.worker_id, progress.load_events(job.progress))
+        result, error = None, None
+        try:
+            with progress.track(job_progress):
+                job_progress.emit("started", attempt=job.attempts, max_attempts=job.max_attempts)
+                handler = handlers.get(job.kind)
+                if handler is None:
+                    raise LookupError(f"No handler registered for job kind {job.kind!r}")
+                result = handler(**json.loads(job.payload))
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        finally:
+            with self.lock:
+                self.running.pop(job.id, None)
+
+        now = datetime.now(timezone.utc)
+        retry_at = None
+        if error is not None and job.attempts < job.max_attempts:
+            retry_at = now + timedelta(seconds=retry_delay(job.attempts))
+
+        # The outcome event is stored with the outcome itself and published once both are committed
+        if error is None:
+            event = job_progress.add("succeeded")
+        elif retry_at is not None:
+            event = job_progress.add("retrying", error=error, retry_at=retry_at.isoformat())
+        else:
+            event = job_progress.add("failed", error=error)
+
+        db = SessionLocal()
+        try:
+            finished = finish_report_job(db, job.id, self.worker_id, now,
+                                         result=json.dumps(result) if result is not None else None,
+                                         error=error, retry_at=retry_at, progress=job_progress.dumps())
+        except Exception as e:
+            print(f"⚠️ Failed to record the outcome of job {job.id}, its lease will expire: {e}")
+            return
+        finally:
+            db.close()
+
+        if not finished:
+            print(f"⚠️ Job {job.id} lost its lease while running; another worker owns it now")
+            return
+        progress.hub.publish(job.id, event)
+
+        if error is None:
+            print(f"✅ Job {job.id} ({job.kind}) succeeded")
+        elif retry_at is not None:
+            print(f"🔁 Job {job.id} failed ({error}), retrying at {retry_at.isoformat()}")
+        else:
+            print(f"❌ Job {job.id} failed after {job.attempts} attempt(s): {error}")
+
+    def _heartbeat(self):
+        # Renew leases well before they expire so a slow but healthy job is never claimed twice
+        while not self.heartbeat_stopping.wait(self.lease_seconds / 3):
+            with self.lock:
+                job_ids = list(self.running)
+            if not job_ids:
+                continue
+            db = SessionLocal()
+            try:
+                now = datetime.now(timezone.utc)
+                for job_id in job_ids:
+                    extend_report_job_lease(db, job_id, self.worker_id, now, self.lease_seconds)
+            except Exception as e:
+                print(f"⚠️ Failed to renew job leases: {e}")
+            finally:
+                db.close()
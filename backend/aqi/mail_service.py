@@ -0,0 +1,240 @@
+import os
+import queue
+import smtplib
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from email.message import EmailMessage
+from typing import Dict, List, Optional, Tuple
+
+from config import (
+    MAIL_SERVER, MAIL_PORT, MAIL_USERNAME, MAIL_PASSWORD, MAIL_FROM, MAIL_TLS, MAIL_SSL,
+    MAIL_TIMEOUT_SECONDS, MAIL_CONNECTIONS, MAIL_IDLE_SECONDS, MAIL_BATCH_SIZE, MAIL_POLL_SECONDS,
+    MAIL_LEASE_SECONDS, MAIL_MAX_ATTEMPTS, MAIL_RETRY_BASE_SECONDS, MAIL_RETRY_MAX_SECONDS,
+)
+from db.database import SessionLocal
+from db.crud import claim_emails, enqueue_email, finish_emails
+from db.models import OutboundEmail
+
+
+class SmtpPool:
+    """
+    Up to `size` persistent SMTP sessions. A session is connected, upgraded to TLS and logged in once, then
+    reused for every message until it breaks or sits idle for `idle_seconds` (servers drop idle clients).
+    """
+
+    def __init__(self, size: int = MAIL_CONNECTIONS, idle_seconds: float = MAIL_IDLE_SECONDS):
+        self.idle_seconds = idle_seconds
+        self.slots = threading.BoundedSemaphore(size)
+        self.idle: "queue.LifoQueue[Tuple[smtplib.SMTP, float]]" = queue.LifoQueue()
+
+    def connect(self) -> smtplib.SMTP:
+        if MAIL_SSL:
+            smtp = smtplib.SMTP_SSL(MAIL_SERVER, MAIL_PORT, timeout=MAIL_TIMEOUT_SECONDS)
+        else:
+            smtp = smtplib.SMTP(MAIL_SERVER, MAIL_PORT, timeout=MAIL_TIMEOUT_SECONDS)
+            if MAIL_TLS:
+                smtp.starttls()
+        # A local stand-in (e.g. aiosmtpd) runs without credentials
+        if MAIL_USERNAME:
+            smtp.login(MAIL_USERNAME, MAIL_PASSWORD)
+        return smtp
+
+    def acquire(self) -> smtplib.SMTP:
+        """ A live session, reused when one is idle; blocks while all `size` sessions are in use. """
+        self.slots.acquire()
+        try:
+            while True:
+                try:
+                    smtp, released_at = self.idle.get_nowait()
+                except queue.Empty:
+                    return self.connect()
+                if time.monotonic() - released_at < self.idle_seconds and self._alive(smtp):
+                    return smtp
+                self._close(smtp)
+        except BaseException:
+            self.slots.release()
+            raise
+
+    def release(self, smtp: smtplib.SMTP, broken: bool = False):
+        if broken:
+            self._close(smtp)
+        else:
+            self.idle.put((smtp, time.monotonic()))
+        self.slots.release()
+
+    def close(self):
+        while True:
+            try:
+                smtp, _ = self.idle.get_nowait()
+            except queue.Empty:
+                return
+            self._close(smtp)
+
+    @staticmethod
+    def _alive(smtp: smtplib.SMTP) -> bool:
+        try:
+            return smtp.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    @staticmethod
+    def _close(smtp: smtplib.SMTP):
+        try:
+            smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            smtp.close()
+
+
+def build_message(email: OutboundEmail) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = MAIL_FROM or MAIL_USERNAME
+    message["To"] = email.to_email
+    message["Subject"] = email.subject
+    message.set_content(email.body, subtype=email.subtype)
+    return message
+
+
+def is_permanent(error: Exception) -> bool:
+    """ 5xx replies (unknown mailbox, rejected content) will not succeed on retry; everything else might. """
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPAuthenticationError):
+        return False
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code >= 500
+    return False
+
+
+def retry_delay(attempts: int) -> float:
+    return min(MAIL_RETRY_BASE_SECONDS * 2 ** (attempts - 1), MAIL_RETRY_MAX_SECONDS)
+
+
+class MailSender:
+    """
+    Drains the email outbox: each thread claims a batch of due messages and sends them over one pooled
+    SMTP session. Messages that fail with a temporary error are retried with exponential backoff.
+    """
+
+    def __init__(self, threads: int = MAIL_CONNECTIONS, batch_size: int = MAIL_BATCH_SIZE,
+                 poll_seconds: float = MAIL_POLL_SECONDS, lease_seconds: float = MAIL_LEASE_SECONDS):
+        self.pool = SmtpPool(size=threads)
+        self.thread_count = threads
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        self.lease_seconds = lease_seconds
+        self.sender_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.stopping = threading.Event()
+        self.wake = threading.Event()
+        self.threads: List[threading.Thread] = []
+
+    def start(self):
+        if self.threads:
+            return
+        self.stopping.clear()
+        self.threads = [
+            threading.Thread(target=self._loop, name=f"mail-sender-{index}", daemon=True)
+            for index in range(self.thread_count)
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        self.stopping.set()
+        self.wake.set()
+        for thread in self.threads:
+            thread.join(timeout)
+        self.threads = []
+        self.pool.close()
+
+    def notify(self):
+        """ Send without waiting for the next poll; messages queued by other processes wait for the poll. """
+        self.wake.set()
+
+    def _loop(self):
+        while not self.stopping.is_set():
+            try:
+                sent = self.send_due()
+            except Exception as e:
+                print(f"⚠️ Mail sender error: {e}")
+                sent = 0
+            # A full batch suggests more is waiting
+            if sent < self.batch_size:
+                self.wake.wait(self.poll_seconds)
+                self.wake.clear()
+
+    def send_due(self) -> int:
+        """ Claim and send one batch; returns the number of messages claimed. """
+        db = SessionLocal()
+        try:
+            emails = claim_emails(db, self.sender_id, datetime.now(timezone.utc), self.lease_seconds, self.batch_size)
+            if not emails:
+                return 0
+            outcomes = self.send_batch(emails)
+            finish_emails(db, self.sender_id, datetime.now(timezone.utc), outcomes)
+            return len(emails)
+        finally:
+            db.close()
+
+    def send_batch(self, emails: List[OutboundEmail]) -> List[Dict]:
+        errors: Dict[str, Exception] = {}
+        try:
+            smtp = self.pool.acquire()
+        except (smtplib.SMTPException, OSError) as e:
+            errors = {email.id: e for email in emails}
+        else:
+            broken = False
+            try:
+                for email in emails:
+                    if broken:
+                        errors[email.id] = smtplib.SMTPServerDisconnected("Connection lost earlier in the batch")
+                        continue
+                    try:
+                        smtp.send_message(build_message(email))
+                    except smtplib.SMTPServerDisconnected as e:
+                        broken = True
+                        errors[email.id] = e
+                    except smtplib.SMTPException as e:
+                        # Refused by the server (SMTPException subclasses OSError); the session is still usable
+                        errors[email.id] = e
+                    except OSError as e:
+                        broken = True
+                        errors[email.id] = e
+            finally:
+                self.pool.release(smtp, broken)
+
+        now = datetime.now(timezone.utc)
+        outcomes = []
+        for email in emails:
+            error = errors.get(email.id)
+            if error is None:
+                print(f"✅ Email sent to {email.to_email}")
+                outcomes.append({"id": email.id})
+                continue
+
+            retry_at = None
+            if not is_permanent(error) and email.attempts < email.max_attempts:
+                retry_at = now + timedelta(seconds=retry_delay(email.attempts))
+                print(f"🔁 Email to {email.to_email} failed ({error}), retrying at {retry_at.isoformat()}")
+            else:
+                print(f"❌ Email to {email.to_email} failed after {email.attempts} attempt(s): {error}")
+            outcomes.append({"id": email.id, "error": f"{type(error).__name__}: {error}", "retry_at": retry_at})
+        return outcomes
+
+
+sender = MailSender()
+
+
+def send_mail(to_email: str, subject: str, body: str, subtype: str = "plain",
+              max_attempts: int = MAIL_MAX_ATTEMPTS) -> OutboundEmail:
+    """ Queue a message in the outbox and return immediately; the sender delivers it. """
+    db = SessionLocal()
+    try:
+        email = enqueue_email(db, to_email, subject, body, datetime.now(timezone.utc), subtype=subtype,
+                              max_attempts=max_attempts)
+    finally:
+        db.close()
+    sender.notify()
+    return email
@@ -0,0 +1,274 @@
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from config import (
+    NARRATIVE_MODEL, NARRATIVE_TIMEOUT_SECONDS, NARRATIVE_CALL_TIMEOUT_SECONDS,
+    NARRATIVE_BATCH_WINDOW_MS, NARRATIVE_BATCH_MAX, NARRATIVE_WORKERS,
+)
+from db.database import SessionLocal
+from db.crud import get_report_narratives, upsert_report_narratives
+
+# Bump when the prompts change so cached sections are regenerated
+PROMPT_VERSION = 1
+
+# Narrative sections of a report and the task given to the model for each
+NARRATIVE_SECTIONS = {
+    "summary": (
+        "Write a 3-4 sentence executive summary of the air quality in {region} for an ESG audit. "
+        "Mention the overall trend, the worst period and the pollutants driving it. Plain text, no markdown."
+    ),
+    "recommendations": (
+        "Give 3 concise, specific recommendations to reduce the pollution observed in {region}, "
+        "one per line starting with '- '. Plain text, no markdown."
+    ),
+}
+
+# fpdf core fonts are latin-1 only
+PUNCTUATION = str.maketrans({"‘": "'", "’": "'", "“": '"', "”": '"',
+                             "–": "-", "—": "-", "•": "-", "…": "..."})
+
+
+def section_prompt(section: str, region: str, period_reports: List[Dict]) -> str:
+    # Rounded so float noise in the aggregates does not defeat the cache
+    rows = [
+        {
+            "period": report["period"],
+            "aqi": report["aqi"]["value"],
+            "category": report["aqi"]["category"],
+            "pollutants": {pollutant: round(value, 6) for pollutant, value in report["pollutants"].items()},
+        }
+        for report in period_reports
+    ]
+    return (
+        f"{NARRATIVE_SECTIONS[section].format(region=region)}\n"
+        f"Period data (CPCB AQI, mean pollutant columns): {json.dumps(rows, sort_keys=True, separators=(',', ':'))}"
+    )
+
+
+def prompt_key(model_name: str, prompt: str) -> str:
+    return hashlib.sha256(f"{model_name}:{PROMPT_VERSION}:{prompt}".encode()).hexdigest()
+
+
+def clean_text(text: str) -> str:
+    return text.strip().translate(PUNCTUATION).encode("latin-1", "replace").decode("latin-1")
+
+
+# ------------------ Models ------------------
+
+class StubModel:
+    """ Deterministic local stand-in for tests and offline runs; `latency` simulates a slow model. """
+
+    def __init__(self, latency: float = 0.0):
+        self.name = "stub"
+        self.latency = latency
+        self.calls = 0
+
+    def generate(self, prompts: List[str]) -> List[str]:
+        self.calls += 1
+        time.sleep(self.latency)
+        return [f"Narrative for: {prompt.splitlines()[0][:80]}" for prompt in prompts]
+
+
+class GeminiModel:
+    """ Gemini via google-generativeai; several prompts are answered by one call returning a JSON array. """
+
+    def __init__(self, name: str):
+        import google.generativeai as genai
+
+        genai.configure(api_key=os.getenv("GOOGLE_GEMINI_API_KEY"))
+        self.name = name
+        self.model = genai.GenerativeModel(name)
+
+    def generate(self, prompts: List[str]) -> List[str]:
+        options = {"timeout": NARRATIVE_CALL_TIMEOUT_SECONDS}
+        if len(prompts) == 1:
+            return [self.model.generate_content(prompts[0], request_options=options).text]
+
+        tasks = "\n\n".join(f"Task {i + 1}:\n{prompt}" for i, prompt in enumerate(prompts))
+        response = self.model.generate_content(
+            f"Answer each of the {len(prompts)} tasks below independently. "
+            f"Return only a JSON array of {len(prompts)} strings, one answer per task, in order.\n\n{tasks}",
+            generation_config={"response_mime_type": "application/json"},
+            request_options=options,
+        )
+        answers = json.loads(response.text)
+        if not isinstance(answers, list) or len(answers) != len(prompts):
+            raise ValueError(f"Expected {len(prompts)} answers from {self.name}, got {response.text[:200]!r}")
+        return [str(answer) for answer in answers]
+
+
+def load_model(name: str = NARRATIVE_MODEL):
+    return StubModel() if name == "stub" else GeminiModel(name)
+
+
+# ------------------ Cache ------------------
+
+def load_cached(keys: List[str]) -> Dict[str, str]:
+    db = SessionLocal()
+    try:
+        return get_report_narratives(db, keys)
+    finally:
+        db.close()
+
+
+def store_cached(model_name: str, texts: Dict[str, str]) -> None:
+    now = datetime.now(timezone.utc)
+    db = SessionLocal()
+    try:
+        upsert_report_narratives(db, [
+            {"prompt_hash": key, "model": model_name, "text": text, "created_at": now}
+            for key, text in texts.items()
+        ])
+    finally:
+        db.close()
+
+
+# ------------------ Batching ------------------
+
+class NarrativeBatcher:
+    """
+    Collects section prompts from concurrent reports for up to `window` seconds (or `max_batch` prompts)
+    and sends them to the model as one call. Prompts already queued or in flight are not sent again.
+    Results are cached when they arrive, even if every caller has stopped waiting.
+    """
+
+    def __init__(self, model, window: float, max_batch: int, workers: int):
+        self.model = model
+        self.window = window
+        self.max_batch = max_batch
+        self.lock = threading.Lock()
+        self.pending: Dict[str, Future] = {}
+        self.queue: "queue.Queue" = queue.Queue()
+        self.calls = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="narrative")
+        self.thread: Optional[threading.Thread] = None
+
+    def submit(self, key: str, prompt: str) -> Future:
+        with self.lock:
+            future = self.pending.get(key)
+            if future is not None:
+                return future
+            future = self.pending[key] = Future()
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._collect, name="narrative-batcher", daemon=True)
+                self.thread.start()
+        self.queue.put((key, prompt))
+        return future
+
+    def _collect(self):
+        while True:
+            batch = [self.queue.get()]
+            closes = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                remaining = closes - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self.calls.submit(self._call, batch)
+
+    def _call(self, batch):
+        keys = [key for key, _ in batch]
+        try:
+            texts = [clean_text(text) for text in self.model.generate([prompt for _, prompt in batch])]
+        except Exception as e:
+            print(f"⚠️ Narrative batch of {len(batch)} failed: {e}")
+            texts, error = [], e
+        else:
+            print(f"📝 Generated {len(batch)} narrative section(s) with {self.model.name}")
+            error = None
+            try:
+                store_cached(self.model.name, dict(zip(keys, texts)))
+            except Exception as e:
+                print(f"⚠️ Failed to cache narrative sections: {e}")
+
+        with self.lock:
+            futures = [self.pending.pop(key) for key in keys]
+        for i, future in enumerate(futures):
+            if error is None:
+                future.set_result(texts[i])
+            else:
+                future.set_exception(error)
+
+
+class PendingNarrative:
+    """ Narrative sections of one report, waited for no later than its deadline. """
+
+    def __init__(self, sections: Dict[str, Future], deadline: float):
+        self.sections = sections
+        self.deadline = deadline
+
+    def result(self) -> Optional[Dict[str, str]]:
+        """ Sections ready by the deadline; None when there are none, so the report keeps its static text. """
+        wait(self.sections.values(), timeout=max(0.0, self.deadline - time.monotonic()))
+        ready = {
+            section: future.result()
+            for section, future in self.sections.items()
+            if future.done() and future.exception() is None
+        }
+        if len(ready) < len(self.sections):
+            print(f"⏱️ Narrative incomplete at its deadline; using static text for {len(self.sections) - len(ready)} section(s)")
+        return ready or None
+
+
+class Narrator:
+    def __init__(self, model=None, timeout: float = NARRATIVE_TIMEOUT_SECONDS,
+                 window: float = NARRATIVE_BATCH_WINDOW_MS / 1000, max_batch: int = NARRATIVE_BATCH_MAX,
+                 workers: int = NARRATIVE_WORKERS):
+        self.model = model
+        self.timeout = timeout
+        self.window = window
+        self.max_batch = max_batch
+        self.workers = workers
+        self.lock = threading.Lock()
+        self.batcher: Optional[NarrativeBatcher] = None
+
+    def _batcher(self) -> NarrativeBatcher:
+        # The model client is only created once a narrative is actually requested
+        with self.lock:
+            if self.batcher is None:
+                self.batcher = NarrativeBatcher(self.model or load_model(), self.window, self.max_batch, self.workers)
+            return self.batcher
+
+    def request(self, region: str, period_reports: List[Dict]) -> Optional[PendingNarrative]:
+        """
+        Start generating every section without blocking; cached sections resolve immediately.
+        None when the model cannot be set up or asked, so the report keeps its static text instead of failing.
+        """
+        try:
+            return self._request(region, period_reports)
+        except Exception as e:
+            print(f"⚠️ Narrative unavailable, using static text: {e}")
+            return None
+
+    def _request(self, region: str, period_reports: List[Dict]) -> PendingNarrative:
+        deadline = time.monotonic() + self.timeout
+        batcher = self._batcher()
+        prompts = {section: section_prompt(section, region, period_reports) for section in NARRATIVE_SECTIONS}
+        keys = {section: prompt_key(batcher.model.name, prompt) for section, prompt in prompts.items()}
+
+        try:
+            cached = load_cached(list(keys.values()))
+        except Exception as e:
+            print(f"⚠️ Narrative cache unavailable: {e}")
+            cached = {}
+
+        sections = {}
+        for section, key in keys.items():
+            if key in cached:
+                sections[section] = Future()
+                sections[section].set_result(cached[key])
+            else:
+                sections[section] = batcher.submit(key, prompts[section])
+        return PendingNarrative(sections, deadline)
+
+
+narrator = Narrator()
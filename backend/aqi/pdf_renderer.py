@@ -0,0 +1,221 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from config import PDF_RENDER_WORKERS, PDF_OUTPUT_DIR
+
+# Bump whenever the layout changes so stored artifacts are not reused across layouts
+TEMPLATE_VERSION = 4
+
+# Static layout blocks, shared by every report
+RECOMMENDATIONS = """
+    - Reduce vehicle emissions & industrial pollution.
+    - Promote public transport & alternative energy sources.
+    - Stricter enforcement of environmental policies.
+    """
+
+CONCLUSION = """
+    Immediate actions are required to mitigate pollution effects.
+    """
+
+# (family, style, size) combinations used by the layout; loaded once per worker
+REPORT_FONTS = (("Arial", "B", 24), ("Arial", "B", 16), ("Arial", "B", 14), ("Arial", "", 12))
+
+
+def warm_up():
+    """ Process-pool initializer: load font metrics and exercise the layout once so renders start warm. """
+    from fpdf import FPDF
+
+    pdf = FPDF()
+    pdf.add_page()
+    for family, style, size in REPORT_FONTS:
+        pdf.set_font(family, style, size)
+        pdf.cell(0, 10, "VeriEarth", ln=True)
+    pdf.multi_cell(0, 10, RECOMMENDATIONS)
+    pdf.output(dest='S')
+
+
+def render_report(region: str, period_reports: List[Dict], scales: Dict[str, float], file_path: str,
+                  narrative: Optional[Dict[str, str]] = None, statistics: Optional[Dict[str, Dict]] = None) -> str:
+    """
+    Lay out one ESG audit report and write it to `file_path`. Runs inside a render worker.
+    `narrative` sections (summary, recommendations) replace the static text when present;
+    `statistics` adds the per-pollutant distribution over the whole report.
+    """
+    # Imported here so only render workers (not the API process) load fpdf
+    from fpdf import FPDF
+
+    narrative = narrative or {}
+    pdf = FPDF()
+    pdf.add_page()
+
+    # Header
+    pdf.set_font("Arial", "B", 24)
+    pdf.set_text_color(0, 128, 0)
+    pdf.cell(0, 10, "VeriEarth", ln=True, align="C")
+    pdf.set_text_color(0, 0, 0)
+    pdf.set_font("Arial", "B", 16)
+    pdf.cell(0, 10, "ESG Audit Report", ln=True, align="C")
+
+    pdf.set_font("Arial", "", 12)
+    # Only render inputs go into the layout: one stored artifact serves every identical request, so a render
+    # timestamp would show the first requester's date to everyone after
+    if period_reports:
+        pdf.cell(0, 10, f"Reporting Period: {period_reports[0]['period']} to {period_reports[-1]['period']}", ln=True)
+    pdf.cell(0, 10, f"Region: {region}", ln=True)
+    pdf.ln(10)
+
+    if "summary" in narrative:
+        pdf.set_font("Arial", "B", 14)
+        pdf.cell(0, 10, "Summary:", ln=True)
+        pdf.set_font("Arial", "", 12)
+        pdf.multi_cell(0, 10, narrative["summary"])
+        pdf.ln(10)
+
+    # Sampling scale chosen per dataset by the reduceRegion planner
+    if scales:
+        pdf.set_font("Arial", "B", 14)
+        pdf.cell(0, 10, "Sampling Scale:", ln=True)
+        pdf.set_font("Arial", "", 12)
+        for pollutant, scale in scales.items():
+            pdf.cell(0, 10, f"- {pollutant}: {scale:g} m", ln=True)
+        pdf.ln(10)
+
+    pdf.set_font("Arial", "B", 14)
+    for report in period_reports:
+        pdf.cell(0, 10, f"Period: {report['period']}", ln=True)
+        pdf.set_font("Arial", "", 12)
+        pdf.cell(0, 10, f"AQI: {report['aqi']['value']} ({report['aqi']['category']})", ln=True)
+        pdf.cell(0, 10, "Pollutant Levels:", ln=True)
+        for pollutant, value in report['pollutants'].items():
+            pdf.cell(0, 10, f"- {pollutant}: {value}", ln=True)
+        pdf.ln(10)
+
+    if statistics:
+        pdf.set_font("Arial", "B", 14)
+        pdf.cell(0, 10, "Pollutant Statistics:", ln=True)
+        pdf.set_font("Arial", "", 12)
+        for pollutant, stats in statistics.items():
+            percentiles = ", ".join(
+                f"{name} {value:.4g}" for name, value in stats.items() if name.startswith("p") and value is not None
+            )
+            pdf.multi_cell(0, 10, (
+                f"- {pollutant}: mean {stats['mean']:.4g} (std {stats['std']:.4g}), "
+                f"range {stats['min']:.4g} to {stats['max']:.4g}, {percentiles}; {stats['count']} values"
+            ))
+        pdf.ln(10)
+
+    pdf.set_font("Arial", "B", 14)
+    pdf.cell(0, 10, "Recommendations:", ln=True)
+    pdf.set_font("Arial", "", 12)
+    pdf.multi_cell(0, 10, narrative.get("recommendations", RECOMMENDATIONS))
+
+    pdf.set_font("Arial", "B", 14)
+    pdf.cell(0, 10, "Conclusion:", ln=True)
+    pdf.set_font("Arial", "", 12)
+    pdf.multi_cell(0, 10, CONCLUSION)
+
+    pdf.output(file_path)
+    return file_path
+
+
+def report_file_path(output_dir: str = PDF_OUTPUT_DIR) -> str:
+    os.makedirs(output_dir, exist_ok=True)
+    return os.path.join(
+        output_dir,
+        f"ESG_Audit_Report_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S_%f')}.pdf"
+    )
+
+
+class RenderPool:
+    """
+    Queue of PDF renders served by a pool of worker processes, so layout work never runs on the API's
+    threads. Workers are spawned (not forked) because the API process holds Earth Engine and DB threads.
+    With workers=0 reports are rendered in the calling thread. A pool broken by a dying worker (OOM, a crash
+    in native layout code) is replaced, and the renders it lost are retried once on the new pool.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.lock = threading.Lock()
+        self.executor: Optional[ProcessPoolExecutor] = None
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self.lock:
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=warm_up,
+                )
+            return self.executor
+
+    def _discard(self, executor: ProcessPoolExecutor):
+        """ Drop a broken pool so the next render spawns a new one; concurrent callers discard it only once. """
+        with self.lock:
+            if self.executor is not executor:
+                return
+            self.executor = None
+        print("⚠️ A PDF render worker died; replacing the render pool")
+        executor.shutdown(wait=False)
+
+    def start(self):
+        """ Spawn and warm the workers ahead of the first report. """
+        if self.workers > 0:
+            executor = self._executor()
+            for future in [executor.submit(warm_up) for _ in range(self.workers)]:
+                future.result()
+
+    def submit(self, region: str, period_reports: List[Dict], scales: Dict[str, float],
+               file_path: Optional[str] = None, narrative: Optional[Dict[str, str]] = None,
+               statistics: Optional[Dict[str, Dict]] = None) -> Future:
+        file_path = file_path or report_file_path()
+        if self.workers <= 0:
+            future = Future()
+            try:
+                future.set_result(render_report(region, period_reports, scales, file_path, narrative, statistics))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        future = Future()
+        self._render(future, (region, period_reports, scales, file_path, narrative, statistics), retries=1)
+        return future
+
+    def _render(self, future: Future, args: tuple, retries: int):
+        executor = self._executor()
+        try:
+            render = executor.submit(render_report, *args)
+        except BrokenProcessPool as e:
+            self._discard(executor)
+            if retries > 0:
+                self._render(future, args, retries - 1)
+            else:
+                future.set_exception(e)
+            return
+
+        def done(render: Future):
+            error = render.exception()
+            if isinstance(error, BrokenProcessPool):
+                self._discard(executor)
+                if retries > 0:
+                    self._render(future, args, retries - 1)
+                    return
+            if error is None:
+                future.set_result(render.result())
+            else:
+                future.set_exception(error)
+
+        render.add_done_callback(done)
+
+    def shutdown(self):
+        with self.lock:
+            if self.executor is not None:
+                self.executor.shutdown(wait=True)
+                self.executor = None
+
+
+render_pool = RenderPool(PDF_RENDER_WORKERS)
@@ -0,0 +1,96 @@
+import calendar
+from datetime import date, datetime, timedelta
+from typing import List, Literal, NamedTuple, Union
+
+Interval = Literal['day', 'week', 'month', 'year']
+
+INTERVALS = ('day', 'week', 'month', 'year')
+
+
+class Period(NamedTuple):
+    start: date
+    end: date  # exclusive
+    label: str
+
+
+def to_date(value: Union[str, date, datetime]) -> date:
+    """ Accept 'YYYY-MM-DD' strings, dates or datetimes. """
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def add_months(anchor: date, months: int) -> date:
+    """ Shift a date by whole months, clamping the day to the target month's length. """
+    month_index = anchor.month - 1 + months
+    year = anchor.year + month_index // 12
+    month = month_index % 12 + 1
+    day = min(anchor.day, calendar.monthrange(year, month)[1])
+    return date(year, month, day)
+
+
+def advance(anchor: date, interval: Interval, steps: int = 1) -> date:
+    if interval == 'day':
+        return anchor + timedelta(days=steps)
+    elif interval == 'week':
+        return anchor + timedelta(weeks=steps)
+    elif interval == 'month':
+        return add_months(anchor, steps)
+    elif interval == 'year':
+        return add_months(anchor, 12 * steps)
+    raise ValueError(f"Unsupported interval: {interval}")
+
+
+def period_label(start: date, interval: Interval) -> str:
+    """ Label for the period starting at `start`; weeks use ISO year and week numbers. """
+    if interval == 'day':
+        return start.strftime('%Y-%m-%d')
+    elif interval == 'week':
+        iso_year, iso_week, _ = start.isocalendar()
+        return f"{iso_year}-W{iso_week:02d}"
+    elif interval == 'month':
+        return start.strftime('%Y-%m')
+    elif interval == 'year':
+        return start.strftime('%Y')
+    raise ValueError(f"Unsupported interval: {interval}")
+
+
+def parse_period_label(label: str) -> date:
+    """ First day of the period named by a label produced by `period_label`. """
+    if '-W' in label:
+        iso_year, iso_week = label.split('-W')
+        return date.fromisocalendar(int(iso_year), int(iso_week), 1)
+    parts = label.split('-')
+    if len(parts) == 3:
+        return date(int(parts[0]), int(parts[1]), int(parts[2]))
+    elif len(parts) == 2:
+        return date(int(parts[0]), int(parts[1]), 1)
+    elif len(parts) == 1:
+        return date(int(parts[0]), 1, 1)
+    raise ValueError(f"Unrecognised period label: {label}")
+
+
+def generate_periods(start_date: Union[str, date], end_date: Union[str, date], interval: Interval) -> List[Period]:
+    """
+    Split [start_date, end_date) into consecutive periods of the given interval.
+    Steps are taken from the original start so month-end dates do not drift.
+    The last period may extend past end_date, as with the Earth Engine loop.
+    """
+    if interval not in INTERVALS:
+        raise ValueError(f"Unsupported interval: {interval}")
+
+    start = to_date(start_date)
+    end = to_date(end_date)
+
+    periods = []
+    step = 0
+    current = start
+    while current < end:
+        next_date = advance(start, interval, step + 1)
+        periods.append(Period(current, next_date, period_label(current, interval)))
+        step += 1
+        current = next_date
+
+    return periods
@@ -0,0 +1,56 @@
+import math
+from typing import Dict, Literal, NamedTuple
+
+from config import FAST_PIXEL_BUDGET, EXACT_PIXELS_PER_TILE
+from aqi.geometry import polygon_area_m2
+
+ScaleMode = Literal['fast', 'exact']
+
+MAX_TILE_SCALE = 16
+
+
+class ReducePlan(NamedTuple):
+    scale: float
+    tile_scale: int
+    best_effort: bool
+    max_pixels: float
+    estimated_pixels: int
+
+    def reduce_kwargs(self) -> Dict:
+        """ Keyword arguments for ee.Image.reduceRegion. """
+        return {
+            "scale": self.scale,
+            "tileScale": self.tile_scale,
+            "bestEffort": self.best_effort,
+            "maxPixels": self.max_pixels,
+        }
+
+
+def plan_reduction(pollutant: Dict, area_m2: float, mode: ScaleMode = 'fast') -> ReducePlan:
+    """
+    Pick reduceRegion parameters for one dataset over an AOI of `area_m2`.
+
+    fast:  never sample finer than the sensor footprint, and coarsen further so the
+           AOI stays within FAST_PIXEL_BUDGET pixels; bestEffort guards the rest.
+    exact: sample at the dataset's own pixel size and raise tileScale instead
+           of coarsening once the AOI exceeds EXACT_PIXELS_PER_TILE pixels.
+    """
+    if mode == 'fast':
+        scale = max(pollutant['native_scale'], math.sqrt(area_m2 / FAST_PIXEL_BUDGET))
+        scale = round(scale, 1)
+        pixels = area_m2 / scale ** 2
+        return ReducePlan(scale, 1, True, FAST_PIXEL_BUDGET, math.ceil(pixels))
+
+    elif mode == 'exact':
+        scale = pollutant['grid_scale']
+        pixels = area_m2 / scale ** 2
+        tile_scale = 1
+        while tile_scale < MAX_TILE_SCALE and pixels / tile_scale > EXACT_PIXELS_PER_TILE:
+            tile_scale *= 2
+        return ReducePlan(scale, tile_scale, False, 1e13, math.ceil(pixels))
+
+    raise ValueError(f"Unsupported scale mode: {mode}")
+
+
+def plan_for_aoi(pollutant: Dict, aoi: Dict, mode: ScaleMode = 'fast') -> ReducePlan:
+    return plan_reduction(pollutant, polygon_area_m2(aoi), mode)
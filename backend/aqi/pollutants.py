@@ -0,0 +1,26 @@
+# Define the pollutants and their datasets.
+# 'grid_scale' is the dataset pixel size in metres, 'native_scale' the sensor footprint it was gridded from.
+# 'l2' describes the equivalent Sentinel-5P Level-2 product for the offline backend:
+# product type token from the file name, variable path inside the netCDF, minimum qa_value.
+POLLUTANTS = [
+    {'name': 'NO2', 'dataset': 'COPERNICUS/S5P/OFFL/L3_NO2', 'band': 'NO2_column_number_density',
+     'grid_scale': 1113.2, 'native_scale': 5500,
+     'l2': {'product': 'L2__NO2___', 'variable': 'PRODUCT/SUPPORT_DATA/DETAILED_RESULTS/nitrogendioxide_total_column', 'min_qa': 0.75}},
+    {'name': 'CO', 'dataset': 'COPERNICUS/S5P/OFFL/L3_CO', 'band': 'CO_column_number_density',
+     'grid_scale': 1113.2, 'native_scale': 5500,
+     'l2': {'product': 'L2__CO____', 'variable': 'PRODUCT/carbonmonoxide_total_column', 'min_qa': 0.5}},
+    {'name': 'HCHO', 'dataset': 'COPERNICUS/S5P/OFFL/L3_HCHO', 'band': 'tropospheric_HCHO_column_number_density',
+     'grid_scale': 1113.2, 'native_scale': 5500,
+     'l2': {'product': 'L2__HCHO__', 'variable': 'PRODUCT/formaldehyde_tropospheric_vertical_column', 'min_qa': 0.5}},
+    {'name': 'CH4', 'dataset': 'COPERNICUS/S5P/OFFL/L3_CH4', 'band': 'CH4_column_volume_mixing_ratio_dry_air',
+     'grid_scale': 1113.2, 'native_scale': 5500,
+     'l2': {'product': 'L2__CH4___', 'variable': 'PRODUCT/methane_mixing_ratio', 'min_qa': 0.5}},
+    {'name': 'SO2', 'dataset': 'COPERNICUS/S5P/OFFL/L3_SO2', 'band': 'SO2_column_number_density',
+     'grid_scale': 1113.2, 'native_scale': 5500,
+     'l2': {'product': 'L2__SO2___', 'variable': 'PRODUCT/sulfurdioxide_total_vertical_column', 'min_qa': 0.5}},
+    {'name': 'AOD', 'dataset': 'MODIS/061/MCD19A2_GRANULES', 'band': 'Optical_Depth_047',
+     'grid_scale': 1000, 'native_scale': 1000},
+    {'name': 'O3', 'dataset': 'COPERNICUS/S5P/OFFL/L3_O3', 'band': 'O3_column_number_density',
+     'grid_scale': 1113.2, 'native_scale': 5500,
+     'l2': {'product': 'L2__O3____', 'variable': 'PRODUCT/ozone_total_vertical_column', 'min_qa': 0.5}},
+]
@@ -0,0 +1,162 @@
+import asyncio
+import itertools
+import json
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from db.database import SessionLocal
+from db.crud import update_report_job_progress
+
+# Events kept per job; the oldest are dropped past this (sequence numbers keep counting)
+MAX_EVENTS = 200
+
+# Stages after which a job emits nothing more
+TERMINAL_STAGES = ("succeeded", "failed")
+
+
+class ProgressHub:
+    """
+    In-process pub/sub of job progress events. Subscribers are asyncio queues (e.g. one per WebSocket);
+    events may be published from any thread. Jobs run by other processes are only seen through the job row.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers: Dict[str, Set[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+
+    def subscribe(self, job_id: str) -> asyncio.Queue:
+        """ Must be called from the event loop that will read the queue. """
+        queue = asyncio.Queue()
+        with self.lock:
+            self.subscribers.setdefault(job_id, set()).add((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, job_id: str, queue: asyncio.Queue):
+        with self.lock:
+            subscribers = self.subscribers.get(job_id, set())
+            subscribers.difference_update({entry for entry in subscribers if entry[1] is queue})
+            if not subscribers:
+                self.subscribers.pop(job_id, None)
+
+    def publish(self, job_id: str, event: Dict):
+        with self.lock:
+            subscribers = list(self.subscribers.get(job_id, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+            except RuntimeError:
+                # The subscriber's loop has shut down
+                self.unsubscribe(job_id, queue)
+
+
+hub = ProgressHub()
+
+
+def load_events(progress: Optional[str]) -> List[Dict]:
+    return json.loads(progress) if progress else []
+
+
+class JobProgress:
+    """ Event log of one job attempt: each event is stored on the job row and published to the hub. """
+
+    def __init__(self, job_id: str, worker_id: str, events: Optional[List[Dict]] = None):
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.events = list(events or [])
+        self.lock = threading.RLock()
+        # Jobs waiting on work this job does for them (see SingleFlight); they get a copy of each event
+        self.followers: List["JobProgress"] = []
+
+    def last_seq(self) -> int:
+        with self.lock:
+            return self.events[-1]["seq"] if self.events else 0
+
+    def add(self, stage: str, **fields) -> Dict:
+        """ Append an event without storing or publishing it, e.g. to store it together with the job outcome. """
+        with self.lock:
+            seq = self.events[-1]["seq"] + 1 if self.events else 1
+            event = {"seq": seq, "stage": stage, "at": datetime.now(timezone.utc).isoformat(), **fields}
+            self.events = (self.events + [event])[-MAX_EVENTS:]
+            return event
+
+    def emit(self, stage: str, **fields) -> Dict:
+        # Saved under the lock so concurrent emitters (run_parallel tasks) never store an older list last
+        with self.lock:
+            event = self.add(stage, **fields)
+            self.save()
+            followers = list(self.followers)
+        hub.publish(self.job_id, event)
+        for follower in followers:
+            follower.emit(stage, **fields)
+        return event
+
+    def forward_to(self, follower: "JobProgress", after_seq: int):
+        """ Copy this job's events after `after_seq` to `follower`, then every new one until stop_forwarding. """
+        # Under the lock, so no event is both replayed and forwarded, or neither
+        with self.lock:
+            for event in self.events:
+                if event["seq"] > after_seq:
+                    follower.emit(event["stage"], **{k: v for k, v in event.items() if k not in ("seq", "stage", "at")})
+            self.followers.append(follower)
+
+    def stop_forwarding(self, follower: "JobProgress"):
+        with self.lock:
+            if follower in self.followers:
+                self.followers.remove(follower)
+
+    def dumps(self) -> str:
+        return json.dumps(self.events)
+
+    def save(self):
+        db = SessionLocal()
+        try:
+            update_report_job_progress(db, self.job_id, self.worker_id, self.dumps())
+        except Exception as e:
+            # Progress is best effort; it must never fail the job itself
+            print(f"⚠️ Failed to store progress of job {self.job_id}: {e}")
+        finally:
+            db.close()
+
+
+current_job: ContextVar[Optional[JobProgress]] = ContextVar("current_job_progress", default=None)
+
+
+@contextmanager
+def track(progress: JobProgress):
+    """ Route emit() calls made by the enclosed work (including run_parallel tasks) to `progress`. """
+    token = current_job.set(progress)
+    try:
+        yield progress
+    finally:
+        current_job.reset(token)
+
+
+def emit(stage: str, **fields):
+    """ Report a pipeline step of the current job; a no-op outside a job (API streaming, scripts). """
+    progress = current_job.get()
+    if progress is not None:
+        progress.emit(stage, **fields)
+
+
+class StepCounter:
+    """ Emits `stage` with a running `done` of `total` count as each wrapped step finishes; `key` names the step. """
+
+    def __init__(self, stage: str, total: int, key: str = "name"):
+        self.stage = stage
+        self.total = total
+        self.key = key
+        self.done = itertools.count(1)
+
+    def wrap(self, name: str, fn: Callable) -> Callable:
+        def run():
+            try:
+                result = fn()
+            except Exception:
+                emit(self.stage, **{self.key: name}, done=next(self.done), total=self.total, ok=False)
+                raise
+            emit(self.stage, **{self.key: name}, done=next(self.done), total=self.total, ok=True)
+            return result
+        return run
@@ -1,91 +1,33 @@
-import google.generativeai as genai
-import datetime
-import os
 from dotenv import load_dotenv
-import json
-from collections import defaultdict
-from fpdf import FPDF
-from datetime import datetime
-from fpdf import FPDF
-from io import BytesIO
-from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+from aqi.aqi_engine import CPCB_BREAKPOINTS, categorize, get_standard, overall_index, sub_index
+from aqi.artifact_store import store as artifact_store
+from aqi.narrative import PendingNarrative, narrator
+from aqi.result_matrix import PollutantMatrix
+from config import NARRATIVE_ENABLED
 
 # Load environment variables
 load_dotenv()
 
-# Configure Gemini API
-genai.configure(api_key=os.getenv('GOOGLE_GEMINI_API_KEY'))  # Replace with your Gemini API key
-model = genai.GenerativeModel('gemini-2.0-flash')
-
-
-
-# Define pollutant breakpoints (CPCB - India)
-BREAKPOINTS = {
-    "PM2.5": [
-        (0, 30, 0, 50),
-        (31, 60, 51, 100),
-        (61, 90, 101, 200),
-        (91, 120, 201, 300),
-        (121, 250, 301, 400),
-        (251, 500, 401, 500)
-    ],
-    "PM10": [
-        (0, 50, 0, 50),
-        (51, 100, 51, 100),
-        (101, 250, 101, 200),
-        (251, 350, 201, 300),
-        (351, 430, 301, 400),
-        (431, 1000, 401, 500)
-    ],
-    "NO2": [
-        (0, 40, 0, 50),
-        (41, 80, 51, 100),
-        (81, 180, 101, 200),
-        (181, 280, 201, 300),
-        (281, 400, 301, 400),
-        (401, 1000, 401, 500)
-    ],
-    "SO2": [
-        (0, 40, 0, 50),
-        (41, 80, 51, 100),
-        (81, 380, 101, 200),
-        (381, 800, 201, 300),
-        (801, 1600, 301, 400),
-        (1601, 10000, 401, 500)
-    ],
-    "CO": [
-        (0, 1, 0, 50),
-        (1.1, 2, 51, 100),
-        (2.1, 10, 101, 200),
-        (10.1, 17, 201, 300),
-        (17.1, 34, 301, 400),
-        (34.1, 100, 401, 500)
-    ],
-    "O3": [
-        (0, 50, 0, 50),
-        (51, 100, 51, 100),
-        (101, 168, 101, 200),
-        (169, 208, 201, 300),
-        (209, 748, 301, 400),
-        (749, 1000, 401, 500)
-    ]
-}
-
-
-def calculate_aqi_for_pollutant(pollutant, concentration):
-    breakpoints = BREAKPOINTS.get(pollutant)
-
-    if not breakpoints:
-        raise ValueError(f"No breakpoints defined for pollutant: {pollutant}")
-
-    for bp in breakpoints:
-        lo_c, hi_c, lo_aqi, hi_aqi = bp
-        if lo_c <= concentration <= hi_c:
-            aqi = ((concentration - lo_c) / (hi_c - lo_c)) * (hi_aqi - lo_aqi) + lo_aqi
-            return round(aqi)
-
-    # If it exceeds the highest defined range, cap at 500
-    return 500
+
+# Define pollutant breakpoints (CPCB - India); the AQI engine compiles these and the other standards
+BREAKPOINTS = CPCB_BREAKPOINTS
+
+# Sub-indices that make up the overall AQI, in report order
+AQI_POLLUTANTS = ["PM2.5", "PM10", "NO2", "SO2", "CO", "O3"]
+
+
+def calculate_aqi_for_pollutant(pollutant, concentration, standard="CPCB"):
+    aqi = sub_index(pollutant, [concentration], standard)[0]
+    if np.isnan(aqi):
+        # Negative or NaN input matches no band; like the original band loop, it gets the top index
+        compiled = get_standard(standard)
+        return int(compiled.cap if compiled.cap is not None else compiled.tables[pollutant].hi_i[-1])
+    return int(aqi)
+
 def calculate_aqi(pm25, pm10, no2, so2, co, o3):
     aqi_values = {
         "PM2.5": calculate_aqi_for_pollutant("PM2.5", pm25),
@@ -99,142 +41,82 @@ def calculate_aqi(pm25, pm10, no2, so2, co, o3):
     # The final AQI is the highest individual pollutant AQI
     return max(aqi_values.values())
 
-# AQI Category Function
-def aqi_category(aqi):
-    if aqi <= 50:
-        return "Good"
-    elif aqi <= 100:
-        return "Satisfactory"
-    elif aqi <= 200:
-        return "Moderate"
-    elif aqi <= 300:
-        return "Poor"
-    elif aqi <= 400:
-        return "Very Poor"
-    else:
-        return "Severe"
-
-# Aggregate pollutant data by period
-def aggregate_pollutants(data):
-    aggregated = defaultdict(lambda: defaultdict(list))
-    for entry in data:
-        period = entry['period']
-        pollutant = entry['pollutant']
-        value = entry['value']
-        if value is not None:  # Ignore None values
-            aggregated[period][pollutant].append(value)
-    return aggregated
+# Overall AQI per period over the columns of a PollutantMatrix; periods without a valid sub-index get 0
+def calculate_aqi_matrix(matrix, standard="CPCB"):
+    aqi, _ = overall_index({pollutant: matrix.column(pollutant) for pollutant in AQI_POLLUTANTS}, standard)
+    return np.nan_to_num(aqi).astype(int)
 
-# Calculate average pollutant values for each period
-def calculate_averages(aggregated):
-    averages = {}
-    for period, pollutants in aggregated.items():
-        averages[period] = {
-            pollutant: sum(values) / len(values) if values else 0
-            for pollutant, values in pollutants.items()
-        }
-    return averages
+# AQI Category Function
+def aqi_category(aqi, standard="CPCB"):
+    return str(categorize([aqi], standard)[0])
 
+def aqi_category_array(aqi, standard="CPCB"):
+    return categorize(aqi, standard)
 
+# Aggregate pollutant records into a period × pollutant matrix, in calendar order
+def aggregate_pollutants(data):
+    if isinstance(data, PollutantMatrix):
+        return data
+    return PollutantMatrix.from_records(data)
 
+# Count, mean, std, min, max and percentiles per pollutant over the whole report
+def summarize_pollutants(aggregated):
+    return aggregate_pollutants(aggregated).summary()
 
 
-import os
-import time
-from datetime import datetime
-from fpdf import FPDF
+# Per-period pollutant levels and AQI, as laid out in the report
+def build_period_reports(data):
+    # data: gee_service records (list or generator) or a PollutantMatrix
+    matrix = aggregate_pollutants(data)
 
-def generate_esg_audit_report(region, data):
-    # Aggregate and calculate averages (assuming these functions exist and work correctly)
-    aggregated = aggregate_pollutants(data)
-    averages = calculate_averages(aggregated)
+    # Missing pollutants count as 0, as before; every column is evaluated for all periods at once
+    columns = {pollutant: matrix.column(pollutant) for pollutant in AQI_POLLUTANTS}
+    aqi_values = calculate_aqi_matrix(matrix)
+    categories = aqi_category_array(aqi_values)
 
     period_reports = []
-    for period, pollutants in averages.items():
-        pm25 = pollutants.get('PM2.5', 0)
-        pm10 = pollutants.get('PM10', 0)
-        no2 = pollutants.get('NO2', 0)
-        so2 = pollutants.get('SO2', 0)
-        co = pollutants.get('CO', 0)
-        o3 = pollutants.get('O3', 0)
-
-        aqi = calculate_aqi(pm25, pm10, no2, so2, co, o3)
-        category = aqi_category(aqi)
-
+    for row, period in enumerate(matrix.periods):
         period_reports.append({
             "period": period,
-            "pollutants": {
-                "PM2.5": pm25,
-                "PM10": pm10,
-                "NO2": no2,
-                "SO2": so2,
-                "CO": co,
-                "O3": o3,
-            },
+            "pollutants": {pollutant: float(column[row]) for pollutant, column in columns.items()},
             "aqi": {
-                "value": aqi,
-                "category": category,
+                "value": int(aqi_values[row]),
+                "category": str(categories[row]),
             },
         })
 
-    pdf = FPDF()
-    pdf.add_page()
-
-    # Header
-    pdf.set_font("Arial", "B", 24)
-    pdf.set_text_color(0, 128, 0)
-    pdf.cell(0, 10, "VeriEarth", ln=True, align="C")
-    pdf.set_text_color(0, 0, 0)
-    pdf.set_font("Arial", "B", 16)
-    pdf.cell(0, 10, "ESG Audit Report", ln=True, align="C")
-
-    pdf.set_font("Arial", "", 12)
-    pdf.cell(0, 10, f"Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", ln=True)
-    pdf.cell(0, 10, f"Region: {region}", ln=True)
-    pdf.ln(10)
-
-    pdf.set_font("Arial", "B", 14)
-    for report in period_reports:
-        pdf.cell(0, 10, f"Period: {report['period']}", ln=True)
-        pdf.set_font("Arial", "", 12)
-        pdf.cell(0, 10, f"AQI: {report['aqi']['value']} ({report['aqi']['category']})", ln=True)
-        pdf.cell(0, 10, "Pollutant Levels:", ln=True)
-        for pollutant, value in report['pollutants'].items():
-            pdf.cell(0, 10, f"- {pollutant}: {value}", ln=True)
-        pdf.ln(10)
-
-    pdf.set_font("Arial", "B", 14)
-    pdf.cell(0, 10, "Recommendations:", ln=True)
-    pdf.set_font("Arial", "", 12)
-    pdf.multi_cell(0, 10, """
-    - Reduce vehicle emissions & industrial pollution.
-    - Promote public transport & alternative energy sources.
-    - Stricter enforcement of environmental policies.
-    """)
-
-    pdf.set_font("Arial", "B", 14)
-    pdf.cell(0, 10, "Conclusion:", ln=True)
-    pdf.set_font("Arial", "", 12)
-    pdf.multi_cell(0, 10, """
-    Immediate actions are required to mitigate pollution effects.
-    """)
-
-    # Save to file (you can change the directory as needed)
-    output_dir = "/tmp"
-    os.makedirs(output_dir, exist_ok=True)
-
-    file_path = os.path.join(
-        output_dir,
-        f"ESG_Audit_Report_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.pdf"
-    )
-
-    pdf.output(file_path)
-    print(f"✅ PDF report saved to: {file_path}")
-
-    # Optional: simulate processing delay (remove if unnecessary)
-    time.sleep(3)
-
-    return file_path
+    return period_reports
+
+
+# A report whose narrative is being generated while other reports are prepared
+class ReportDraft(NamedTuple):
+    region: str
+    period_reports: List[Dict]
+    scales: Dict[str, float]
+    statistics: Dict[str, Dict[str, float]]
+    narrative: Optional[PendingNarrative]
+
+
+def draft_esg_audit_report(region, data):
+    matrix = aggregate_pollutants(data)
+    period_reports = build_period_reports(matrix)
+    narrative = narrator.request(region, period_reports) if NARRATIVE_ENABLED else None
+    return ReportDraft(region, period_reports, matrix.scales, summarize_pollutants(matrix), narrative)
+
+
+# Store the report in the artifact store; the returned future resolves to the Artifact.
+# Waits for the narrative only until its deadline, then renders with whatever sections are ready.
+def submit_report_draft(draft):
+    narrative = draft.narrative.result() if draft.narrative else None
+    return artifact_store.submit(draft.region, draft.period_reports, draft.scales, narrative, draft.statistics)
+
+
+def submit_esg_audit_report(region, data):
+    return submit_report_draft(draft_esg_audit_report(region, data))
+
+
+def generate_esg_audit_report(region, data):
+    return submit_esg_audit_report(region, data).result().path
 
 
 # # Example Usage
@@ -0,0 +1,154 @@
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from config import RESULT_CACHE_RECENT_DAYS, RESULT_CACHE_RECENT_TTL_HOURS, RESULT_CACHE_TTL_DAYS
+from aqi.geometry import aoi_hash
+from aqi.periods import Period
+from db.database import SessionLocal
+from db.crud import (
+    get_pollutant_results, upsert_pollutant_results, delete_pollutant_results,
+    get_daily_base, upsert_daily_base, delete_daily_base,
+)
+
+
+def effective_end(period: Period, end_date: date) -> date:
+    """ Periods are filtered by the overall request end, so the last one may be truncated. """
+    return min(period.end, end_date)
+
+
+def expiry_for(period_end: date, now: datetime) -> Optional[datetime]:
+    """
+    Recent periods can still gain late granules and expire quickly;
+    settled periods are kept for RESULT_CACHE_TTL_DAYS (forever when 0).
+    """
+    if period_end > now.date() - timedelta(days=RESULT_CACHE_RECENT_DAYS):
+        return now + timedelta(hours=RESULT_CACHE_RECENT_TTL_HOURS)
+    if RESULT_CACHE_TTL_DAYS > 0:
+        return now + timedelta(days=RESULT_CACHE_TTL_DAYS)
+    return None
+
+
+def load_cached(key: str, pollutant: Dict, interval: str, scale: float,
+                periods: List[Period], end_date: date) -> Dict[Tuple[date, date], float]:
+    """ Cached values for the requested periods, keyed by (period start, effective period end). """
+    if not periods:
+        return {}
+
+    now = datetime.now(timezone.utc)
+    wanted = {(period.start, effective_end(period, end_date)) for period in periods}
+
+    db = SessionLocal()
+    try:
+        rows = get_pollutant_results(
+            db, key, pollutant['name'], pollutant['band'], interval, scale,
+            periods[0].start, max(end for _, end in wanted), now
+        )
+    finally:
+        db.close()
+
+    return {
+        (row.period_start, row.period_end): row.value
+        for row in rows
+        if (row.period_start, row.period_end) in wanted
+    }
+
+
+def store_results(key: str, pollutant: Dict, interval: str, scale: float,
+                  periods: List[Period], end_date: date, records: List[Dict]) -> None:
+    """ Persist computed records; None values are not cached so failed periods are retried next time. """
+    now = datetime.now(timezone.utc)
+    values = {record['period']: record['value'] for record in records}
+
+    rows = []
+    for period in periods:
+        value = values.get(period.label)
+        if value is None:
+            continue
+        period_end = effective_end(period, end_date)
+        rows.append({
+            "aoi_hash": key,
+            "pollutant": pollutant['name'],
+            "band": pollutant['band'],
+            "interval": interval,
+            "period": period.label,
+            "period_start": period.start,
+            "period_end": period_end,
+            "scale": scale,
+            "value": value,
+            "fetched_at": now,
+            "expires_at": expiry_for(period_end, now),
+        })
+
+    if not rows:
+        return
+
+    db = SessionLocal()
+    try:
+        upsert_pollutant_results(db, rows)
+    finally:
+        db.close()
+
+
+def load_daily_base(key: str, pollutant: Dict, scale: float, days: List[Period]) -> Dict[date, Tuple[float, float]]:
+    """ Cached (sum, weight) per day for the requested days. """
+    if not days:
+        return {}
+
+    db = SessionLocal()
+    try:
+        rows = get_daily_base(db, key, pollutant['name'], pollutant['band'], scale,
+                              days[0].start, days[-1].start, datetime.now(timezone.utc))
+    finally:
+        db.close()
+
+    return {row.day: (row.sum, row.weight) for row in rows}
+
+
+def store_daily_base(key: str, pollutant: Dict, scale: float, days: List[Period],
+                     partials: Dict[str, Tuple[float, float]]) -> None:
+    """ Persist computed days, including days without observations (weight 0); days that failed are absent. """
+    now = datetime.now(timezone.utc)
+    rows = [
+        {
+            "aoi_hash": key,
+            "pollutant": pollutant['name'],
+            "band": pollutant['band'],
+            "scale": scale,
+            "day": day.start,
+            "sum": partials[day.label][0],
+            "weight": partials[day.label][1],
+            "fetched_at": now,
+            "expires_at": expiry_for(day.end, now),
+        }
+        for day in days if day.label in partials
+    ]
+
+    if not rows:
+        return
+
+    db = SessionLocal()
+    try:
+        upsert_daily_base(db, rows)
+    finally:
+        db.close()
+
+
+def invalidate(aoi: Optional[Dict] = None, pollutant: Optional[str] = None,
+               ends_after: Optional[date] = None) -> int:
+    """ Drop cached results, e.g. after a dataset reprocessing. Filters combine with AND. """
+    key = aoi_hash(aoi) if aoi else None
+    db = SessionLocal()
+    try:
+        return delete_pollutant_results(db, aoi_hash=key, pollutant=pollutant, ends_after=ends_after) + \
+            delete_daily_base(db, aoi_hash=key, pollutant=pollutant, ends_after=ends_after)
+    finally:
+        db.close()
+
+
+def purge_expired() -> int:
+    db = SessionLocal()
+    try:
+        now = datetime.now(timezone.utc)
+        return delete_pollutant_results(db, expired_before=now) + delete_daily_base(db, expired_before=now)
+    finally:
+        db.close()
@@ -0,0 +1,208 @@
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from aqi.accumulators import Moments, QuantileSketch
+from aqi.periods import parse_period_label
+from aqi.pollutants import POLLUTANTS
+
+POLLUTANT_ORDER = [pollutant['name'] for pollutant in POLLUTANTS]
+
+
+# Records folded into the accumulators at a time, so building a matrix never holds a whole series
+FLUSH_RECORDS = 1024
+
+# Percentiles reported for each pollutant
+REPORT_QUANTILES = (0.5, 0.9, 0.95)
+
+
+class PollutantMatrix:
+    """
+    Period × pollutant results held as columns.
+    `values` is a (periods, pollutants) float array of per-cell means and `valid` marks the cells that had at
+    least one non-null value; rows are in calendar order.
+    `moments` (count, mean, variance, min, max) and `sketches` (approximate percentiles) summarise every
+    value that went into each cell, and merge exactly across tiles, workers or AOIs.
+    """
+
+    def __init__(self, periods: List[str], pollutants: List[str], values: np.ndarray, valid: np.ndarray,
+                 interval: Optional[str] = None, scales: Optional[Dict[str, float]] = None,
+                 moments: Optional[Moments] = None, sketches: Optional[Dict[Tuple[str, str], QuantileSketch]] = None):
+        self.periods = periods
+        self.pollutants = pollutants
+        self.values = values
+        self.valid = valid
+        self.interval = interval
+        self.scales = scales or {}
+        self.columns = {pollutant: index for index, pollutant in enumerate(pollutants)}
+
+        if moments is None:
+            # Built from bare means: every valid cell counts as a single value
+            moments = Moments(values.shape)
+            moments.count = valid.astype(np.int64)
+            moments.mean = np.where(valid, values, 0.0)
+            moments.min = np.where(valid, values, np.inf)
+            moments.max = np.where(valid, values, -np.inf)
+        self.moments = moments
+        self.sketches = sketches if sketches is not None else {
+            (period, pollutant): QuantileSketch().add(float(values[row, col]))
+            for row, period in enumerate(periods)
+            for col, pollutant in enumerate(pollutants) if valid[row, col]
+        }
+
+    @classmethod
+    def from_moments(cls, period_labels: List[str], pollutants: List[str], moments: Moments,
+                     sketches: Dict[Tuple[str, str], QuantileSketch], interval: Optional[str] = None,
+                     scales: Optional[Dict[str, float]] = None) -> "PollutantMatrix":
+        """ Matrix over accumulated cells; rows are put in calendar order and empty periods are dropped. """
+        order = [
+            index for index in sorted(range(len(period_labels)), key=lambda index: parse_period_label(period_labels[index]))
+            if moments.count[index].any()
+        ]
+        moments = moments.take(order)
+        valid = moments.count > 0
+        return cls([period_labels[index] for index in order], pollutants, np.where(valid, moments.mean, 0.0), valid,
+                   interval, scales, moments, sketches)
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict]) -> "PollutantMatrix":
+        """
+        Build the matrix in one pass over gee_service records, which may be a generator.
+        Null values are ignored, repeated (period, pollutant) values are averaged and periods without
+        any value are dropped, matching the previous dict-based aggregation.
+        Records are folded into online accumulators every FLUSH_RECORDS records, so memory stays flat
+        on long daily series.
+        """
+        period_index: Dict[str, int] = {}
+        pollutant_index: Dict[str, int] = {name: index for index, name in enumerate(POLLUTANT_ORDER)}
+        rows, cols, values = [], [], []
+        interval = None
+        scales = {}
+        moments = Moments((0, len(pollutant_index)))
+        sketches: Dict[Tuple[str, str], QuantileSketch] = {}
+
+        def flush(moments: Moments) -> Moments:
+            moments = moments.resize((len(period_index), len(pollutant_index)))
+            if values:
+                moments.merge(Moments.from_values(moments.shape, (np.array(rows), np.array(cols)), values))
+                rows.clear()
+                cols.clear()
+                values.clear()
+            return moments
+
+        for record in records:
+            pollutant = record['pollutant']
+            if pollutant not in pollutant_index:
+                pollutant_index[pollutant] = len(pollutant_index)
+            if record.get('scale') is not None:
+                scales[pollutant] = record['scale']
+            interval = interval or record.get('interval')
+
+            value = record['value']
+            if value is None:
+                continue
+            row = period_index.setdefault(record['period'], len(period_index))
+            rows.append(row)
+            cols.append(pollutant_index[pollutant])
+            values.append(value)
+            sketches.setdefault((record['period'], pollutant), QuantileSketch()).add(value)
+
+            if len(values) >= FLUSH_RECORDS:
+                moments = flush(moments)
+
+        moments = flush(moments)
+        return cls.from_moments(list(period_index), list(pollutant_index), moments, sketches, interval, scales)
+
+    @classmethod
+    def merge(cls, matrices: Iterable["PollutantMatrix"]) -> "PollutantMatrix":
+        """
+        Combine matrices over the same or different periods and pollutants (e.g. tiles or AOIs) as if all
+        their values had been aggregated together. Scales of later matrices win.
+        """
+        period_index: Dict[str, int] = {}
+        pollutant_index: Dict[str, int] = {name: index for index, name in enumerate(POLLUTANT_ORDER)}
+        matrices = list(matrices)
+        for matrix in matrices:
+            for period in matrix.periods:
+                period_index.setdefault(period, len(period_index))
+            for pollutant in matrix.pollutants:
+                pollutant_index.setdefault(pollutant, len(pollutant_index))
+
+        shape = (len(period_index), len(pollutant_index))
+        moments = Moments(shape)
+        sketches: Dict[Tuple[str, str], QuantileSketch] = {}
+        interval, scales = None, {}
+        for matrix in matrices:
+            placed = Moments(shape)
+            grid = np.ix_([period_index[period] for period in matrix.periods],
+                          [pollutant_index[pollutant] for pollutant in matrix.pollutants])
+            for name in ("count", "mean", "m2", "min", "max"):
+                getattr(placed, name)[grid] = getattr(matrix.moments, name)
+            moments.merge(placed)
+
+            for cell, sketch in matrix.sketches.items():
+                sketches.setdefault(cell, QuantileSketch(sketch.relative_accuracy, sketch.max_bins)).merge(sketch)
+            interval = interval or matrix.interval
+            scales.update(matrix.scales)
+
+        return cls.from_moments(list(period_index), list(pollutant_index), moments, sketches, interval, scales)
+
+    def statistics(self, quantiles=REPORT_QUANTILES) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """ {period: {pollutant: {count, mean, std, min, max, p50, ...}}} for the valid cells. """
+        std = self.moments.std()
+        return {
+            period: {
+                pollutant: self._describe(
+                    int(self.moments.count[row, col]), self.moments.mean[row, col], std[row, col],
+                    self.moments.min[row, col], self.moments.max[row, col], self.sketches.get((period, pollutant)),
+                    quantiles
+                )
+                for pollutant, col in self.columns.items() if self.valid[row, col]
+            }
+            for row, period in enumerate(self.periods)
+        }
+
+    def summary(self, quantiles=REPORT_QUANTILES) -> Dict[str, Dict[str, float]]:
+        """ Statistics of each pollutant over every value in the matrix, merged across periods. """
+        totals = self.moments.reduce(axis=0)
+        std = totals.std()
+        summary = {}
+        for pollutant, col in self.columns.items():
+            if not totals.count[col]:
+                continue
+            sketch = None
+            for period in self.periods:
+                cell = self.sketches.get((period, pollutant))
+                if cell is not None:
+                    sketch = (sketch or QuantileSketch(cell.relative_accuracy, cell.max_bins)).merge(cell)
+            summary[pollutant] = self._describe(int(totals.count[col]), totals.mean[col], std[col],
+                                                totals.min[col], totals.max[col], sketch, quantiles)
+        return summary
+
+    @staticmethod
+    def _describe(count: int, mean: float, std: float, minimum: float, maximum: float,
+                  sketch: Optional[QuantileSketch], quantiles) -> Dict[str, float]:
+        described = {"count": count, "mean": float(mean), "std": float(std), "min": float(minimum), "max": float(maximum)}
+        for q in quantiles:
+            described[f"p{q * 100:g}"] = sketch.quantile(q) if sketch is not None else None
+        return described
+
+    def __len__(self) -> int:
+        return len(self.periods)
+
+    def column(self, pollutant: str, fill: float = 0.0) -> np.ndarray:
+        """ Mean values of one pollutant per period, `fill` where it has no data (or is not a column). """
+        index = self.columns.get(pollutant)
+        if index is None:
+            return np.full(len(self.periods), fill)
+        return np.where(self.valid[:, index], self.values[:, index], fill)
+
+    def to_records(self) -> Iterator[Dict]:
+        for col, pollutant in enumerate(self.pollutants):
+            for row, period in enumerate(self.periods):
+                yield {
+                    "period": period,
+                    "pollutant": pollutant,
+                    "value": float(self.values[row, col]) if self.valid[row, col] else None,
+                    "interval": self.interval,
+                }
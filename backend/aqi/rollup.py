@@ -0,0 +1,28 @@
+from typing import List, Optional
+
+import numpy as np
+
+from aqi.periods import Period
+
+
+def roll_up(days: List[Period], sums: np.ndarray, weights: np.ndarray, known: np.ndarray,
+            periods: List[Period]) -> List[Optional[float]]:
+    """
+    Resample a daily (sum, weight) series into `periods` in one vectorised pass.
+    `days` must be consecutive and start with the first period; the mean of a period is the sum of its
+    daily sums over the sum of its weights, so every valid pixel observation counts once.
+    Periods with an unknown (failed) day or no observations are None.
+    """
+    if not periods:
+        return []
+
+    day_ordinals = np.array([day.start.toordinal() for day in days])
+    starts = np.searchsorted(day_ordinals, [period.start.toordinal() for period in periods])
+
+    period_sums = np.add.reduceat(sums, starts)
+    period_weights = np.add.reduceat(weights, starts)
+    period_unknown = np.add.reduceat((~known).astype(np.int64), starts) > 0
+
+    valid = (period_weights > 0) & ~period_unknown
+    means = np.divide(period_sums, period_weights, out=np.zeros(len(periods)), where=valid)
+    return [float(mean) if ok else None for mean, ok in zip(means, valid)]
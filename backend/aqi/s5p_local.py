@@ -0,0 +1,186 @@
+# Offline pollutant backend over Sentinel-5P Level-2 products downloaded by sentinel_app.
+# Granules are opened lazily with netCDF4 and only the scanlines crossing the AOI are read.
+import os
+import re
+import zipfile
+from datetime import datetime
+from typing import Dict, Iterator, List, Literal, NamedTuple, Optional, Tuple
+
+import numpy as np
+import netCDF4
+
+from config import S5P_PRODUCT_DIR, S5P_EXTRACT_DIR
+from aqi import progress
+from aqi.periods import generate_periods, to_date
+from aqi.pollutants import POLLUTANTS
+from aqi.zonal import engine
+
+# e.g. S5P_OFFL_L2__NO2____20230101T045820_20230101T063950_26999_03_020400_20230102T210541.nc
+GRANULE_PATTERN = re.compile(r"S5P_\w{4}_(L2__.{6})_(\d{8}T\d{6})_(\d{8}T\d{6})")
+
+
+class Granule(NamedTuple):
+    path: str
+    member: Optional[str]  # netCDF file inside a zip archive, None for a bare .nc
+    product: str
+    sensing_start: datetime
+
+
+def parse_granule_name(name: str) -> Optional[Tuple[str, datetime]]:
+    match = GRANULE_PATTERN.search(os.path.basename(name))
+    if not match:
+        return None
+    return match.group(1), datetime.strptime(match.group(2), "%Y%m%dT%H%M%S")
+
+
+def discover_granules(product_dir: str) -> List[Granule]:
+    """ Find L2 granules in bare .nc files and in product_<id>.zip downloads. """
+    granules = []
+
+    extract_dir = os.path.abspath(S5P_EXTRACT_DIR)
+
+    for root, dirs, files in os.walk(product_dir):
+        # Extracted copies of zipped granules would otherwise be counted twice
+        dirs[:] = [d for d in dirs if os.path.abspath(os.path.join(root, d)) != extract_dir]
+        for file_name in files:
+            path = os.path.join(root, file_name)
+
+            if file_name.endswith(".nc"):
+                parsed = parse_granule_name(file_name)
+                if parsed:
+                    granules.append(Granule(path, None, *parsed))
+
+            elif file_name.endswith(".zip"):
+                try:
+                    with zipfile.ZipFile(path) as archive:
+                        members = [m for m in archive.namelist() if m.endswith(".nc")]
+                except zipfile.BadZipFile:
+                    print(f"⚠️ Skipping unreadable archive: {path}")
+                    continue
+                for member in members:
+                    parsed = parse_granule_name(member)
+                    if parsed:
+                        granules.append(Granule(path, member, *parsed))
+
+    return sorted(granules, key=lambda granule: granule.sensing_start)
+
+
+def netcdf_path(granule: Granule) -> str:
+    """ netCDF needs a real file, so zipped granules are extracted once into S5P_EXTRACT_DIR. """
+    if granule.member is None:
+        return granule.path
+
+    target = os.path.join(S5P_EXTRACT_DIR, os.path.basename(granule.member))
+    if not os.path.exists(target):
+        os.makedirs(S5P_EXTRACT_DIR, exist_ok=True)
+        with zipfile.ZipFile(granule.path) as archive, archive.open(granule.member) as source, \
+                open(target + ".part", "wb") as destination:
+            while chunk := source.read(1 << 20):
+                destination.write(chunk)
+        os.replace(target + ".part", target)
+    return target
+
+
+def read_variable(dataset: netCDF4.Dataset, path: str):
+    node = dataset
+    *groups, name = path.split("/")
+    for group in groups:
+        node = node.groups[group]
+    return node.variables[name]
+
+
+def granule_sum_count(granule: Granule, l2: Dict, aoi: Dict) -> Tuple[float, int]:
+    """ Sum and count of quality-filtered pixels whose centres fall inside the AOI. """
+    outer = np.asarray(aoi['coordinates'][0], dtype=float)
+    min_lon, min_lat = outer.min(axis=0)
+    max_lon, max_lat = outer.max(axis=0)
+
+    with netCDF4.Dataset(netcdf_path(granule)) as dataset:
+        product = dataset.groups["PRODUCT"]
+
+        # Latitude decides which scanlines to read; everything else is sliced to them
+        lat = np.ma.filled(product.variables["latitude"][0], np.nan)
+        rows = np.flatnonzero(((lat >= min_lat) & (lat <= max_lat)).any(axis=1))
+        if rows.size == 0:
+            return 0.0, 0
+        first, last = rows[0], rows[-1] + 1
+
+        lat = lat[first:last]
+        lon = np.ma.filled(product.variables["longitude"][0, first:last], np.nan)
+        if not ((lon >= min_lon) & (lon <= max_lon)).any():
+            return 0.0, 0
+
+        mask = engine.mask_for_coordinates((granule.path, granule.member, first, last), lon, lat, aoi)
+        if mask.indices.size == 0:
+            return 0.0, 0
+
+        qa = np.ma.filled(product.variables["qa_value"][0, first:last], 0)
+        values = np.ma.filled(read_variable(dataset, l2["variable"])[0, first:last].astype(float), np.nan)
+
+    values = np.where(qa >= l2["min_qa"], values, np.nan)
+    sums, counts = engine.sum_count(values, mask)
+    return float(sums), int(counts)
+
+
+def iter_pollutant_data_local(aoi: Dict, start_date: str, end_date: str,
+                              interval: Literal['day', 'week', 'month', 'year'],
+                              product_dir: Optional[str] = None) -> Iterator[Dict]:
+    """ Yield each pollutant's records as soon as its granules have been reduced. """
+    product_dir = product_dir or S5P_PRODUCT_DIR
+
+    print("\n🗂️ Computing pollutant data from local Sentinel-5P products:")
+    print(f"   Product dir: {product_dir}")
+    print(f"   Start Date: {start_date}")
+    print(f"   End Date: {end_date}")
+    print(f"   Interval: {interval}")
+
+    periods = generate_periods(start_date, end_date, interval)
+    first_day, last_day = to_date(start_date), to_date(end_date)
+    period_starts = np.array([period.start.toordinal() for period in periods])
+
+    granules = [
+        granule for granule in discover_granules(product_dir)
+        if first_day <= granule.sensing_start.date() < last_day
+    ]
+    print(f"📆 Total {interval}s in range: {len(periods)}, granules in range: {len(granules)}")
+    progress.emit("periods_planned", periods=len(periods), interval=interval, pollutants=len(POLLUTANTS))
+
+    total = 0
+
+    for done, pollutant in enumerate(POLLUTANTS, start=1):
+        sums = np.zeros(len(periods))
+        counts = np.zeros(len(periods), dtype=np.int64)
+        l2 = pollutant.get('l2')
+
+        if l2 is None:
+            print(f"   ⚠️ {pollutant['name']} has no Sentinel-5P L2 product; values will be empty")
+        else:
+            product_granules = [granule for granule in granules if granule.product == l2['product']]
+            print(f"\n🔎 Processing pollutant: {pollutant['name']} from {len(product_granules)} local granules")
+
+            for granule in product_granules:
+                index = np.searchsorted(period_starts, granule.sensing_start.date().toordinal(), side='right') - 1
+                try:
+                    granule_sum, granule_count = granule_sum_count(granule, l2, aoi)
+                except Exception as e:
+                    print(f"      ⚠️ Failed to read {os.path.basename(granule.member or granule.path)}: {e}")
+                    continue
+                sums[index] += granule_sum
+                counts[index] += granule_count
+
+        means = np.divide(sums, counts, out=np.full(len(periods), np.nan), where=counts > 0)
+        # L2 pixels are averaged at the sensor footprint; there is no regridding to a planned scale
+        scale = pollutant['native_scale'] if l2 is not None else None
+        progress.emit("pollutant_done", pollutant=pollutant['name'], done=done, total=len(POLLUTANTS), ok=True)
+        for period, mean_value, count in zip(periods, means, counts):
+            yield {
+                "period": period.label,
+                "pollutant": pollutant['name'],
+                "value": float(mean_value) if count > 0 else None,
+                "interval": interval,
+                "scale": scale
+            }
+        total += len(periods)
+
+    print("\n✅ Local computation complete. Total records:", total)
+
@@ -0,0 +1,93 @@
+import hashlib
+import json
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from aqi import progress
+from aqi.geometry import aoi_hash
+from aqi.progress import JobProgress
+
+
+def request_key(**params) -> str:
+    """
+    Canonical hash of a computation request. AOIs (any dict with 'coordinates') are replaced by their
+    canonical hash so vertex order, closing point and float noise do not split otherwise identical requests.
+    """
+    def canonical(value):
+        if isinstance(value, dict) and 'coordinates' in value:
+            return aoi_hash(value)
+        if isinstance(value, dict):
+            return {key: canonical(item) for key, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [canonical(item) for item in value]
+        return value
+
+    payload = json.dumps(canonical(params), sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class Flight(NamedTuple):
+    future: Future
+    # Progress of the leader's job and its last event before the call, to replay the call's events to followers
+    progress: Optional[JobProgress]
+    start_seq: int
+    followers: List[JobProgress]
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls that share a key into one execution.
+    The first caller runs the function; callers arriving while it is in flight wait for the same
+    result (or exception). Nothing is kept once the call finishes, so later calls run afresh.
+    When callers run as jobs, the leader's progress events during the call are copied to every follower's job.
+
+    Calls are only shared within one process. Identical jobs are already merged when queued (dedupe_key);
+    jobs that share a computation but not a dedupe key (e.g. the same report for two users) each compute it
+    when they run in different worker processes.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.lock = threading.Lock()
+        self.calls: Dict[str, Flight] = {}
+
+    def do(self, key: str, fn: Callable, *args, **kwargs):
+        job = progress.current_job.get()
+        with self.lock:
+            flight = self.calls.get(key)
+            leader = flight is None
+            if leader:
+                flight = Flight(Future(), job, job.last_seq() if job is not None else 0, [])
+                self.calls[key] = flight
+            elif job is not None and flight.progress is not None:
+                # Under the lock, so the leader cannot land between the replay and the registration
+                flight.progress.forward_to(job, flight.start_seq)
+                flight.followers.append(job)
+
+        if not leader:
+            print(f"🔗 {self.name}: joining in-flight computation {key[:12]}")
+            return flight.future.result()
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            self._land(key, flight)
+            flight.future.set_exception(e)
+            raise
+        self._land(key, flight)
+        flight.future.set_result(result)
+        return result
+
+    def _land(self, key: str, flight: Flight):
+        """ Forget the call and stop forwarding before waking followers, so they never see the leader's later events. """
+        with self.lock:
+            self.calls.pop(key, None)
+            followers = list(flight.followers)
+        if flight.progress is not None:
+            for follower in followers:
+                flight.progress.stop_forwarding(follower)
+
+    def in_flight(self) -> int:
+        with self.lock:
+            return len(self.calls)
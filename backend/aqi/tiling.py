@@ -0,0 +1,99 @@
+import math
+from typing import Dict, List, Tuple
+
+from config import TILE_MAX_PIXELS, MAX_TILES
+from aqi.geometry import polygon_area_m2
+
+Bounds = Tuple[float, float, float, float]  # west, south, east, north
+
+# Tiles used when a request failed on memory/timeout even though its pixel estimate looked safe
+MIN_FALLBACK_TILES = 4
+
+
+def ring_bounds(ring: List[List[float]]) -> Bounds:
+    lons = [point[0] for point in ring]
+    lats = [point[1] for point in ring]
+    return min(lons), min(lats), max(lons), max(lats)
+
+
+def clip_ring(ring: List[List[float]], bounds: Bounds) -> List[List[float]]:
+    """
+    Sutherland–Hodgman clip of a ring against an axis-aligned rectangle.
+    Returns a closed ring, or an empty list when nothing of the ring is left.
+    """
+    west, south, east, north = bounds
+    points = [tuple(point) for point in ring]
+    if len(points) > 1 and points[0] == points[-1]:
+        points = points[:-1]
+
+    # Each edge: inside test and the intersection of a segment with the edge line
+    edges = (
+        (lambda p: p[0] >= west, lambda p, q: (west, p[1] + (q[1] - p[1]) * (west - p[0]) / (q[0] - p[0]))),
+        (lambda p: p[0] <= east, lambda p, q: (east, p[1] + (q[1] - p[1]) * (east - p[0]) / (q[0] - p[0]))),
+        (lambda p: p[1] >= south, lambda p, q: (p[0] + (q[0] - p[0]) * (south - p[1]) / (q[1] - p[1]), south)),
+        (lambda p: p[1] <= north, lambda p, q: (p[0] + (q[0] - p[0]) * (north - p[1]) / (q[1] - p[1]), north)),
+    )
+
+    for inside, intersect in edges:
+        if not points:
+            break
+        clipped = []
+        previous = points[-1]
+        for current in points:
+            if inside(current):
+                if not inside(previous):
+                    clipped.append(intersect(previous, current))
+                clipped.append(current)
+            elif inside(previous):
+                clipped.append(intersect(previous, current))
+            previous = current
+        points = clipped
+
+    # Drop repeated vertices the clip introduces on tile corners
+    deduplicated = [point for index, point in enumerate(points) if point != points[index - 1]] if points else []
+    if len(deduplicated) < 3:
+        return []
+    return [list(point) for point in deduplicated + deduplicated[:1]]
+
+
+def tile_bounds(bounds: Bounds, tiles: int) -> List[Bounds]:
+    """ Split a bounding box into roughly square cells, at least `tiles` of them. """
+    west, south, east, north = bounds
+    width, height = east - west, north - south
+    columns = max(1, round(math.sqrt(tiles * width / height))) if height > 0 else tiles
+    rows = max(1, math.ceil(tiles / columns))
+
+    return [
+        (
+            west + width * column / columns,
+            south + height * row / rows,
+            west + width * (column + 1) / columns,
+            south + height * (row + 1) / rows,
+        )
+        for row in range(rows)
+        for column in range(columns)
+    ]
+
+
+def split_aoi(aoi: Dict, tiles: int) -> List[Dict]:
+    """
+    Cut an AOI polygon into sub-polygons along a regular grid over its bounding box.
+    Grid cells that miss the polygon are dropped, so fewer than `tiles` polygons may come back.
+    """
+    rings = aoi['coordinates']
+    sub_polygons = []
+
+    for cell in tile_bounds(ring_bounds(rings[0]), tiles):
+        outer = clip_ring(rings[0], cell)
+        if not outer:
+            continue
+        holes = [hole for hole in (clip_ring(ring, cell) for ring in rings[1:]) if hole]
+        polygon = {"type": "Polygon", "coordinates": [outer] + holes}
+        if polygon_area_m2(polygon) > 0:
+            sub_polygons.append(polygon)
+
+    return sub_polygons
+
+
+def tile_count(estimated_pixels: int, max_pixels_per_tile: float = TILE_MAX_PIXELS) -> int:
+    return min(MAX_TILES, max(1, math.ceil(estimated_pixels / max_pixels_per_tile)))
@@ -0,0 +1,82 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, List, NamedTuple, Tuple
+
+import numpy as np
+
+from config import ZONAL_MASK_CACHE_SIZE
+from aqi.geometry import aoi_hash
+
+
+class AoiMask(NamedTuple):
+    """ Flat indices of the pixels inside an AOI for one grid; reused for every reduction on that grid. """
+    indices: np.ndarray
+    shape: Tuple[int, ...]
+
+
+def points_in_polygon(lon: np.ndarray, lat: np.ndarray, rings: List[List[List[float]]]) -> np.ndarray:
+    """ Vectorised even-odd ray casting; inner rings act as holes. """
+    inside = np.zeros(lon.shape, dtype=bool)
+
+    for ring in rings:
+        xs = np.asarray([point[0] for point in ring], dtype=float)
+        ys = np.asarray([point[1] for point in ring], dtype=float)
+        for x1, y1, x2, y2 in zip(xs, ys, np.roll(xs, -1), np.roll(ys, -1)):
+            if y1 == y2:
+                continue
+            crosses = (y1 > lat) != (y2 > lat)
+            x_at_lat = x1 + (lat - y1) * (x2 - x1) / (y2 - y1)
+            inside ^= crosses & (lon < x_at_lat)
+
+    return inside
+
+
+class ZonalEngine:
+    """
+    Caches AOI masks per (grid, AOI) so that the point-in-polygon test runs once per swath slice,
+    then reduces every layer read on that slice as one masked sum over the cached indices.
+    """
+
+    def __init__(self, max_masks: int = ZONAL_MASK_CACHE_SIZE):
+        self.max_masks = max_masks
+        self.masks: "OrderedDict[Hashable, AoiMask]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _cached(self, key: Hashable, build) -> AoiMask:
+        with self.lock:
+            mask = self.masks.get(key)
+            if mask is not None:
+                self.masks.move_to_end(key)
+                return mask
+
+        mask = build()
+
+        with self.lock:
+            self.masks[key] = mask
+            while len(self.masks) > self.max_masks:
+                self.masks.popitem(last=False)
+        return mask
+
+    def mask_for_coordinates(self, grid_key: Hashable, lon: np.ndarray, lat: np.ndarray, aoi: Dict) -> AoiMask:
+        """ Mask for an irregular (e.g. swath) grid identified by `grid_key`, such as a granule path and slice. """
+        def build():
+            inside = points_in_polygon(lon, lat, aoi['coordinates'])
+            return AoiMask(np.flatnonzero(inside), inside.shape)
+        return self._cached((grid_key, aoi_hash(aoi)), build)
+
+    @staticmethod
+    def gather(stack: np.ndarray, mask: AoiMask) -> np.ndarray:
+        """ Pixels inside the AOI for every leading index of a (..., rows, cols) stack. """
+        if stack.shape[-len(mask.shape):] != mask.shape:
+            raise ValueError(f"Stack shape {stack.shape} does not match mask grid {mask.shape}")
+        leading = stack.shape[:-len(mask.shape)]
+        return stack.reshape(leading + (-1,))[..., mask.indices]
+
+    def sum_count(self, stack: np.ndarray, mask: AoiMask) -> Tuple[np.ndarray, np.ndarray]:
+        """ Per-layer sum and count of finite pixels inside the AOI; mergeable across grids and tiles. """
+        pixels = self.gather(stack, mask).astype(float, copy=False)
+        valid = np.isfinite(pixels)
+        return np.where(valid, pixels, 0.0).sum(axis=-1), valid.sum(axis=-1)
+
+
+engine = ZonalEngine()
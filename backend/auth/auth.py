@@ -6,7 +6,6 @@ from sqlalchemy.orm import Session
 from dotenv import load_dotenv
 import os
 import secrets
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig
 from pydantic import EmailStr
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
@@ -17,6 +16,8 @@ from db.crud import get_user_by_email, create_social_user
 from db.schemas import UserOAuthCreate
 from db.models import User
 from db.database import get_db
+from config import PUBLIC_BASE_URL
+from aqi.mail_service import send_mail
 
 load_dotenv()
 
@@ -114,51 +115,39 @@ def register_or_login_google_user(db: Session, google_user_info: dict) -> User:
 def generate_verification_token() -> str:
     return secrets.token_urlsafe(32)
 
-async def send_verification_email(email: EmailStr, token: str):
-    verify_url = f"http://localhost:8000/verify-email?token={token}"
-    
-    message = MessageSchema(
-    subject="Verify Your Email Address - VeriEarth",
-    recipients=[email],
-    body=f"""
-    <html>
-        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-            <div style="max-width: 600px; margin: 0 auto; padding: 20px; border: 1px solid #ddd; border-radius: 8px;">
-                <h1 style="color: #4CAF50; text-align: center;">Welcome to VeriEarth!</h1>
-                <p>Hi there,</p>
-                <p>Thank you for signing up with VeriEarth. To get started, please verify your email address by clicking the button below:</p>
-                <div style="text-align: center; margin: 20px 0;">
-                    <a href="{verify_url}" style="background-color: #4CAF50; color: white; padding: 12px 24px; text-decoration: none; border-radius: 5px; font-size: 16px;">
-                        Verify Email Address
-                    </a>
+def send_verification_email(email: EmailStr, token: str):
+    """ Queue the verification mail in the outbox; registration does not wait for SMTP. """
+    verify_url = f"{PUBLIC_BASE_URL}/verify-email?token={token}"
+
+    send_mail(
+        to_email=email,
+        subject="Verify Your Email Address - VeriEarth",
+        body=f"""
+        <html>
+            <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
+                <div style="max-width: 600px; margin: 0 auto; padding: 20px; border: 1px solid #ddd; border-radius: 8px;">
+                    <h1 style="color: #4CAF50; text-align: center;">Welcome to VeriEarth!</h1>
+                    <p>Hi there,</p>
+                    <p>Thank you for signing up with VeriEarth. To get started, please verify your email address by clicking the button below:</p>
+                    <div style="text-align: center; margin: 20px 0;">
+                        <a href="{verify_url}" style="background-color: #4CAF50; color: white; padding: 12px 24px; text-decoration: none; border-radius: 5px; font-size: 16px;">
+                            Verify Email Address
+                        </a>
+                    </div>
+                    <p>If the button above doesn't work, you can also copy and paste the following link into your browser:</p>
+                    <p style="word-break: break-all; color: #4CAF50;">{verify_url}</p>
+                    <p>If you didn't create an account with VeriEarth, you can safely ignore this email.</p>
+                    <p>Best regards,<br>The VeriEarth Team</p>
+                    <hr style="border: 0; border-top: 1px solid #ddd; margin: 20px 0;">
+                    <p style="text-align: center; font-size: 12px; color: #777;">
+                        This email was sent to {email}. If you have any questions, please contact us at <a href="mailto:support@veriearth.com" style="color: #4CAF50; text-decoration: none;">support@veriearth.com</a>.
+                    </p>
                 </div>
-                <p>If the button above doesn't work, you can also copy and paste the following link into your browser:</p>
-                <p style="word-break: break-all; color: #4CAF50;">{verify_url}</p>
-                <p>If you didn't create an account with VeriEarth, you can safely ignore this email.</p>
-                <p>Best regards,<br>The VeriEarth Team</p>
-                <hr style="border: 0; border-top: 1px solid #ddd; margin: 20px 0;">
-                <p style="text-align: center; font-size: 12px; color: #777;">
-                    This email was sent to {email}. If you have any questions, please contact us at <a href="mailto:support@veriearth.com" style="color: #4CAF50; text-decoration: none;">support@veriearth.com</a>.
-                </p>
-            </div>
-        </body>
-    </html>
-    """,
-    subtype="html"
-)
-
-    fm = FastMail(ConnectionConfig(
-        MAIL_USERNAME=os.getenv("MAIL_USERNAME"),
-        MAIL_PASSWORD=os.getenv("MAIL_PASSWORD"),
-        MAIL_FROM=os.getenv("MAIL_FROM"),
-        MAIL_PORT=587,
-        MAIL_SERVER="smtp.gmail.com",
-        MAIL_STARTTLS=True,
-        MAIL_SSL_TLS=False,
-        USE_CREDENTIALS=True
-    ))
-
-    await fm.send_message(message)
+            </body>
+        </html>
+        """,
+        subtype="html"
+    )
 
 # --- PROTECTED USER RETRIEVAL ---
 async def get_current_user(
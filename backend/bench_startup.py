@@ -0,0 +1,77 @@
+"""
+Cold-start benchmark for the API: imports `main` in a fresh interpreter with `-X importtime`,
+reports the slowest modules and fails when the import exceeds its budget or a heavy SDK is loaded eagerly.
+
+    python bench_startup.py [--budget-ms 1500] [--top 20] [--runs 3]
+"""
+import argparse
+import os
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# SDKs that must only be imported on first use or from the lifespan hooks
+LAZY_MODULES = ("ee", "google.generativeai", "fpdf", "fastapi_mail", "netCDF4", "aqi.gee_service")
+
+
+def measure(target: str) -> Tuple[Dict[str, int], List[Tuple[int, int, str]]]:
+    """ One cold import of `target`: cumulative microseconds per module and (cumulative, depth, name) rows. """
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", "sqlite://")
+    env["EE_INIT_ON_STARTUP"] = "false"
+
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {target} failed:\n{result.stderr[-2000:]}")
+
+    cumulative, rows = {}, []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line.split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        cumulative[name.strip()] = int(cumulative_us)
+        rows.append((int(cumulative_us), depth, name.strip()))
+    return cumulative, rows
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", default="main", help="module to import (default: main)")
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("STARTUP_IMPORT_BUDGET_MS", 1500)),
+                        help="fail when the best cold import takes longer (default: $STARTUP_IMPORT_BUDGET_MS or 1500)")
+    parser.add_argument("--top", type=int, default=20, help="number of slowest modules to list")
+    parser.add_argument("--runs", type=int, default=3, help="cold imports to run; the fastest one is reported")
+    args = parser.parse_args()
+
+    # The fastest run is the least disturbed by disk cache and scheduler noise
+    cumulative, rows = min((measure(args.target) for _ in range(args.runs)), key=lambda run: run[0][args.target])
+    total_ms = cumulative[args.target] / 1000
+
+    print("Slowest modules (cumulative, top-level packages and app modules):")
+    shown = [row for row in rows if row[1] <= 1 or row[2].split(".")[0] in ("aqi", "routes", "auth", "db")]
+    for cumulative_us, depth, name in sorted(shown, reverse=True)[:args.top]:
+        print(f"  {cumulative_us / 1000:8.1f} ms  {'  ' * depth}{name}")
+
+    failures = []
+    eager = [name for name in LAZY_MODULES if name in cumulative]
+    if eager:
+        failures.append(f"imported eagerly: {', '.join(eager)}")
+    if total_ms > args.budget_ms:
+        failures.append(f"import {args.target} took {total_ms:.0f} ms, budget is {args.budget_ms:.0f} ms")
+
+    print(f"\nimport {args.target}: {total_ms:.0f} ms (budget {args.budget_ms:.0f} ms)")
+    for failure in failures:
+        print(f"❌ {failure}")
+    if not failures:
+        print("✅ Within budget")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
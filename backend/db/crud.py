@@ -1,9 +1,10 @@
 from sqlalchemy.orm import Session
 from passlib.context import CryptContext
-from .models import User
+from .models import User, PollutantResult, PollutantDailyBase, ReportNarrative, ReportJob, OutboundEmail
 from .schemas import UserCreate, UserOAuthCreate
 import uuid
-from typing import Optional, Union
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Union
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -98,3 +99,407 @@ def get_user_by_verification_token(db: Session, token: str) -> Optional[User]:
     """
     return db.query(User).filter(User.verification_token == token).first()
 
+
+def get_pollutant_results(
+    db: Session,
+    aoi_hash: str,
+    pollutant: str,
+    band: str,
+    interval: str,
+    scale: float,
+    period_start: date,
+    period_end: date,
+    now: datetime
+) -> List[PollutantResult]:
+    """
+    Fetch unexpired cached results for one AOI/pollutant whose periods fall inside [period_start, period_end].
+    """
+    return db.query(PollutantResult).filter(
+        PollutantResult.aoi_hash == aoi_hash,
+        PollutantResult.pollutant == pollutant,
+        PollutantResult.band == band,
+        PollutantResult.interval == interval,
+        PollutantResult.scale == scale,
+        PollutantResult.period_start >= period_start,
+        PollutantResult.period_end <= period_end,
+        (PollutantResult.expires_at.is_(None)) | (PollutantResult.expires_at > now)
+    ).all()
+
+
+def upsert_pollutant_results(db: Session, rows: Iterable[Dict]) -> None:
+    """
+    Insert or refresh cached results. Each row carries every PollutantResult column except id.
+    """
+    for row in rows:
+        existing = db.query(PollutantResult).filter(
+            PollutantResult.aoi_hash == row["aoi_hash"],
+            PollutantResult.pollutant == row["pollutant"],
+            PollutantResult.band == row["band"],
+            PollutantResult.interval == row["interval"],
+            PollutantResult.period_start == row["period_start"],
+            PollutantResult.period_end == row["period_end"],
+            PollutantResult.scale == row["scale"]
+        ).first()
+
+        if existing:
+            existing.value = row["value"]
+            existing.period = row["period"]
+            existing.fetched_at = row["fetched_at"]
+            existing.expires_at = row["expires_at"]
+        else:
+            db.add(PollutantResult(**row))
+
+    db.commit()
+
+
+def delete_pollutant_results(
+    db: Session,
+    aoi_hash: Optional[str] = None,
+    pollutant: Optional[str] = None,
+    ends_after: Optional[date] = None,
+    expired_before: Optional[datetime] = None
+) -> int:
+    """
+    Invalidate cached results matching every given filter. Returns the number of rows removed.
+    """
+    query = db.query(PollutantResult)
+    if aoi_hash is not None:
+        query = query.filter(PollutantResult.aoi_hash == aoi_hash)
+    if pollutant is not None:
+        query = query.filter(PollutantResult.pollutant == pollutant)
+    if ends_after is not None:
+        query = query.filter(PollutantResult.period_end > ends_after)
+    if expired_before is not None:
+        query = query.filter(PollutantResult.expires_at.isnot(None), PollutantResult.expires_at <= expired_before)
+
+    deleted = query.delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+
+def get_daily_base(
+    db: Session,
+    aoi_hash: str,
+    pollutant: str,
+    band: str,
+    scale: float,
+    first_day: date,
+    last_day: date,
+    now: datetime
+) -> List[PollutantDailyBase]:
+    """
+    Fetch unexpired daily base rows for one AOI/pollutant with first_day <= day <= last_day.
+    """
+    return db.query(PollutantDailyBase).filter(
+        PollutantDailyBase.aoi_hash == aoi_hash,
+        PollutantDailyBase.pollutant == pollutant,
+        PollutantDailyBase.band == band,
+        PollutantDailyBase.scale == scale,
+        PollutantDailyBase.day >= first_day,
+        PollutantDailyBase.day <= last_day,
+        (PollutantDailyBase.expires_at.is_(None)) | (PollutantDailyBase.expires_at > now)
+    ).all()
+
+
+def upsert_daily_base(db: Session, rows: List[Dict]) -> None:
+    """
+    Insert or refresh daily base rows for a single AOI/pollutant/band/scale.
+    Existing rows in the covered range are loaded with one query instead of one per day.
+    """
+    if not rows:
+        return
+
+    first = rows[0]
+    days = [row["day"] for row in rows]
+    existing = {
+        row.day: row
+        for row in db.query(PollutantDailyBase).filter(
+            PollutantDailyBase.aoi_hash == first["aoi_hash"],
+            PollutantDailyBase.pollutant == first["pollutant"],
+            PollutantDailyBase.band == first["band"],
+            PollutantDailyBase.scale == first["scale"],
+            PollutantDailyBase.day >= min(days),
+            PollutantDailyBase.day <= max(days)
+        )
+    }
+
+    for row in rows:
+        current = existing.get(row["day"])
+        if current:
+            current.sum = row["sum"]
+            current.weight = row["weight"]
+            current.fetched_at = row["fetched_at"]
+            current.expires_at = row["expires_at"]
+        else:
+            db.add(PollutantDailyBase(**row))
+
+    db.commit()
+
+
+def delete_daily_base(
+    db: Session,
+    aoi_hash: Optional[str] = None,
+    pollutant: Optional[str] = None,
+    ends_after: Optional[date] = None,
+    expired_before: Optional[datetime] = None
+) -> int:
+    """
+    Invalidate daily base rows matching every given filter. Returns the number of rows removed.
+    """
+    query = db.query(PollutantDailyBase)
+    if aoi_hash is not None:
+        query = query.filter(PollutantDailyBase.aoi_hash == aoi_hash)
+    if pollutant is not None:
+        query = query.filter(PollutantDailyBase.pollutant == pollutant)
+    if ends_after is not None:
+        query = query.filter(PollutantDailyBase.day >= ends_after)
+    if expired_before is not None:
+        query = query.filter(PollutantDailyBase.expires_at.isnot(None), PollutantDailyBase.expires_at <= expired_before)
+
+    deleted = query.delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+
+def get_report_narratives(db: Session, prompt_hashes: List[str]) -> Dict[str, str]:
+    """ Cached narrative text for the given prompt hashes; unknown hashes are absent. """
+    if not prompt_hashes:
+        return {}
+    rows = db.query(ReportNarrative).filter(ReportNarrative.prompt_hash.in_(prompt_hashes)).all()
+    return {row.prompt_hash: row.text for row in rows}
+
+
+def upsert_report_narratives(db: Session, rows: List[Dict]) -> None:
+    existing = {
+        row.prompt_hash: row
+        for row in db.query(ReportNarrative).filter(
+            ReportNarrative.prompt_hash.in_([row["prompt_hash"] for row in rows])
+        )
+    }
+
+    for row in rows:
+        current = existing.get(row["prompt_hash"])
+        if current:
+            current.text = row["text"]
+            current.created_at = row["created_at"]
+        else:
+            db.add(ReportNarrative(**row))
+
+    db.commit()
+
+
+def enqueue_report_job(
+    db: Session,
+    kind: str,
+    payload: str,
+    now: datetime,
+    dedupe_key: Optional[str] = None,
+    user_id: Optional[str] = None,
+    max_attempts: int = 3
+) -> ReportJob:
+    """
+    Queue a job. With `dedupe_key`, a queued or running job of the same user with the same key is returned instead.
+    """
+    if dedupe_key is not None:
+        active = db.query(ReportJob).filter(
+            ReportJob.dedupe_key == dedupe_key,
+            (ReportJob.user_id == user_id) if user_id is not None else ReportJob.user_id.is_(None),
+            ReportJob.status.in_(("queued", "running"))
+        ).first()
+        if active:
+            return active
+
+    job = ReportJob(kind=kind, payload=payload, status="queued", dedupe_key=dedupe_key, user_id=user_id,
+                    attempts=0, max_attempts=max_attempts, run_after=now)
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def get_report_job(db: Session, job_id: str) -> Optional[ReportJob]:
+    return db.query(ReportJob).filter(ReportJob.id == job_id).first()
+
+
+def get_finished_report_job(db: Session, dedupe_key: str) -> Optional[ReportJob]:
+    """ Most recent successful job with this key. """
+    return db.query(ReportJob).filter(
+        ReportJob.dedupe_key == dedupe_key,
+        ReportJob.status == "succeeded"
+    ).order_by(ReportJob.finished_at.desc()).first()
+
+
+def claim_report_job(db: Session, worker_id: str, now: datetime, lease_seconds: float,
+                     kinds: Optional[List[str]] = None) -> Optional[ReportJob]:
+    """
+    Lease the oldest runnable job: queued and due, or running with an expired lease and attempts left.
+    A job whose lease expired on its last attempt (its worker crashed or hung every time) is marked failed.
+    On PostgreSQL the candidate row is locked with FOR UPDATE SKIP LOCKED so concurrent workers pick different
+    jobs; the conditional UPDATE makes the claim atomic on databases without row locks (SQLite) as well.
+    """
+    expired = (ReportJob.status == "running") & (ReportJob.lease_expires_at < now)
+    exhausted = db.query(ReportJob).filter(expired, ReportJob.attempts >= ReportJob.max_attempts).update({
+        ReportJob.status: "failed",
+        ReportJob.error: "Lease expired on the last attempt; the worker died or hung",
+        ReportJob.lease_expires_at: None,
+        ReportJob.finished_at: now,
+        ReportJob.updated_at: now,
+    }, synchronize_session=False)
+    if exhausted:
+        db.commit()
+
+    runnable = (
+        ((ReportJob.status == "queued") & (ReportJob.run_after <= now)) |
+        (expired & (ReportJob.attempts < ReportJob.max_attempts))
+    )
+    query = db.query(ReportJob.id).filter(runnable)
+    if kinds:
+        query = query.filter(ReportJob.kind.in_(kinds))
+    candidate = query.order_by(ReportJob.run_after, ReportJob.created_at).limit(1) \
+        .with_for_update(skip_locked=True).first()
+    if candidate is None:
+        db.commit()
+        return None
+
+    claimed = db.query(ReportJob).filter(ReportJob.id == candidate.id, runnable).update({
+        ReportJob.status: "running",
+        ReportJob.worker_id: worker_id,
+        ReportJob.attempts: ReportJob.attempts + 1,
+        ReportJob.lease_expires_at: now + timedelta(seconds=lease_seconds),
+        ReportJob.updated_at: now,
+    }, synchronize_session=False)
+    db.commit()
+
+    # Another worker won the race between the SELECT and the UPDATE
+    if claimed != 1:
+        return None
+    return get_report_job(db, candidate.id)
+
+
+def extend_report_job_lease(db: Session, job_id: str, worker_id: str, now: datetime, lease_seconds: float) -> bool:
+    """ Heartbeat; False when the job is no longer leased by this worker. """
+    extended = db.query(ReportJob).filter(
+        ReportJob.id == job_id,
+        ReportJob.worker_id == worker_id,
+        ReportJob.status == "running"
+    ).update({ReportJob.lease_expires_at: now + timedelta(seconds=lease_seconds)}, synchronize_session=False)
+    db.commit()
+    return extended == 1
+
+
+def update_report_job_progress(db: Session, job_id: str, worker_id: str, progress: str) -> bool:
+    """ Store the progress events of a job; False when the job is no longer leased by this worker. """
+    updated = db.query(ReportJob).filter(
+        ReportJob.id == job_id,
+        ReportJob.worker_id == worker_id,
+        ReportJob.status == "running"
+    ).update({ReportJob.progress: progress}, synchronize_session=False)
+    db.commit()
+    return updated == 1
+
+
+def finish_report_job(db: Session, job_id: str, worker_id: str, now: datetime,
+                      result: Optional[str] = None, error: Optional[str] = None,
+                      retry_at: Optional[datetime] = None, progress: Optional[str] = None) -> bool:
+    """
+    Record the outcome of a leased job: succeeded (no error), queued again for `retry_at`, or failed.
+    Ignored (False) when the lease was lost to another worker in the meantime.
+    """
+    if error is None:
+        values = {ReportJob.status: "succeeded", ReportJob.result: result, ReportJob.error: None,
+                  ReportJob.finished_at: now}
+    elif retry_at is not None:
+        values = {ReportJob.status: "queued", ReportJob.error: error, ReportJob.run_after: retry_at}
+    else:
+        values = {ReportJob.status: "failed", ReportJob.error: error, ReportJob.finished_at: now}
+    values.update({ReportJob.lease_expires_at: None, ReportJob.updated_at: now})
+    if progress is not None:
+        values[ReportJob.progress] = progress
+
+    updated = db.query(ReportJob).filter(
+        ReportJob.id == job_id,
+        ReportJob.worker_id == worker_id,
+        ReportJob.status == "running"
+    ).update(values, synchronize_session=False)
+    db.commit()
+    return updated == 1
+
+
+def enqueue_email(db: Session, to_email: str, subject: str, body: str, now: datetime,
+                  subtype: str = "plain", max_attempts: int = 5) -> OutboundEmail:
+    email = OutboundEmail(to_email=to_email, subject=subject, body=body, subtype=subtype, status="queued",
+                          attempts=0, max_attempts=max_attempts, run_after=now)
+    db.add(email)
+    db.commit()
+    db.refresh(email)
+    return email
+
+
+def claim_emails(db: Session, sender_id: str, now: datetime, lease_seconds: float, limit: int) -> List[OutboundEmail]:
+    """
+    Lease up to `limit` sendable messages (queued and due, or 'sending' with an expired lease and attempts left),
+    oldest first. A message whose lease expired on its last attempt (its sender crashed or hung) is marked failed.
+    Same locking as claim_report_job: SKIP LOCKED where supported, and the conditional UPDATE decides the race.
+    """
+    expired = (OutboundEmail.status == "sending") & (OutboundEmail.lease_expires_at < now)
+    exhausted = db.query(OutboundEmail).filter(expired, OutboundEmail.attempts >= OutboundEmail.max_attempts).update({
+        OutboundEmail.status: "failed",
+        OutboundEmail.error: "Lease expired on the last attempt; the sender died or hung",
+        OutboundEmail.lease_expires_at: None,
+    }, synchronize_session=False)
+    if exhausted:
+        db.commit()
+
+    sendable = (
+        ((OutboundEmail.status == "queued") & (OutboundEmail.run_after <= now)) |
+        (expired & (OutboundEmail.attempts < OutboundEmail.max_attempts))
+    )
+    candidates = [
+        row.id for row in db.query(OutboundEmail.id).filter(sendable)
+        .order_by(OutboundEmail.run_after, OutboundEmail.created_at).limit(limit)
+        .with_for_update(skip_locked=True).all()
+    ]
+    if not candidates:
+        db.commit()
+        return []
+
+    lease_expires_at = now + timedelta(seconds=lease_seconds)
+    db.query(OutboundEmail).filter(OutboundEmail.id.in_(candidates), sendable).update({
+        OutboundEmail.status: "sending",
+        OutboundEmail.sender_id: sender_id,
+        OutboundEmail.attempts: OutboundEmail.attempts + 1,
+        OutboundEmail.lease_expires_at: lease_expires_at,
+    }, synchronize_session=False)
+    db.commit()
+
+    # Rows another sender claimed between the SELECT and the UPDATE carry its id or lease instead
+    return db.query(OutboundEmail).filter(
+        OutboundEmail.id.in_(candidates),
+        OutboundEmail.status == "sending",
+        OutboundEmail.sender_id == sender_id,
+        OutboundEmail.lease_expires_at == lease_expires_at
+    ).order_by(OutboundEmail.run_after, OutboundEmail.created_at).all()
+
+
+def finish_emails(db: Session, sender_id: str, now: datetime, outcomes: List[Dict]) -> None:
+    """
+    Record the outcome of leased messages in one transaction. Each outcome has the message `id` and
+    optionally an `error` and a `retry_at`: sent without an error, queued again with a retry time, failed otherwise.
+    """
+    for outcome in outcomes:
+        error, retry_at = outcome.get("error"), outcome.get("retry_at")
+        if error is None:
+            values = {OutboundEmail.status: "sent", OutboundEmail.error: None, OutboundEmail.sent_at: now}
+        elif retry_at is not None:
+            values = {OutboundEmail.status: "queued", OutboundEmail.error: error, OutboundEmail.run_after: retry_at}
+        else:
+            values = {OutboundEmail.status: "failed", OutboundEmail.error: error}
+        values[OutboundEmail.lease_expires_at] = None
+
+        db.query(OutboundEmail).filter(
+            OutboundEmail.id == outcome["id"],
+            OutboundEmail.sender_id == sender_id,
+            OutboundEmail.status == "sending"
+        ).update(values, synchronize_session=False)
+
+    db.commit()
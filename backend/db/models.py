@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Boolean, DateTime, func
+from sqlalchemy import Column, String, Text, Boolean, DateTime, Date, Float, Integer, UniqueConstraint, func
 from sqlalchemy.orm import declarative_base
 import uuid
 
@@ -18,3 +18,106 @@ class User(Base):
     verification_token = Column(String, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+
+class PollutantResult(Base):
+    """ Cached AOI mean of one pollutant band over one period. """
+    __tablename__ = 'pollutant_results'
+    __table_args__ = (
+        UniqueConstraint('aoi_hash', 'pollutant', 'band', 'interval', 'period_start', 'period_end', 'scale',
+                         name='uq_pollutant_result_key'),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    aoi_hash = Column(String(64), nullable=False, index=True)
+    pollutant = Column(String, nullable=False)
+    band = Column(String, nullable=False)
+    interval = Column(String, nullable=False)
+    period = Column(String, nullable=False)
+    period_start = Column(Date, nullable=False)
+    period_end = Column(Date, nullable=False)
+    scale = Column(Float, nullable=False)
+    value = Column(Float, nullable=True)
+    fetched_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class PollutantDailyBase(Base):
+    """
+    Pixel-weighted sum of one pollutant band over an AOI for one day, with the matching sum of weights.
+    Coarser intervals are rolled up from these rows locally.
+    """
+    __tablename__ = 'pollutant_daily_base'
+    __table_args__ = (
+        UniqueConstraint('aoi_hash', 'pollutant', 'band', 'scale', 'day', name='uq_pollutant_daily_base_key'),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    aoi_hash = Column(String(64), nullable=False, index=True)
+    pollutant = Column(String, nullable=False)
+    band = Column(String, nullable=False)
+    scale = Column(Float, nullable=False)
+    day = Column(Date, nullable=False)
+    sum = Column(Float, nullable=False)
+    weight = Column(Float, nullable=False)
+    fetched_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class ReportNarrative(Base):
+    """ Model-written report section, keyed by a hash of the model, prompt version and prompt (which embeds the data). """
+    __tablename__ = 'report_narratives'
+
+    prompt_hash = Column(String(64), primary_key=True)
+    model = Column(String, nullable=False)
+    text = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class ReportJob(Base):
+    """
+    Durable unit of report work, claimed by worker processes under a lease.
+    A running job whose lease expired (worker died or hung) is claimed again by another worker.
+    """
+    __tablename__ = 'report_jobs'
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    kind = Column(String, nullable=False)
+    payload = Column(Text, nullable=False)  # JSON arguments for the job handler
+    status = Column(String, nullable=False, default='queued', index=True)  # queued, running, succeeded, failed
+    dedupe_key = Column(String(64), nullable=True, index=True)
+    user_id = Column(String, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    run_after = Column(DateTime(timezone=True), nullable=False)
+    worker_id = Column(String, nullable=True)
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True)
+    result = Column(Text, nullable=True)  # JSON returned by the handler
+    error = Column(Text, nullable=True)
+    progress = Column(Text, nullable=True)  # JSON list of progress events, see aqi/progress.py
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class OutboundEmail(Base):
+    """
+    Outbox row for a message to send. Senders claim messages in batches under a lease, so a message left
+    'sending' by a dead sender goes out again once its lease expires, unless that was its last attempt.
+    """
+    __tablename__ = 'email_outbox'
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    to_email = Column(String, nullable=False)
+    subject = Column(String, nullable=False)
+    body = Column(Text, nullable=False)
+    subtype = Column(String, nullable=False, default='plain')  # plain or html
+    status = Column(String, nullable=False, default='queued', index=True)  # queued, sending, sent, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    run_after = Column(DateTime(timezone=True), nullable=False)
+    sender_id = Column(String, nullable=True)
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    sent_at = Column(DateTime(timezone=True), nullable=True)
@@ -1,3 +1,7 @@
+import asyncio
+import importlib
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Depends, HTTPException
 from sqlalchemy.orm import Session
 
@@ -5,15 +9,90 @@ import auth.auth
 from db.database import SessionLocal, engine
 import db.models, db.schemas, db.crud
 import auth
-from routes import auth_routes, report_routes
+from routes import auth_routes, report_routes, aqi_routes
+from config import (
+    EE_INIT_ON_STARTUP, JOB_EMBEDDED_WORKERS, MAIL_SENDER_ENABLED, RESULT_CACHE_PURGE_HOURS, ARTIFACT_PURGE_HOURS,
+    ARTIFACT_SIGNING_KEY,
+)
+from aqi import job_queue
+from aqi.mail_service import sender as mail_sender
+from aqi.ee_client import client as ee_client
+from aqi.ee_metrics import process_summary
+from aqi.pdf_renderer import render_pool
+from aqi import result_cache
+from aqi.artifact_store import store as artifact_store
 
 db.models.Base.metadata.create_all(bind=engine)
 
-app = FastAPI()
+
+async def run_periodically(name: str, interval_hours: float, fn):
+    """ Call `fn` in a thread every `interval_hours`, starting one interval after startup. """
+    while True:
+        await asyncio.sleep(interval_hours * 3600)
+        try:
+            removed = await asyncio.to_thread(fn)
+            print(f"🧹 {name}: removed {removed} expired entries")
+        except Exception as e:
+            print(f"⚠️ {name} failed: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Reports rendered by worker.py processes carry links this process must verify, so the key cannot be random
+    if JOB_EMBEDDED_WORKERS <= 0 and not ARTIFACT_SIGNING_KEY:
+        raise RuntimeError("Set ARTIFACT_SIGNING_KEY or ROOT_SECRET_KEY (the same value as the report workers)")
+
+    # Initialise Earth Engine once per process instead of once per report
+    if EE_INIT_ON_STARTUP:
+        try:
+            await asyncio.to_thread(ee_client.initialize)
+        except Exception as e:
+            print(f"⚠️ Earth Engine not ready at startup, will retry on first use: {e}")
+        # The SDK is loaded now anyway; load the query layer too so the first report does not pay for it
+        await asyncio.to_thread(importlib.import_module, "aqi.gee_service")
+
+    # Report jobs normally run in worker.py processes; embedded workers serve single-process deployments
+    worker = None
+    if JOB_EMBEDDED_WORKERS > 0:
+        # Only jobs render PDFs, so the render workers are spawned here only when jobs run in this process;
+        # spawned now so the first report does not pay for it
+        try:
+            await asyncio.to_thread(render_pool.start)
+        except Exception as e:
+            print(f"⚠️ PDF render workers failed to start, will retry on first report: {e}")
+        worker = job_queue.Worker(concurrency=JOB_EMBEDDED_WORKERS)
+        worker.start()
+
+    # Delivers the email outbox, including messages queued by worker.py processes
+    if MAIL_SENDER_ENABLED:
+        mail_sender.start()
+
+    # Expired rows and unused reports are never read again; without the purges the cache and store only grow
+    maintenance = []
+    if RESULT_CACHE_PURGE_HOURS > 0:
+        maintenance.append(asyncio.create_task(
+            run_periodically("Result cache purge", RESULT_CACHE_PURGE_HOURS, result_cache.purge_expired)
+        ))
+    if ARTIFACT_PURGE_HOURS > 0:
+        maintenance.append(asyncio.create_task(
+            run_periodically("Report artifact purge", ARTIFACT_PURGE_HOURS, artifact_store.purge)
+        ))
+    yield
+    for task in maintenance:
+        task.cancel()
+    if worker is not None:
+        await asyncio.to_thread(worker.stop)
+    if MAIL_SENDER_ENABLED:
+        await asyncio.to_thread(mail_sender.stop)
+    await asyncio.to_thread(render_pool.shutdown)
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Include routes
 app.include_router(auth_routes.router, tags=["auth"])
 app.include_router(report_routes.router, prefix="/api/report", tags=["report"])
+app.include_router(aqi_routes.router, prefix="/api/aqi", tags=["aqi"])
 
 def get_db():
     db = SessionLocal()
@@ -22,6 +101,18 @@ def get_db():
     finally:
         db.close()
 
+@app.get("/health/earth-engine")
+async def earth_engine_health():
+    health = await asyncio.to_thread(ee_client.health_check)
+    if health["status"] != "ok":
+        raise HTTPException(status_code=503, detail=health)
+    return health
+
+@app.get("/health/earth-engine/usage")
+def earth_engine_usage(current_user: db.models.User = Depends(auth.auth.get_current_user)):
+    # Quota usage is operational data, so unlike the liveness check it needs a logged-in user
+    return process_summary()
+
 @app.post("/register", response_model=db.schemas.UserOut)
 def register(user: db.schemas.UserCreate, db: Session = Depends(get_db)):
     existing_user = db.crud.get_user_by_email(db, user.email)
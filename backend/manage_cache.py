@@ -0,0 +1,44 @@
+"""
+Pollutant result cache maintenance. Run `invalidate` after the source data changes (e.g. a Sentinel-5P
+reprocessing, or a collection or band swapped in aqi/pollutants.py) so reports are recomputed from it.
+
+    python manage_cache.py purge
+    python manage_cache.py invalidate [--aoi aoi.geojson] [--pollutant NO2] [--ends-after 2024-01-01]
+"""
+import argparse
+import json
+import sys
+
+from aqi import result_cache
+from aqi.periods import to_date
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("purge", help="delete expired entries (the API also does this every RESULT_CACHE_PURGE_HOURS)")
+    invalidate = commands.add_parser("invalidate", help="delete entries matching every given filter")
+    invalidate.add_argument("--aoi", help="GeoJSON polygon file of the AOI to drop (default: all AOIs)")
+    invalidate.add_argument("--pollutant", help="pollutant name as in aqi/pollutants.py (default: all)")
+    invalidate.add_argument("--ends-after", help="only drop periods ending after this date, YYYY-MM-DD")
+    invalidate.add_argument("--all", action="store_true", help="required to drop the whole cache without filters")
+    args = parser.parse_args()
+
+    if args.command == "purge":
+        print(f"🧹 Removed {result_cache.purge_expired()} expired entries")
+        return 0
+
+    if not (args.aoi or args.pollutant or args.ends_after or args.all):
+        parser.error("invalidate without filters drops the whole cache; pass --all to confirm")
+
+    aoi = None
+    if args.aoi:
+        with open(args.aoi) as f:
+            aoi = json.load(f)
+    ends_after = to_date(args.ends_after) if args.ends_after else None
+    print(f"🗑️ Removed {result_cache.invalidate(aoi, args.pollutant, ends_after)} cached entries")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
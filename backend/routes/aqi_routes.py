@@ -0,0 +1,74 @@
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel, model_validator
+from typing import Dict, List, Literal, Optional
+import numpy as np
+import os
+
+import db
+from auth.auth import get_current_user
+from aqi.aqi_engine import categorize, get_standard, overall_index, sub_index
+
+router = APIRouter()
+
+MAX_AQI_VALUES = int(os.getenv("MAX_AQI_VALUES", 1_000_000))
+
+# ------------------ Input Models ------------------
+
+class AQIComputeRequest(BaseModel):
+    standard: Literal["CPCB", "US_EPA", "EU_CAQI"] = "CPCB"
+    # One column of concentrations per pollutant, aligned by position; null marks a missing value
+    concentrations: Dict[str, List[Optional[float]]]
+    include_sub_indices: bool = False
+
+    @model_validator(mode="after")
+    def validate_columns(self):
+        if not self.concentrations:
+            raise ValueError("At least one pollutant column is required")
+
+        lengths = {len(values) for values in self.concentrations.values()}
+        if len(lengths) != 1:
+            raise ValueError("All pollutant columns must have the same length")
+
+        if lengths.pop() * len(self.concentrations) > MAX_AQI_VALUES:
+            raise ValueError(f"A request can contain at most {MAX_AQI_VALUES} values")
+        return self
+
+
+def to_json_column(values: np.ndarray) -> List[Optional[float]]:
+    return np.where(np.isnan(values), None, values).tolist()
+
+
+# ------------------ Route Handler ------------------
+
+@router.post("/compute")
+def compute_aqi(
+    request: AQIComputeRequest,
+    current_user: db.models.User = Depends(get_current_user)
+):
+    """ Evaluate the AQI for whole columns at once; pollutants outside the standard are ignored. """
+    columns = {
+        pollutant: np.array(values, dtype=float)  # None becomes NaN
+        for pollutant, values in request.concentrations.items()
+    }
+
+    try:
+        aqi, dominant = overall_index(columns, request.standard)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    response = {
+        "standard": request.standard,
+        "aqi": to_json_column(aqi),
+        "category": categorize(aqi, request.standard).tolist(),
+        "dominant_pollutant": dominant.tolist(),
+    }
+
+    if request.include_sub_indices:
+        covered = get_standard(request.standard).tables
+        response["sub_indices"] = {
+            pollutant: to_json_column(sub_index(pollutant, values, request.standard))
+            for pollutant, values in columns.items()
+            if pollutant in covered
+        }
+
+    return response
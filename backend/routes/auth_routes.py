@@ -33,8 +33,8 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
     user.verification_token = verification_token
     db.commit()
 
-    # Send verification email
-    await send_verification_email(user.email, verification_token)
+    # Queue the verification email; the mail sender delivers it in the background
+    send_verification_email(user.email, verification_token)
 
     return {"msg": "Please check your email to verify your account"}
 
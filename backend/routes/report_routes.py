@@ -1,26 +1,38 @@
-from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
+from fastapi import APIRouter, HTTPException, Depends, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel, validator, model_validator
-from typing import List, Dict, Literal
-from datetime import datetime
+from typing import Iterable, Iterator, List, Dict, Literal, Optional, Tuple
+from datetime import datetime, timezone
 from sqlalchemy.orm import Session
-from aqi.gee_service import fetch_pollutant_data
-from aqi.report_agent import generate_esg_audit_report
-from db.database import get_db
+from aqi.result_matrix import PollutantMatrix
+from aqi.singleflight import SingleFlight, request_key
+from aqi.report_agent import build_period_reports, draft_esg_audit_report, submit_esg_audit_report, submit_report_draft, summarize_pollutants
+from aqi import job_queue, progress, result_cache
+from aqi.periods import to_date
+from aqi.mail_service import send_mail
+from aqi.artifact_store import Artifact, download_url, store as artifact_store, verify as verify_signature
+from config import ARTIFACT_LINK_TTL_HOURS, PROGRESS_POLL_SECONDS
+from db.database import SessionLocal, get_db
+from db.crud import get_finished_report_job, get_report_job, get_user_by_email
 import db
-from auth.auth import get_current_user
+from auth.auth import decode_token, get_current_user
+import asyncio
+import csv
+import io
+import json
 import os
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from email.mime.application import MIMEApplication
 from dotenv import load_dotenv
-import time
 
 # Load environment variables
 load_dotenv()
 
 router = APIRouter()
 
+MAX_BATCH_SITES = int(os.getenv("MAX_BATCH_SITES", 50))
+# Requests estimated above these Earth Engine budgets are rejected before queueing
+MAX_REPORT_EE_CALLS = int(os.getenv("MAX_REPORT_EE_CALLS", 1000))
+MAX_REPORT_PIXELS = float(os.getenv("MAX_REPORT_PIXELS", 1e10))
+
 # ------------------ Input Models ------------------
 
 class AOI(BaseModel):
@@ -47,12 +59,11 @@ class AOI(BaseModel):
         return v
 
 
-class FetchAndGenerateReportRequest(BaseModel):
-    aoi: AOI
+class DateRangeRequest(BaseModel):
     start_date: str
     end_date: str
     interval: Literal["day", "week", "month", "year"]
-    region: str
+    mode: Literal["fast", "exact"] = "fast"
 
     @validator("start_date", "end_date")
     def validate_date_format(cls, v):
@@ -71,63 +82,249 @@ class FetchAndGenerateReportRequest(BaseModel):
         return self
 
 
-# ------------------ Email Utility ------------------
+class FetchAndGenerateReportRequest(DateRangeRequest):
+    aoi: AOI
+    region: str
+    backend: Literal["ee", "s5p_local"] = "ee"
+    dry_run: bool = False
+
+
+class StreamPollutantDataRequest(DateRangeRequest):
+    aoi: AOI
+    backend: Literal["ee", "s5p_local"] = "ee"
+    format: Literal["ndjson", "sse"] = "ndjson"
+
+
+class ReportResultsRequest(DateRangeRequest):
+    aoi: AOI
+    region: Optional[str] = None
+    backend: Literal["ee", "s5p_local"] = "ee"
+    format: Literal["json", "csv", "parquet"] = "json"
+
+
+class Site(BaseModel):
+    aoi: AOI
+    region: str
+
+
+class BatchReportRequest(DateRangeRequest):
+    sites: List[Site]
+    dry_run: bool = False
+
+    @validator("sites")
+    def validate_sites(cls, v):
+        if not v:
+            raise ValueError("At least one site is required")
+        if len(v) > MAX_BATCH_SITES:
+            raise ValueError(f"A batch can contain at most {MAX_BATCH_SITES} sites")
+        return v
+
+
+# ------------------ Budget Check ------------------
+
+def check_ee_budget(estimate: Dict) -> Dict:
+    """ Reject a request whose estimated Earth Engine cost exceeds the configured budget. """
+    if estimate["calls"] > MAX_REPORT_EE_CALLS or estimate["pixels"] > MAX_REPORT_PIXELS:
+        raise HTTPException(
+            status_code=422,
+            detail={
+                "message": "Request exceeds the Earth Engine budget; use a coarser interval, shorter range or smaller AOI",
+                "limits": {"calls": MAX_REPORT_EE_CALLS, "pixels": MAX_REPORT_PIXELS},
+                "estimate": estimate,
+            }
+        )
+
+    return estimate
+
+
+def enforce_ee_budget(request: DateRangeRequest, aoi: Dict, first_chunk: Optional[int] = None) -> Dict:
+    """ Estimate the Earth Engine cost of a request and reject it when it exceeds the configured budget. """
+    # gee_service pulls in the Earth Engine SDK, so it is only imported once a report is requested
+    from aqi.gee_service import estimate_request_cost
 
-def send_email_with_attachment(to_email: str, name: str, file_path: str):
-    smtp_server = os.getenv("MAIL_SERVER")
-    smtp_port = int(os.getenv("MAIL_PORT", 587))
-    smtp_username = os.getenv("MAIL_USERNAME")
-    smtp_password = os.getenv("MAIL_PASSWORD")
-    mail_from = os.getenv("MAIL_FROM")
+    return check_ee_budget(estimate_request_cost(
+        aoi=aoi,
+        start_date=request.start_date,
+        end_date=request.end_date,
+        interval=request.interval,
+        scale_mode=request.mode,
+        first_chunk=first_chunk
+    ))
 
-    msg = MIMEMultipart()
-    msg["From"] = mail_from
-    msg["To"] = to_email
-    msg["Subject"] = "Your ESG Audit Report from VeriEarth"
 
+def enforce_batch_ee_budget(request: BatchReportRequest) -> Dict:
+    """ The same budget applies to a batch as a whole, since every site is fetched by one job. """
+    from aqi.gee_service import estimate_multi_request_cost
+
+    return check_ee_budget(estimate_multi_request_cost(
+        aois=[site.aoi.dict() for site in request.sites],
+        start_date=request.start_date,
+        end_date=request.end_date,
+        interval=request.interval,
+        scale_mode=request.mode
+    ))
+
+
+# ------------------ Streaming ------------------
+
+STREAM_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "sse": "text/event-stream",
+}
+
+
+def format_stream_event(payload: Dict, fmt: str, event: str = "record") -> str:
+    if fmt == "sse":
+        return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+    if event != "record":
+        payload = {"event": event, **payload}
+    return json.dumps(payload) + "\n"
+
+
+def encode_record_stream(records: Iterable[Dict], fmt: str) -> Iterator[str]:
+    """ Serialise records one by one; a failure ends the stream with an error event instead of a cut connection. """
+    count = 0
+    try:
+        for record in records:
+            count += 1
+            yield format_stream_event(record, fmt)
+    except Exception as e:
+        print(f"⚠️ Error while streaming pollutant data: {e}")
+        yield format_stream_event({"error": str(e), "records": count}, fmt, event="error")
+        return
+
+    yield format_stream_event({"records": count}, fmt, event="end")
+
+
+# ------------------ Result Encoding ------------------
+
+RESULT_MEDIA_TYPES = {
+    "json": "application/json",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def result_table(period_reports: List[Dict]) -> Dict[str, list]:
+    """ One row per period: pollutant levels, AQI and category as columns. """
+    pollutants = list(period_reports[0]["pollutants"]) if period_reports else []
+    table = {"period": [report["period"] for report in period_reports]}
+    for pollutant in pollutants:
+        table[pollutant] = [report["pollutants"][pollutant] for report in period_reports]
+    table["aqi"] = [report["aqi"]["value"] for report in period_reports]
+    table["aqi_category"] = [report["aqi"]["category"] for report in period_reports]
+    return table
+
+
+def encode_results(matrix: PollutantMatrix, region: Optional[str], fmt: str) -> Response:
+    period_reports = build_period_reports(matrix)
+
+    if fmt == "json":
+        return JSONResponse({
+            "status": "ready",
+            "region": region,
+            "interval": matrix.interval,
+            "scales": matrix.scales,
+            "periods": period_reports,
+            "statistics": summarize_pollutants(matrix),
+        })
+
+    table = result_table(period_reports)
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(table)
+        writer.writerows(zip(*table.values()))
+        content = buffer.getvalue()
+    else:
+        try:
+            # Optional dependency, only needed for Parquet output
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise HTTPException(status_code=501, detail="Parquet output requires pyarrow on the server")
+        buffer = io.BytesIO()
+        pyarrow.parquet.write_table(pyarrow.table(table), buffer)
+        content = buffer.getvalue()
+
+    return Response(content, media_type=RESULT_MEDIA_TYPES[fmt],
+                    headers={"Content-Disposition": f'attachment; filename="report_results.{fmt}"'})
+
+
+def job_result_matrix(job) -> PollutantMatrix:
+    """ Matrix of a succeeded "results" job. """
+    return PollutantMatrix.from_records(json.loads(job.result)["records"])
+
+
+def results_still_fresh(job, end_date: str) -> bool:
+    """ A finished "results" job answers repeat requests for as long as the result cache would keep its last period. """
+    finished_at = job.finished_at
+    if finished_at.tzinfo is None:
+        # SQLite hands timestamps back without their zone
+        finished_at = finished_at.replace(tzinfo=timezone.utc)
+    expires_at = result_cache.expiry_for(to_date(end_date), finished_at)
+    return expires_at is None or datetime.now(timezone.utc) < expires_at
+
+
+# ------------------ Email Utility ------------------
+
+def send_report_links(to_email: str, name: str, artifacts: List[Tuple[str, Artifact]]):
+    """ Queue an email with signed download links for `(region, artifact)` pairs; the PDFs stay in the artifact store. """
+    links = "\n".join(
+        f"    - {region} ({artifact.size / 1024:.0f} KB): {download_url(artifact.key)}"
+        for region, artifact in artifacts
+    )
     body = f"""
     Dear {name},
 
-    Your ESG Audit Report is ready! Please find the attached PDF report.
+    Your ESG Audit Report is ready! Download the PDF report{"s" if len(artifacts) > 1 else ""} here:
+
+{links}
+
+    Download links are valid for {ARTIFACT_LINK_TTL_HOURS:g} hours.
 
     Thank you for using VeriEarth.
 
     Best regards,
     The VeriEarth Team
     """
-    msg.attach(MIMEText(body, "plain"))
+    send_mail(to_email=to_email, subject="Your ESG Audit Report from VeriEarth", body=body)
 
-    # --- Intentional Delay ---
-    time.sleep(3)  # This is the intentional 3-second delay
 
-    try:
-        with open(file_path, "rb") as file:
-            pdf_data = file.read()
+# ------------------ Report Jobs ------------------
 
-        attachment = MIMEApplication(pdf_data, _subtype="pdf")
-        attachment.add_header(
-            "Content-Disposition",
-            f"attachment; filename=ESG_Audit_Report_{datetime.now().strftime('%Y-%m-%d')}.pdf"
-        )
-        msg.attach(attachment)
+# Identical reports requested while one is being computed share that computation
+report_flights = SingleFlight("report data")
 
-        with smtplib.SMTP(smtp_server, smtp_port) as server:
-            server.starttls()
-            server.login(smtp_username, smtp_password)
-            server.sendmail(mail_from, to_email, msg.as_string())
 
-        print(f"✅ Email sent to {to_email}")
+def compute_report_data(aoi: Dict, start_date: str, end_date: str, interval: str, backend: str, mode: str) -> PollutantMatrix:
+    from aqi.gee_service import iter_pollutant_data
 
-        # Optional Cleanup: Delete the report after sending if desired
-        os.remove(file_path)
-        print(f"🗑️ Deleted report file: {file_path}")
+    # Records are folded into the columnar matrix as they arrive instead of being collected first
+    return PollutantMatrix.from_records(iter_pollutant_data(
+        aoi=aoi,
+        start_date=start_date,
+        end_date=end_date,
+        interval=interval,
+        backend=backend,
+        scale_mode=mode,
+        first_chunk=None
+    ))
 
-    except Exception as e:
-        print(f"⚠️ Failed to send email: {e}")
 
+@job_queue.register("results")
+def compute_results_job(aoi: Dict, start_date: str, end_date: str, interval: str, backend: str, mode: str) -> Dict:
+    """ Job handler for /results requests that missed the cache; the records are kept on the job row. """
+    key = request_key(aoi=aoi, start_date=start_date, end_date=end_date, interval=interval,
+                      backend=backend, mode=mode)
+    matrix = report_flights.do(key, compute_report_data, aoi, start_date, end_date, interval, backend, mode)
+    return {"records": [
+        {**record, "scale": matrix.scales.get(record["pollutant"])}
+        for record in matrix.to_records() if record["value"] is not None
+    ]}
 
-# ------------------ Background Task ------------------
 
+@job_queue.register("report")
 def generate_and_send_report(
     aoi: Dict,
     start_date: str,
@@ -135,52 +332,345 @@ def generate_and_send_report(
     interval: str,
     region: str,
     email: str,
-    name: str
+    name: str,
+    backend: str = "ee",
+    mode: str = "fast"
 ):
-    try:
-        data = fetch_pollutant_data(
-            aoi=aoi,
-            start_date=start_date,
-            end_date=end_date,
-            interval=interval
-        )
+    # Failures propagate to the job worker, which retries the job with backoff
+    key = request_key(aoi=aoi, start_date=start_date, end_date=end_date, interval=interval,
+                      backend=backend, mode=mode)
+    data = report_flights.do(key, compute_report_data, aoi, start_date, end_date, interval, backend, mode)
 
-        # Generate PDF report and save to disk, get file path
-        file_path = generate_esg_audit_report(region, data)
+    # Render (or reuse) the stored PDF and email a download link to it
+    progress.emit("rendering", reports=1)
+    artifact = submit_esg_audit_report(region, data).result()
+    send_report_links(to_email=email, name=name, artifacts=[(region, artifact)])
+    progress.emit("delivered", reports=1)
 
-        # Send email with attachment (reading after 3-second delay)
-        send_email_with_attachment(to_email=email, name=name, file_path=file_path)
 
-    except Exception as e:
-        print(f"⚠️ Error in background task: {e}")
+@job_queue.register("batch_report")
+def generate_and_send_batch_report(
+    sites: List[Dict],
+    start_date: str,
+    end_date: str,
+    interval: str,
+    email: str,
+    name: str,
+    mode: str = "fast"
+):
+    from aqi.gee_service import fetch_pollutant_data_multi
+
+    aois = [site["aoi"] for site in sites]
+    key = request_key(aois=aois, start_date=start_date, end_date=end_date, interval=interval, mode=mode)
+    per_site_data = report_flights.do(
+        key, fetch_pollutant_data_multi,
+        aois=aois,
+        start_date=start_date,
+        end_date=end_date,
+        interval=interval,
+        scale_mode=mode
+    )
+
+    # Request every site's narrative first so the sections are batched and share one deadline,
+    # then queue the PDFs so the render pool lays them out in parallel
+    drafts = [
+        draft_esg_audit_report(site["region"], data)
+        for site, data in zip(sites, per_site_data)
+    ]
+    progress.emit("rendering", reports=len(drafts))
+    renders = [submit_report_draft(draft) for draft in drafts]
+    artifacts = [(site["region"], render.result()) for site, render in zip(sites, renders)]
+
+    send_report_links(to_email=email, name=name, artifacts=artifacts)
+    progress.emit("delivered", reports=len(artifacts))
 
 
 # ------------------ Route Handler ------------------
 
+def job_accepted(job, message: str) -> Dict:
+    return {
+        "status": "queued",
+        "job_id": job.id,
+        "status_url": f"/api/report/jobs/{job.id}",
+        "events_url": f"/api/report/jobs/{job.id}/events",
+        "message": message,
+    }
+
+
 @router.post("/fetch-and-generate-report")
 async def fetch_and_generate_report(
     request: FetchAndGenerateReportRequest,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: db.models.User = Depends(get_current_user)
 ):
+    if request.backend == "ee":
+        estimate = enforce_ee_budget(request, request.aoi.dict())
+
+        if request.dry_run:
+            return {"status": "dry_run", "estimate": estimate}
+
+    elif request.dry_run:
+        raise HTTPException(status_code=400, detail="Dry run estimates are only available for the Earth Engine backend")
+
     try:
         email = current_user.email
         name = getattr(current_user, "full_name", "User")
+        payload = {
+            "aoi": request.aoi.dict(),
+            "start_date": request.start_date,
+            "end_date": request.end_date,
+            "interval": request.interval,
+            "region": request.region,
+            "email": email,
+            "name": name,
+            "backend": request.backend,
+            "mode": request.mode,
+        }
+
+        # Resubmitting the same report while it is still queued or running returns the existing job
+        job = job_queue.enqueue("report", payload, dedupe_key=request_key(kind="report", **payload),
+                                user_id=current_user.id)
+        return job_accepted(job, "Request accepted. Report will be emailed shortly.")
 
-        background_tasks.add_task(
-            generate_and_send_report,
-            aoi=request.aoi.dict(),
-            start_date=request.start_date,
-            end_date=request.end_date,
-            interval=request.interval,
-            region=request.region,
-            email=email,
-            name=name
-        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to initiate report generation: {str(e)}")
 
-        return {"status": "success", "message": "Request accepted. Report will be emailed shortly."}
+
+@router.post("/fetch-and-generate-batch-report")
+async def fetch_and_generate_batch_report(
+    request: BatchReportRequest,
+    db: Session = Depends(get_db),
+    current_user: db.models.User = Depends(get_current_user)
+):
+    estimate = enforce_batch_ee_budget(request)
+    if request.dry_run:
+        return {"status": "dry_run", "estimate": estimate}
+
+    try:
+        email = current_user.email
+        name = getattr(current_user, "full_name", "User")
+        payload = {
+            "sites": [site.dict() for site in request.sites],
+            "start_date": request.start_date,
+            "end_date": request.end_date,
+            "interval": request.interval,
+            "email": email,
+            "name": name,
+            "mode": request.mode,
+        }
+
+        job = job_queue.enqueue("batch_report", payload, dedupe_key=request_key(kind="batch_report", **payload),
+                                user_id=current_user.id)
+        return job_accepted(job, f"Request accepted. Reports for {len(request.sites)} sites will be emailed shortly.")
 
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to initiate report generation: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to initiate batch report generation: {str(e)}")
+
+
+def can_watch_job(job, user) -> bool:
+    """ Jobs are visible to the user who queued them; jobs without an owner to any user. """
+    return job.user_id is None or (user is not None and job.user_id == user.id)
+
 
+@router.get("/jobs/{job_id}")
+def get_job_status(
+    job_id: str,
+    db: Session = Depends(get_db),
+    current_user: db.models.User = Depends(get_current_user)
+):
+    job = get_report_job(db, job_id)
+    if job is None or not can_watch_job(job, current_user):
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    events = progress.load_events(job.progress)
+    return {
+        "job_id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "error": job.error,
+        "created_at": job.created_at,
+        "updated_at": job.updated_at,
+        "run_after": job.run_after,
+        "finished_at": job.finished_at,
+        "progress": events[-1] if events else None,
+        "events": events,
+    }
+
+
+def load_job(job_id: str):
+    db = SessionLocal()
+    try:
+        return get_report_job(db, job_id)
+    finally:
+        db.close()
+
+
+def websocket_user(token: Optional[str]):
+    """ Browsers cannot set headers on a WebSocket, so the access token comes as a query parameter. """
+    if not token:
+        return None
+    try:
+        payload = decode_token(token)
+    except HTTPException:
+        return None
+    db = SessionLocal()
+    try:
+        return get_user_by_email(db, payload.get("sub"))
+    finally:
+        db.close()
+
+
+@router.websocket("/jobs/{job_id}/events")
+async def watch_job(websocket: WebSocket, job_id: str, token: Optional[str] = None):
+    """
+    Progress events of a job as JSON messages: the events so far, then each new one until the job succeeds or
+    fails for good. Jobs run in this process are pushed as they happen; others are picked up from the job row.
+    """
+    user = await asyncio.to_thread(websocket_user, token)
+    job = await asyncio.to_thread(load_job, job_id)
+    if user is None or job is None or not can_watch_job(job, user):
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    queue = progress.hub.subscribe(job_id)
+    last_seq = 0
+    try:
+        # Subscribed before the snapshot, so nothing published in between is missed
+        events, finished = progress.load_events(job.progress), job.status in progress.TERMINAL_STAGES
+        while True:
+            for event in events:
+                if event["seq"] > last_seq:
+                    await websocket.send_json(event)
+                    last_seq = event["seq"]
+                    finished = finished or event["stage"] in progress.TERMINAL_STAGES
+            if finished:
+                break
+
+            try:
+                events = [await asyncio.wait_for(queue.get(), timeout=PROGRESS_POLL_SECONDS)]
+            except asyncio.TimeoutError:
+                job = await asyncio.to_thread(load_job, job_id)
+                if job is None:
+                    # Deleted while watched (by hand, or the database was reset)
+                    await websocket.send_json({
+                        "seq": last_seq + 1, "stage": "failed", "at": datetime.now(timezone.utc).isoformat(),
+                        "error": "Job no longer exists"
+                    })
+                    break
+                events, finished = progress.load_events(job.progress), job.status in progress.TERMINAL_STAGES
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        progress.hub.unsubscribe(job_id, queue)
+
+
+@router.post("/stream-pollutant-data")
+async def stream_pollutant_data(
+    request: StreamPollutantDataRequest,
+    current_user: db.models.User = Depends(get_current_user)
+):
+    """ Stream pollutant records as NDJSON lines or Server-Sent Events while they are being computed. """
+    from aqi.gee_service import STREAM_FIRST_CHUNK_PERIODS, iter_pollutant_data
+
+    aoi = request.aoi.dict()
+    if request.backend == "ee":
+        # Streams are fetched in growing chunks, each its own set of calls
+        enforce_ee_budget(request, aoi, first_chunk=STREAM_FIRST_CHUNK_PERIODS)
+
+    records = iter_pollutant_data(
+        aoi=aoi,
+        start_date=request.start_date,
+        end_date=request.end_date,
+        interval=request.interval,
+        backend=request.backend,
+        scale_mode=request.mode
+    )
+
+    return StreamingResponse(
+        encode_record_stream(records, request.format),
+        media_type=STREAM_MEDIA_TYPES[request.format],
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.post("/results")
+def get_report_results(
+    request: ReportResultsRequest,
+    db: Session = Depends(get_db),
+    current_user: db.models.User = Depends(get_current_user)
+):
+    """
+    Report numbers without the PDF. Served immediately when every period is already in the result cache;
+    otherwise the computation is queued and a job handle is returned (202) to poll at /results/{job_id}.
+    """
+    aoi = request.aoi.dict()
+
+    if request.backend == "ee":
+        from aqi.gee_service import load_cached_pollutant_data
+
+        try:
+            records = load_cached_pollutant_data(aoi, request.start_date, request.end_date, request.interval,
+                                                 scale_mode=request.mode)
+        except Exception as e:
+            print(f"⚠️ Result cache unavailable for /results: {e}")
+            records = None
+        if records is not None:
+            return encode_results(PollutantMatrix.from_records(records), request.region, request.format)
+
+        enforce_ee_budget(request, aoi)
+
+    payload = {"aoi": aoi, "start_date": request.start_date, "end_date": request.end_date,
+               "interval": request.interval, "backend": request.backend, "mode": request.mode}
+    dedupe_key = request_key(kind="results", **payload)
+
+    # Results are not user specific, so a recent enough finished job for the same request answers it directly
+    finished = get_finished_report_job(db, dedupe_key)
+    if finished is not None and results_still_fresh(finished, request.end_date):
+        return encode_results(job_result_matrix(finished), request.region, request.format)
+
+    job = job_queue.enqueue("results", payload, dedupe_key=dedupe_key, user_id=current_user.id)
+    return JSONResponse(status_code=202, content={
+        "status": "pending",
+        "job_id": job.id,
+        "result_url": f"/api/report/results/{job.id}?format={request.format}",
+    })
+
+
+@router.get("/results/{job_id}")
+def get_report_results_job(
+    job_id: str,
+    format: Literal["json", "csv", "parquet"] = "json",
+    region: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: db.models.User = Depends(get_current_user)
+):
+    job = get_report_job(db, job_id)
+    if job is None or job.kind != "results" or not can_watch_job(job, current_user):
+        raise HTTPException(status_code=404, detail="Unknown results job")
+    if job.status == "failed":
+        raise HTTPException(status_code=500, detail=f"Results job failed: {job.error}")
+    if job.status != "succeeded":
+        return JSONResponse(status_code=202, content={"status": "pending", "job_id": job_id})
+    return encode_results(job_result_matrix(job), region, format)
+
+
+@router.get("/artifacts/{key}")
+def download_artifact(key: str, expires: int, signature: str):
+    """ Serve a stored report to holders of a signed link; Range requests are answered with 206. """
+    if not verify_signature(key, expires, signature):
+        raise HTTPException(status_code=403, detail="Download link is invalid or has expired")
+
+    artifact = artifact_store.get(key)
+    if artifact is None:
+        raise HTTPException(status_code=404, detail="Report not found")
+
+    return FileResponse(
+        artifact.path,
+        media_type="application/pdf",
+        filename=f"ESG_Audit_Report_{key[:12]}.pdf",
+        headers={"Cache-Control": "private, max-age=86400, immutable"}
+    )
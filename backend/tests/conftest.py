@@ -0,0 +1,54 @@
+import os
+import socket
+import tempfile
+
+import pytest
+
+
+def free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+# config.py reads the environment at import time, so the test settings go in before any app module is imported
+TEST_DIR = tempfile.mkdtemp(prefix="veriearth-tests-")
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{os.path.join(TEST_DIR, 'test.db')}",
+    "ROOT_SECRET_KEY": "test-secret",
+    "EE_INIT_ON_STARTUP": "false",
+    "PDF_RENDER_WORKERS": "0",
+    "ARTIFACT_DIR": os.path.join(TEST_DIR, "artifacts"),
+    "S5P_PRODUCT_DIR": os.path.join(TEST_DIR, "s5p"),
+    "S5P_EXTRACT_DIR": os.path.join(TEST_DIR, "s5p-extracted"),
+    "NARRATIVE_MODEL": "stub",
+    "MAIL_SENDER_ENABLED": "false",
+    "MAIL_SERVER": "127.0.0.1",
+    "MAIL_PORT": str(free_port()),
+    "MAIL_TLS": "false",
+    "MAIL_SSL": "false",
+    "MAIL_USERNAME": "",
+    "MAIL_FROM": "reports@veriearth.test",
+    "MAIL_TIMEOUT_SECONDS": "5",
+})
+
+
+@pytest.fixture(scope="session", autouse=True)
+def tables():
+    import db.models
+    from db.database import engine
+
+    db.models.Base.metadata.create_all(bind=engine)
+    yield
+    engine.dispose()
+
+
+@pytest.fixture
+def session():
+    from db.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
@@ -0,0 +1,137 @@
+import math
+
+import numpy as np
+import pytest
+
+from aqi.accumulators import Moments, QuantileSketch
+
+RNG = np.random.default_rng(42)
+
+
+def test_merging_two_splits_reproduces_numpy_moments():
+    values = RNG.normal(50, 12, 1000)
+    cell = np.zeros(1000, dtype=int)
+
+    merged = Moments.from_values((1,), (cell[:400],), values[:400])
+    merged.merge(Moments.from_values((1,), (cell[400:],), values[400:]))
+
+    assert merged.count[0] == 1000
+    assert merged.mean[0] == pytest.approx(values.mean(), rel=1e-12)
+    assert merged.variance()[0] == pytest.approx(values.var(), rel=1e-12)
+    assert merged.std(ddof=1)[0] == pytest.approx(values.std(ddof=1), rel=1e-12)
+    assert (merged.min[0], merged.max[0]) == (values.min(), values.max())
+
+
+def test_merge_is_exact_per_cell_and_ignores_empty_cells():
+    shape = (2, 3)
+    cells = RNG.integers(0, 5, 2000)  # cell 5 never gets a value
+    values = RNG.lognormal(0, 1, 2000)
+    index = np.unravel_index(cells, shape)
+
+    batches = [Moments.from_values(shape, tuple(axis[part] for axis in index), values[part])
+               for part in np.array_split(np.arange(2000), [300, 1100])]
+    merged = batches[0].merge(batches[1]).merge(batches[2])
+
+    for cell in range(6):
+        expected = values[cells == cell]
+        position = np.unravel_index(cell, shape)
+        assert merged.count[position] == len(expected)
+        if len(expected):
+            assert merged.mean[position] == pytest.approx(expected.mean(), rel=1e-12)
+            assert merged.variance()[position] == pytest.approx(expected.var(), rel=1e-12)
+        else:
+            assert merged.mean[position] == 0
+            assert math.isnan(merged.variance()[position])
+
+
+def test_reduce_pools_cells_like_one_batch():
+    shape = (4, 2)
+    cells = RNG.integers(0, 8, 500)
+    values = RNG.normal(0, 3, 500)
+    moments = Moments.from_values(shape, np.unravel_index(cells, shape), values)
+
+    reduced = moments.reduce(axis=0)
+    for column in range(2):
+        expected = values[cells % 2 == column]
+        assert reduced.count[column] == len(expected)
+        assert reduced.mean[column] == pytest.approx(expected.mean(), rel=1e-12)
+        assert reduced.variance()[column] == pytest.approx(expected.var(), rel=1e-12)
+
+    empty = Moments((0, 2)).reduce(axis=0)
+    assert empty.count.tolist() == [0, 0]
+
+
+def test_resize_keeps_cells_at_their_coordinates():
+    moments = Moments.from_values((2, 2), (np.array([0, 1]), np.array([1, 0])), [3.0, 5.0])
+    grown = moments.resize((3, 4))
+
+    assert grown.shape == (3, 4)
+    assert grown.count.sum() == 2
+    assert (grown.mean[0, 1], grown.mean[1, 0]) == (3.0, 5.0)
+    assert grown.min[2, 3] == np.inf
+    assert moments.resize((2, 2)) is moments
+
+
+# ------------------ QuantileSketch ------------------
+
+QUANTILES = [0, 0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99, 1]
+
+
+def value_at_rank(values, q):
+    return np.sort(values)[math.floor(q * (len(values) - 1))]
+
+
+@pytest.mark.parametrize("accuracy", [0.01, 0.05])
+def test_quantiles_are_within_the_relative_accuracy(accuracy):
+    # Spread narrow enough to fit in max_bins, so no bucket is collapsed
+    values = np.concatenate([RNG.lognormal(2, 0.5, 5000), -RNG.lognormal(0, 0.5, 500), np.zeros(50)])
+    sketch = QuantileSketch(relative_accuracy=accuracy).update(values)
+
+    for q in QUANTILES:
+        expected = value_at_rank(values, q)
+        assert abs(sketch.quantile(q) - expected) <= accuracy * abs(expected) + 1e-12, q
+
+
+def test_merged_sketches_equal_one_sketch_over_all_values():
+    values = RNG.lognormal(0, 2, 3000)
+    whole = QuantileSketch().update(values)
+    merged = QuantileSketch().update(values[:1000]).merge(QuantileSketch().update(values[1000:]))
+
+    assert (merged.count, merged.min, merged.max) == (whole.count, whole.min, whole.max)
+    assert merged.positive == whole.positive
+    assert [merged.quantile(q) for q in QUANTILES] == [whole.quantile(q) for q in QUANTILES]
+
+    with pytest.raises(ValueError):
+        merged.merge(QuantileSketch(relative_accuracy=0.05))
+
+
+def test_add_and_update_bucket_values_alike():
+    values = [0.5, 3.0, -2.0, 0.0, float("nan"), 1e6]
+    added = QuantileSketch()
+    for value in values:
+        added.add(value)
+    updated = QuantileSketch().update(values)
+
+    assert (added.positive, added.negative) == (updated.positive, updated.negative)
+    assert (added.zeros, added.count) == (updated.zeros, updated.count) == (1, 5)
+
+
+def test_collapsed_sketch_stays_bounded_and_keeps_the_upper_buckets_accurate():
+    values = RNG.lognormal(0, 1, 20000)
+    sketch = QuantileSketch(relative_accuracy=0.05, max_bins=64).update(values)
+
+    assert len(sketch.positive) == 32
+    # Everything below the lowest kept bucket was folded into it
+    collapsed_below = sketch.gamma ** min(sketch.positive)
+    for q in [index / 100 for index in range(101)]:
+        expected = value_at_rank(values, q)
+        if expected > collapsed_below:
+            assert abs(sketch.quantile(q) - expected) <= 0.05 * expected, q
+        else:
+            assert sketch.quantile(q) <= collapsed_below * (1 + 0.05), q
+
+
+def test_empty_sketch_and_invalid_quantile():
+    assert QuantileSketch().quantile(0.5) is None
+    with pytest.raises(ValueError):
+        QuantileSketch().quantile(1.5)
@@ -0,0 +1,122 @@
+import math
+
+import numpy as np
+import pytest
+
+from aqi.aqi_engine import CPCB_BREAKPOINTS, UNKNOWN_CATEGORY, categorize, overall_index, sub_index
+from aqi.report_agent import aqi_category, calculate_aqi, calculate_aqi_for_pollutant
+
+
+def original_aqi_for_pollutant(pollutant, concentration):
+    """ The CPCB band loop report_agent used before the vectorised engine. """
+    for lo_c, hi_c, lo_aqi, hi_aqi in CPCB_BREAKPOINTS[pollutant]:
+        if lo_c <= concentration <= hi_c:
+            return round(((concentration - lo_c) / (hi_c - lo_c)) * (hi_aqi - lo_aqi) + lo_aqi)
+    return 500
+
+
+@pytest.mark.parametrize("standard, pollutant, concentration, expected", [
+    # Band edges
+    ("CPCB", "PM2.5", 0, 0),
+    ("CPCB", "PM2.5", 30, 50),
+    ("CPCB", "PM2.5", 31, 51),
+    ("CPCB", "PM2.5", 60, 100),
+    ("CPCB", "PM2.5", 251, 401),
+    ("CPCB", "PM2.5", 500, 500),
+    ("CPCB", "CO", 1.1, 51),
+    ("CPCB", "O3", 749, 401),
+    # Inside a band
+    ("CPCB", "PM2.5", 45, 75),
+    ("CPCB", "NO2", 130, 150),
+    # Gaps between published bands take the top of the lower band
+    ("CPCB", "PM2.5", 30.5, 50),
+    ("CPCB", "NO2", 40.9, 50),
+    ("CPCB", "CO", 1.05, 50),
+    # Above the top band
+    ("CPCB", "PM2.5", 501, 500),
+    ("CPCB", "SO2", 50000, 500),
+    ("US_EPA", "PM2.5", 9.0, 50),
+    ("US_EPA", "PM2.5", 9.05, 50),
+    ("US_EPA", "PM2.5", 9.1, 51),
+    ("US_EPA", "PM2.5", 35.4, 100),
+    ("US_EPA", "PM2.5", 325.4, 500),
+    ("US_EPA", "PM2.5", 400, 500),
+    ("US_EPA", "O3", 0.2, 300),
+    ("US_EPA", "O3", 0.25, 500),
+    ("US_EPA", "NO2", 100, 100),
+    ("EU_CAQI", "NO2", 0, 0),
+    ("EU_CAQI", "NO2", 50, 25),
+    ("EU_CAQI", "NO2", 60, 30),
+    ("EU_CAQI", "NO2", 400, 100),
+    # CAQI has no cap: the last band is extrapolated
+    ("EU_CAQI", "NO2", 600, 125),
+    ("EU_CAQI", "PM2.5", 220, 150),
+])
+def test_sub_index(standard, pollutant, concentration, expected):
+    assert sub_index(pollutant, [concentration], standard)[0] == expected
+
+
+@pytest.mark.parametrize("standard", ["CPCB", "US_EPA", "EU_CAQI"])
+def test_negative_and_nan_concentrations_have_no_sub_index(standard):
+    assert np.isnan(sub_index("NO2", [-1, np.nan], standard)).all()
+
+
+def test_unknown_standard_or_pollutant_is_rejected():
+    with pytest.raises(ValueError, match="Unsupported AQI standard"):
+        sub_index("NO2", [1], "WHO")
+    with pytest.raises(ValueError, match="No US_EPA breakpoints"):
+        sub_index("NH3", [1], "US_EPA")
+
+
+def test_overall_index_takes_the_highest_sub_index_and_skips_missing_values():
+    index, dominant = overall_index({
+        "NO2": np.array([130, np.nan, np.nan]),
+        "PM2.5": np.array([45, 90, np.nan]),
+        "AOD": np.array([1, 1, 1]),  # not covered by CPCB, ignored
+    })
+
+    assert index[:2].tolist() == [150, 200]
+    assert math.isnan(index[2])
+    assert dominant.tolist() == ["NO2", "PM2.5", None]
+
+
+@pytest.mark.parametrize("standard, index, expected", [
+    ("CPCB", 0, "Good"),
+    ("CPCB", 50, "Good"),
+    ("CPCB", 51, "Satisfactory"),
+    ("CPCB", 200, "Moderate"),
+    ("CPCB", 401, "Severe"),
+    ("US_EPA", 101, "Unhealthy for Sensitive Groups"),
+    ("US_EPA", 500, "Hazardous"),
+    ("EU_CAQI", 100, "High"),
+    ("EU_CAQI", 125, "Very High"),
+    ("CPCB", np.nan, UNKNOWN_CATEGORY),
+])
+def test_categorize(standard, index, expected):
+    assert categorize([index], standard)[0] == expected
+
+
+# ------------------ report_agent ------------------
+
+@pytest.mark.parametrize("pollutant", sorted(CPCB_BREAKPOINTS))
+def test_report_agent_matches_the_original_band_loop_inside_every_band(pollutant):
+    for lo_c, hi_c, _, _ in CPCB_BREAKPOINTS[pollutant]:
+        for concentration in np.linspace(lo_c, hi_c, 23).tolist() + [hi_c * 10]:
+            expected = original_aqi_for_pollutant(pollutant, concentration)
+            assert calculate_aqi_for_pollutant(pollutant, concentration) == expected, concentration
+
+
+def test_report_agent_overall_aqi_and_category_are_unchanged():
+    concentrations = {"pm25": 45, "pm10": 80, "no2": 130, "so2": 20, "co": 1.5, "o3": 60}
+    expected = max(original_aqi_for_pollutant(pollutant, value) for pollutant, value in zip(
+        ["PM2.5", "PM10", "NO2", "SO2", "CO", "O3"], concentrations.values()
+    ))
+
+    assert calculate_aqi(**concentrations) == expected == 150
+    assert aqi_category(150) == "Moderate"
+
+
+def test_report_agent_caps_negative_and_nan_input_like_the_original():
+    assert calculate_aqi_for_pollutant("NO2", -1) == original_aqi_for_pollutant("NO2", -1) == 500
+    assert calculate_aqi_for_pollutant("NO2", float("nan")) == original_aqi_for_pollutant("NO2", float("nan")) == 500
+    assert calculate_aqi_for_pollutant("NO2", float("nan"), "EU_CAQI") == 100
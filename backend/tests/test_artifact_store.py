@@ -0,0 +1,122 @@
+import os
+import time
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from aqi import artifact_store
+from aqi.artifact_store import ArtifactStore, artifact_key, download_url, sign, verify
+
+PERIOD_REPORTS = [
+    {"period": "2024-01", "aqi": {"value": 142, "category": "Moderate"}, "pollutants": {"NO2": 0.000123}},
+]
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = ArtifactStore(str(tmp_path))
+    # The download route serves from the module's store
+    monkeypatch.setattr("routes.report_routes.artifact_store", store)
+    return store
+
+
+@pytest.fixture
+def renders(monkeypatch):
+    """ Count the renders the store sends to the (in-process) render pool. """
+    calls = []
+    submit = artifact_store.render_pool.submit
+
+    def counting_submit(*args, **kwargs):
+        calls.append(args[0])
+        return submit(*args, **kwargs)
+
+    monkeypatch.setattr(artifact_store.render_pool, "submit", counting_submit)
+    return calls
+
+
+def link_params(url: str):
+    query = parse_qs(urlparse(url).query)
+    return int(query["expires"][0]), query["signature"][0]
+
+
+def test_signed_link_verifies_until_it_expires():
+    key = "a" * 64
+    expires, signature = link_params(download_url(key, ttl_hours=1))
+
+    assert expires == pytest.approx(time.time() + 3600, abs=5)
+    assert verify(key, expires, signature)
+
+    past = int(time.time()) - 1
+    assert not verify(key, past, sign(key, past))
+
+
+def test_tampered_links_are_rejected():
+    key = "a" * 64
+    expires, signature = link_params(download_url(key))
+
+    assert not verify("b" * 64, expires, signature)
+    assert not verify(key, expires + 3600, signature)
+    assert not verify(key, expires, signature[:-1] + ("0" if signature[-1] != "0" else "1"))
+    assert not verify(key, expires, "")
+
+
+def test_identical_reports_are_stored_once(store, renders):
+    first = store.submit("Testland", PERIOD_REPORTS, {"NO2": 1113.2}).result(timeout=30)
+    second = store.submit("Testland", PERIOD_REPORTS, {"NO2": 1113.2}).result(timeout=30)
+
+    assert first == second
+    assert first.key == artifact_key("Testland", PERIOD_REPORTS, {"NO2": 1113.2})
+    assert first.path == store.path_for(first.key) and first.size == os.path.getsize(first.path)
+    assert len(renders) == 1
+    # No temporary render files left next to it
+    assert os.listdir(os.path.dirname(first.path)) == [f"{first.key}.pdf"]
+
+    narrated = store.submit("Testland", PERIOD_REPORTS, {"NO2": 1113.2}, narrative={"summary": "Clean air"})
+    other = narrated.result(timeout=30)
+    assert other.key != first.key
+    assert len(renders) == 2
+
+
+def test_only_content_keys_are_looked_up(store):
+    assert store.get("../../etc/passwd") is None
+    assert store.get("A" * 64) is None
+    assert store.get("a" * 64) is None
+
+
+def test_purge_removes_only_artifacts_past_their_age(store):
+    old = store.submit("Old", PERIOD_REPORTS, {}).result(timeout=30)
+    fresh = store.submit("Fresh", PERIOD_REPORTS, {}).result(timeout=30)
+    ten_days_ago = time.time() - 10 * 86400
+    os.utime(old.path, (ten_days_ago, ten_days_ago))
+
+    assert store.purge(max_age_days=7) == 1
+    assert store.get(old.key) is None
+    assert store.get(fresh.key) == fresh
+
+
+def test_reuse_refreshes_the_artifact_so_purge_keeps_it(store):
+    artifact = store.submit("Reused", PERIOD_REPORTS, {}).result(timeout=30)
+    ten_days_ago = time.time() - 10 * 86400
+    os.utime(artifact.path, (ten_days_ago, ten_days_ago))
+
+    store.submit("Reused", PERIOD_REPORTS, {}).result(timeout=30)
+    assert store.purge(max_age_days=7) == 0
+
+
+def test_download_route_checks_the_signature(store):
+    artifact = store.submit("Testland", PERIOD_REPORTS, {}).result(timeout=30)
+    expires, signature = link_params(download_url(artifact.key))
+    client = TestClient(main.app)
+    url = f"/api/report/artifacts/{artifact.key}"
+
+    response = client.get(url, params={"expires": expires, "signature": signature})
+    assert response.status_code == 200
+    assert response.content.startswith(b"%PDF-")
+
+    assert client.get(url, params={"expires": expires, "signature": "0" * 64}).status_code == 403
+    assert client.get(url, params={"expires": expires + 1, "signature": signature}).status_code == 403
+    missing = "f" * 64
+    assert client.get(f"/api/report/artifacts/{missing}",
+                      params={"expires": expires, "signature": sign(missing, expires)}).status_code == 404
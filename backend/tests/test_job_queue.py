@@ -0,0 +1,123 @@
+import json
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from aqi import job_queue
+from aqi.job_queue import Worker, retry_delay
+from db.crud import claim_report_job, enqueue_report_job, extend_report_job_lease, finish_report_job, get_report_job
+
+
+@pytest.fixture
+def kind():
+    # The queue is shared by the whole test session, so every test claims only its own kind
+    return f"test-{uuid.uuid4().hex[:8]}"
+
+
+def utc(value: datetime) -> datetime:
+    # SQLite returns timestamps without their zone
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def test_active_jobs_are_deduplicated_per_user(session, kind):
+    now = datetime.now(timezone.utc)
+    first = enqueue_report_job(session, kind, "{}", now, dedupe_key="same", user_id="alice")
+
+    assert enqueue_report_job(session, kind, "{}", now, dedupe_key="same", user_id="alice").id == first.id
+    assert enqueue_report_job(session, kind, "{}", now, dedupe_key="same", user_id="bob").id != first.id
+    assert enqueue_report_job(session, kind, "{}", now, dedupe_key="other", user_id="alice").id != first.id
+
+    job = claim_report_job(session, "worker-a", now, 60, kinds=[kind])
+    assert finish_report_job(session, job.id, "worker-a", now, result="{}")
+    # A finished job is not reused
+    assert enqueue_report_job(session, job.kind, "{}", now, dedupe_key=job.dedupe_key,
+                              user_id=job.user_id).id != job.id
+
+
+def test_expired_lease_is_reclaimed_and_the_old_worker_cannot_finish(session, kind):
+    now = datetime.now(timezone.utc)
+    job = enqueue_report_job(session, kind, "{}", now)
+
+    claimed = claim_report_job(session, "worker-a", now, 10, kinds=[kind])
+    assert (claimed.id, claimed.status, claimed.attempts) == (job.id, "running", 1)
+    # Leased, so nobody else gets it
+    assert claim_report_job(session, "worker-b", now + timedelta(seconds=5), 10, kinds=[kind]) is None
+
+    # The heartbeat keeps it leased past the original expiry
+    assert extend_report_job_lease(session, job.id, "worker-a", now + timedelta(seconds=5), 10)
+    assert claim_report_job(session, "worker-b", now + timedelta(seconds=12), 10, kinds=[kind]) is None
+
+    reclaimed = claim_report_job(session, "worker-b", now + timedelta(seconds=20), 10, kinds=[kind])
+    assert (reclaimed.id, reclaimed.worker_id, reclaimed.attempts) == (job.id, "worker-b", 2)
+
+    assert not extend_report_job_lease(session, job.id, "worker-a", now + timedelta(seconds=21), 10)
+    assert not finish_report_job(session, job.id, "worker-a", now + timedelta(seconds=21), result="{}")
+    assert finish_report_job(session, job.id, "worker-b", now + timedelta(seconds=22), result='{"ok": true}')
+
+    session.expire_all()
+    finished = get_report_job(session, job.id)
+    assert (finished.status, finished.result, finished.lease_expires_at) == ("succeeded", '{"ok": true}', None)
+
+
+def test_lease_expiring_on_the_last_attempt_fails_the_job(session, kind):
+    now = datetime.now(timezone.utc)
+    job = enqueue_report_job(session, kind, "{}", now, max_attempts=2)
+
+    assert claim_report_job(session, "worker-a", now, 10, kinds=[kind]).attempts == 1
+    assert claim_report_job(session, "worker-b", now + timedelta(seconds=20), 10, kinds=[kind]).attempts == 2
+    assert claim_report_job(session, "worker-c", now + timedelta(seconds=40), 10, kinds=[kind]) is None
+
+    session.expire_all()
+    failed = get_report_job(session, job.id)
+    assert (failed.status, failed.attempts) == ("failed", 2)
+    assert "Lease expired" in failed.error
+
+
+def test_worker_retries_a_failing_handler_with_backoff(session, kind, monkeypatch):
+    calls = []
+
+    def flaky(value):
+        calls.append(value)
+        if len(calls) < 2:
+            raise RuntimeError("transient")
+        return {"value": value}
+
+    monkeypatch.setitem(job_queue.handlers, kind, flaky)
+    worker = Worker(concurrency=1, lease_seconds=10, kinds=[kind])
+    job = job_queue.enqueue(kind, {"value": 7}, max_attempts=2)
+
+    started = datetime.now(timezone.utc)
+    worker.run(worker.claim())
+    session.expire_all()
+    row = get_report_job(session, job.id)
+    assert (row.status, row.attempts) == ("queued", 1)
+    assert row.error == "RuntimeError: transient"
+    assert utc(row.run_after) - started >= timedelta(seconds=retry_delay(1))
+    # Not due yet
+    assert worker.claim() is None
+
+    row.run_after = datetime.now(timezone.utc)
+    session.commit()
+    worker.run(worker.claim())
+    session.expire_all()
+    row = get_report_job(session, job.id)
+    assert (row.status, row.attempts, json.loads(row.result)) == ("succeeded", 2, {"value": 7})
+    # Events of both attempts are kept in one log
+    assert [event["stage"] for event in json.loads(row.progress)] == ["started", "retrying", "started", "succeeded"]
+    assert calls == [7, 7]
+
+
+def test_worker_fails_the_job_once_its_attempts_are_used_up(session, kind, monkeypatch):
+    def broken():
+        raise ValueError("bad payload")
+
+    monkeypatch.setitem(job_queue.handlers, kind, broken)
+    worker = Worker(concurrency=1, lease_seconds=10, kinds=[kind])
+    job = job_queue.enqueue(kind, {}, max_attempts=1)
+
+    worker.run(worker.claim())
+    session.expire_all()
+    row = get_report_job(session, job.id)
+    assert (row.status, row.attempts, row.error) == ("failed", 1, "ValueError: bad payload")
+    assert row.finished_at is not None
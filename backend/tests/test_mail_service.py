@@ -0,0 +1,163 @@
+import os
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from aiosmtpd.controller import Controller
+
+from aqi.mail_service import MailSender, SmtpPool, retry_delay, send_mail
+from db.models import OutboundEmail
+
+
+class Mailbox:
+    """ aiosmtpd handler that keeps accepted messages and answers chosen recipients with a canned reply. """
+
+    def __init__(self):
+        self.messages = []
+        self.peers = set()
+        self.replies = {}
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address in self.replies:
+            return self.replies[address]
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.peers.add(session.peer)
+        self.messages.append(envelope)
+        return "250 Message accepted for delivery"
+
+
+@pytest.fixture(scope="module")
+def smtp_server():
+    handler = Mailbox()
+    controller = Controller(handler, hostname=os.environ["MAIL_SERVER"], port=int(os.environ["MAIL_PORT"]))
+    controller.start()
+    yield handler
+    controller.stop()
+
+
+@pytest.fixture
+def mailbox(smtp_server, session):
+    session.query(OutboundEmail).delete()
+    session.commit()
+    smtp_server.messages.clear()
+    smtp_server.peers.clear()
+    smtp_server.replies.clear()
+    return smtp_server
+
+
+@pytest.fixture
+def sender():
+    mail_sender = MailSender(threads=1, batch_size=2)
+    yield mail_sender
+    mail_sender.stop()
+
+
+def utc(value: datetime) -> datetime:
+    # SQLite returns timestamps without their zone
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def test_outbox_is_delivered_in_batches_over_one_session(mailbox, sender, session):
+    emails = [send_mail(f"user{index}@example.com", "Your report", f"Report {index}") for index in range(3)]
+
+    assert sender.send_due() == 2
+    assert sender.send_due() == 1
+    assert sender.send_due() == 0
+
+    assert sorted(envelope.rcpt_tos[0] for envelope in mailbox.messages) == [email.to_email for email in emails]
+    assert len(mailbox.peers) == 1
+    assert {row.status for row in session.query(OutboundEmail)} == {"sent"}
+
+
+def test_temporary_failure_is_retried_with_exponential_backoff(mailbox, sender, session):
+    mailbox.replies["busy@example.com"] = "451 4.3.0 Mailbox temporarily unavailable"
+    email = send_mail("busy@example.com", "Your report", "Report")
+
+    started = datetime.now(timezone.utc)
+    assert sender.send_due() == 1
+    row = session.get(OutboundEmail, email.id)
+    assert (row.status, row.attempts) == ("queued", 1)
+    assert "451" in row.error
+    assert utc(row.run_after) - started >= timedelta(seconds=retry_delay(1))
+
+    # Not due yet
+    assert sender.send_due() == 0
+
+    row.run_after = datetime.now(timezone.utc)
+    session.commit()
+    started = datetime.now(timezone.utc)
+    assert sender.send_due() == 1
+    session.refresh(row)
+    assert (row.status, row.attempts) == ("queued", 2)
+    assert utc(row.run_after) - started >= timedelta(seconds=retry_delay(2))
+    assert retry_delay(2) == 2 * retry_delay(1)
+
+    del mailbox.replies["busy@example.com"]
+    row.run_after = datetime.now(timezone.utc)
+    session.commit()
+    assert sender.send_due() == 1
+    session.refresh(row)
+    assert (row.status, row.attempts, row.error) == ("sent", 3, None)
+
+
+def test_permanent_failure_is_not_retried_and_keeps_the_session(mailbox, sender, session):
+    mailbox.replies["nobody@example.com"] = "550 5.1.1 No such user"
+    refused = send_mail("nobody@example.com", "Your report", "Report")
+    delivered = send_mail("someone@example.com", "Your report", "Report")
+
+    assert sender.send_due() == 2
+    assert session.get(OutboundEmail, refused.id).status == "failed"
+    assert session.get(OutboundEmail, delivered.id).status == "sent"
+    assert [envelope.rcpt_tos for envelope in mailbox.messages] == [["someone@example.com"]]
+
+
+def test_message_fails_once_its_attempts_are_used_up(mailbox, sender, session):
+    mailbox.replies["busy@example.com"] = "451 4.3.0 Mailbox temporarily unavailable"
+    email = send_mail("busy@example.com", "Your report", "Report", max_attempts=1)
+
+    assert sender.send_due() == 1
+    row = session.get(OutboundEmail, email.id)
+    assert (row.status, row.attempts) == ("failed", 1)
+
+
+def test_pool_reuses_idle_sessions_and_replaces_broken_or_stale_ones(mailbox):
+    pool = SmtpPool(size=1, idle_seconds=60)
+    try:
+        first = pool.acquire()
+        pool.release(first)
+        assert pool.acquire() is first
+
+        pool.release(first, broken=True)
+        second = pool.acquire()
+        assert second is not first
+        pool.release(second)
+    finally:
+        pool.close()
+
+    stale_pool = SmtpPool(size=1, idle_seconds=0)
+    try:
+        first = stale_pool.acquire()
+        stale_pool.release(first)
+        second = stale_pool.acquire()
+        assert second is not first
+        stale_pool.release(second)
+    finally:
+        stale_pool.close()
+
+
+def test_lease_expiring_on_the_last_attempt_fails_the_message(mailbox, sender, session):
+    email = send_mail("hung@example.com", "Your report", "Report", max_attempts=2)
+
+    # A sender claimed the last attempt and died without recording the outcome
+    row = session.get(OutboundEmail, email.id)
+    row.status, row.sender_id, row.attempts = "sending", "dead-sender", 2
+    row.lease_expires_at = datetime.now(timezone.utc) - timedelta(seconds=1)
+    session.commit()
+
+    assert sender.send_due() == 0
+    session.refresh(row)
+    assert (row.status, row.attempts, row.lease_expires_at) == ("failed", 2, None)
+    assert "Lease expired" in row.error
+    assert mailbox.messages == []
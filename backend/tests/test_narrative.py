@@ -0,0 +1,49 @@
+import uuid
+
+from aqi.narrative import NARRATIVE_SECTIONS, Narrator, StubModel
+
+PERIOD_REPORTS = [
+    {"period": "2024-01", "aqi": {"value": 142, "category": "Moderate"}, "pollutants": {"NO2": 0.0001234567, "CO": 0.031}},
+    {"period": "2024-02", "aqi": {"value": 88, "category": "Satisfactory"}, "pollutants": {"NO2": 0.0000987654, "CO": 0.027}},
+]
+
+
+class FailingModel:
+    name = "failing"
+
+    def generate(self, prompts):
+        raise RuntimeError("model unavailable")
+
+
+def region() -> str:
+    # The narrative cache is shared by the whole test session
+    return f"Region {uuid.uuid4().hex[:8]}"
+
+
+def test_sections_are_generated_in_one_batch_and_then_served_from_the_cache():
+    model = StubModel()
+    narrator = Narrator(model=model, timeout=5, window=0.2, max_batch=8, workers=1)
+    first, second = region(), region()
+
+    pending = [narrator.request(first, PERIOD_REPORTS), narrator.request(second, PERIOD_REPORTS)]
+    results = [narrative.result() for narrative in pending]
+
+    assert all(set(result) == set(NARRATIVE_SECTIONS) for result in results)
+    assert results[0]["summary"].startswith("Narrative for: ")
+    assert first in results[0]["summary"] and second in results[1]["summary"]
+    assert model.calls == 1
+
+    assert narrator.request(first, PERIOD_REPORTS).result() == results[0]
+    assert model.calls == 1
+
+
+def test_failed_model_falls_back_to_the_static_text():
+    narrator = Narrator(model=FailingModel(), timeout=5, window=0.01, max_batch=8, workers=1)
+
+    assert narrator.request(region(), PERIOD_REPORTS).result() is None
+
+
+def test_slow_model_is_not_waited_for_past_the_deadline():
+    narrator = Narrator(model=StubModel(latency=1.0), timeout=0.1, window=0.01, max_batch=8, workers=1)
+
+    assert narrator.request(region(), PERIOD_REPORTS).result() is None
@@ -0,0 +1,45 @@
+import os
+import signal
+
+import pytest
+
+from aqi.pdf_renderer import RenderPool
+
+PERIOD_REPORTS = [
+    {"period": "2024-01", "aqi": {"value": 142, "category": "Moderate"}, "pollutants": {"NO2": 0.000123, "CO": 0.031}},
+]
+
+
+@pytest.fixture
+def pool():
+    render_pool = RenderPool(workers=1)
+    render_pool.start()
+    yield render_pool
+    render_pool.shutdown()
+
+
+def kill_workers(render_pool: RenderPool):
+    for process in list(render_pool.executor._processes.values()):
+        os.kill(process.pid, signal.SIGKILL)
+        process.join()
+
+
+def test_renders_in_a_worker_process(pool, tmp_path):
+    file_path = str(tmp_path / "report.pdf")
+
+    assert pool.submit("Testland", PERIOD_REPORTS, {"NO2": 1113.2}, file_path=file_path).result(timeout=60) == file_path
+    with open(file_path, "rb") as f:
+        assert f.read(5) == b"%PDF-"
+
+
+def test_dead_worker_is_replaced_and_the_render_retried(pool, tmp_path):
+    broken = pool.executor
+    kill_workers(pool)
+
+    file_path = str(tmp_path / "report.pdf")
+    assert pool.submit("Testland", PERIOD_REPORTS, {}, file_path=file_path).result(timeout=60) == file_path
+    assert pool.executor is not broken
+
+    # The new pool keeps serving renders
+    second_path = str(tmp_path / "second.pdf")
+    assert pool.submit("Testland", PERIOD_REPORTS, {}, file_path=second_path).result(timeout=60) == second_path
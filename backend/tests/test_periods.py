@@ -0,0 +1,110 @@
+from datetime import date, datetime
+
+import pytest
+
+from aqi.periods import (
+    Period, add_months, advance, generate_periods, parse_period_label, period_label, to_date,
+)
+
+
+def bounds(periods):
+    return [(period.start, period.end) for period in periods]
+
+
+def test_months_from_a_month_end_clamp_without_drifting():
+    periods = generate_periods("2024-01-31", "2024-06-01", "month")
+
+    assert [period.start for period in periods] == [
+        date(2024, 1, 31), date(2024, 2, 29), date(2024, 3, 31), date(2024, 4, 30), date(2024, 5, 31)
+    ]
+    assert periods[-1].end == date(2024, 6, 30)
+    assert [period.label for period in periods] == ["2024-01", "2024-02", "2024-03", "2024-04", "2024-05"]
+
+
+@pytest.mark.parametrize("anchor, months, expected", [
+    (date(2023, 1, 31), 1, date(2023, 2, 28)),
+    (date(2024, 1, 31), 1, date(2024, 2, 29)),
+    (date(2024, 1, 31), 2, date(2024, 3, 31)),
+    (date(2024, 3, 31), -1, date(2024, 2, 29)),
+    (date(2024, 11, 30), 3, date(2025, 2, 28)),
+    (date(2024, 2, 29), 12, date(2025, 2, 28)),
+    (date(2024, 2, 29), 48, date(2028, 2, 29)),
+])
+def test_add_months_clamps_to_the_month_length(anchor, months, expected):
+    assert add_months(anchor, months) == expected
+
+
+def test_years_from_a_leap_day_return_to_it_in_leap_years():
+    periods = generate_periods("2024-02-29", "2028-03-01", "year")
+
+    assert [period.start for period in periods] == [
+        date(2024, 2, 29), date(2025, 2, 28), date(2026, 2, 28), date(2027, 2, 28), date(2028, 2, 29)
+    ]
+    assert [period.label for period in periods] == ["2024", "2025", "2026", "2027", "2028"]
+
+
+def test_days_cross_the_leap_day():
+    assert [period.label for period in generate_periods("2024-02-28", "2024-03-02", "day")] == [
+        "2024-02-28", "2024-02-29", "2024-03-01"
+    ]
+
+
+@pytest.mark.parametrize("start, label", [
+    (date(2020, 12, 28), "2020-W53"),
+    (date(2021, 1, 1), "2020-W53"),  # ISO year differs from the calendar year
+    (date(2026, 12, 28), "2026-W53"),
+    (date(2024, 12, 30), "2025-W01"),
+    (date(2024, 1, 1), "2024-W01"),
+])
+def test_week_labels_use_iso_years_and_weeks(start, label):
+    assert period_label(start, "week") == label
+
+
+def test_weeks_span_the_iso_year_boundary():
+    periods = generate_periods("2020-12-21", "2021-01-11", "week")
+
+    assert [period.label for period in periods] == ["2020-W52", "2020-W53", "2021-W01"]
+    assert bounds(periods)[1] == (date(2020, 12, 28), date(2021, 1, 4))
+
+
+@pytest.mark.parametrize("interval, start", [
+    ("day", date(2024, 2, 29)),
+    ("week", date(2020, 12, 28)),
+    ("week", date(2025, 1, 6)),
+    ("month", date(2024, 2, 1)),
+    ("year", date(2024, 1, 1)),
+])
+def test_labels_round_trip_to_the_period_start(interval, start):
+    assert parse_period_label(period_label(start, interval)) == start
+
+
+def test_week_label_parses_to_the_monday_of_its_week():
+    assert parse_period_label(period_label(date(2021, 1, 1), "week")) == date(2020, 12, 28)
+
+
+def test_end_date_mid_period_keeps_the_whole_last_period():
+    assert bounds(generate_periods("2024-01-01", "2024-02-15", "month")) == [
+        (date(2024, 1, 1), date(2024, 2, 1)), (date(2024, 2, 1), date(2024, 3, 1))
+    ]
+    assert bounds(generate_periods("2024-01-01", "2024-01-10", "week")) == [
+        (date(2024, 1, 1), date(2024, 1, 8)), (date(2024, 1, 8), date(2024, 1, 15))
+    ]
+    # The end date is exclusive
+    assert len(generate_periods("2024-01-01", "2024-03-01", "month")) == 2
+    assert generate_periods("2024-01-01", "2024-01-01", "day") == []
+
+
+def test_periods_are_contiguous():
+    periods = generate_periods("2023-11-15", "2025-03-01", "month")
+
+    assert all(previous.end == current.start for previous, current in zip(periods, periods[1:]))
+    assert periods[0] == Period(date(2023, 11, 15), date(2023, 12, 15), "2023-11")
+
+
+def test_inputs_and_unsupported_intervals():
+    assert to_date(datetime(2024, 5, 6, 12, 30)) == to_date("2024-05-06") == date(2024, 5, 6)
+    assert advance(date(2024, 1, 1), "week", 2) == date(2024, 1, 15)
+    with pytest.raises(ValueError):
+        generate_periods("2024-01-01", "2024-02-01", "quarter")
+    with pytest.raises(ValueError):
+        advance(date(2024, 1, 1), "quarter")
@@ -0,0 +1,34 @@
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import WebSocketDisconnect
+from fastapi.testclient import TestClient
+
+import main
+from auth.auth import create_access_token
+from db.crud import enqueue_report_job
+from db.models import ReportJob, User
+from routes import report_routes
+
+
+@pytest.fixture
+def token(session):
+    email = f"{uuid.uuid4().hex[:8]}@example.com"
+    session.add(User(email=email, full_name="Watcher", is_verified=True))
+    session.commit()
+    return create_access_token({"sub": email})
+
+
+def test_watching_a_job_deleted_meanwhile_ends_with_a_failed_event(session, token, monkeypatch):
+    monkeypatch.setattr(report_routes, "PROGRESS_POLL_SECONDS", 0.05)
+    job = enqueue_report_job(session, f"test-{uuid.uuid4().hex[:8]}", "{}", datetime.now(timezone.utc))
+
+    with TestClient(main.app).websocket_connect(f"/api/report/jobs/{job.id}/events?token={token}") as websocket:
+        session.query(ReportJob).filter(ReportJob.id == job.id).delete()
+        session.commit()
+
+        event = websocket.receive_json()
+        assert (event["seq"], event["stage"], event["error"]) == (1, "failed", "Job no longer exists")
+        with pytest.raises(WebSocketDisconnect):
+            websocket.receive_json()
@@ -0,0 +1,99 @@
+from datetime import date
+
+import numpy as np
+import pytest
+
+from aqi.periods import generate_periods
+from aqi.rollup import roll_up
+
+RNG = np.random.default_rng(7)
+
+
+def daily_series(days):
+    weights = RNG.integers(0, 50, len(days)).astype(float)
+    sums = weights * RNG.uniform(1e-5, 1e-4, len(days))
+    return sums, weights, np.ones(len(days), dtype=bool)
+
+
+def direct_means(days, sums, weights, known, periods):
+    """ Aggregate each period straight from the days it contains. """
+    means = []
+    for period in periods:
+        inside = np.array([period.start <= day.start < period.end for day in days])
+        if not inside.any() or not known[inside].all() or weights[inside].sum() <= 0:
+            means.append(None)
+        else:
+            means.append(sums[inside].sum() / weights[inside].sum())
+    return means
+
+
+def assert_means(actual, expected):
+    assert [value is None for value in actual] == [value is None for value in expected]
+    assert [value for value in actual if value is not None] == pytest.approx(
+        [value for value in expected if value is not None], rel=1e-12
+    )
+
+
+@pytest.mark.parametrize("start, end, interval", [
+    ("2024-01-01", "2024-03-01", "week"),
+    ("2024-01-01", "2025-01-01", "month"),
+    ("2023-01-01", "2025-01-01", "year"),
+    ("2024-01-10", "2024-03-20", "week"),  # starts on a Wednesday
+    ("2024-01-15", "2024-06-15", "month"),
+    ("2024-01-31", "2024-05-31", "month"),  # month-end anchor
+])
+def test_roll_up_matches_direct_aggregation(start, end, interval):
+    periods = generate_periods(start, end, interval)
+    days = generate_periods(periods[0].start, periods[-1].end, "day")
+    sums, weights, known = daily_series(days)
+
+    assert_means(roll_up(days, sums, weights, known, periods), direct_means(days, sums, weights, known, periods))
+
+
+def test_days_without_observations_do_not_shift_period_boundaries():
+    periods = generate_periods("2024-01-01", "2024-04-01", "month")
+    days = generate_periods("2024-01-01", "2024-04-01", "day")
+    sums, weights, known = daily_series(days)
+    # No valid pixels at all in February, and none on the first days of March
+    for index, day in enumerate(days):
+        if day.start.month == 2 or day.start in (date(2024, 3, 1), date(2024, 3, 2)):
+            sums[index], weights[index] = 0.0, 0.0
+
+    means = roll_up(days, sums, weights, known, periods)
+
+    assert means[1] is None
+    assert_means(means, direct_means(days, sums, weights, known, periods))
+    march = slice(60, 91)
+    assert days[60].start == date(2024, 3, 1)
+    assert means[2] == pytest.approx(sums[march].sum() / weights[march].sum())
+
+
+def test_an_unknown_day_voids_only_its_own_period():
+    periods = generate_periods("2024-01-01", "2024-01-22", "week")
+    days = generate_periods("2024-01-01", "2024-01-22", "day")
+    sums, weights, known = daily_series(days)
+    weights[:] = np.maximum(weights, 1)
+    known[9] = False  # 2024-01-10, in the second week
+
+    means = roll_up(days, sums, weights, known, periods)
+
+    assert means[0] is not None and means[1] is None and means[2] is not None
+    assert_means(means, direct_means(days, sums, weights, known, periods))
+
+
+def test_request_ending_mid_period_rolls_up_the_days_it_has():
+    # The caller stops the day series at the request end, inside the last month
+    periods = generate_periods("2024-01-01", "2024-02-10", "month")
+    days = generate_periods("2024-01-01", "2024-02-10", "day")
+    sums, weights, known = daily_series(days)
+    weights[:] = np.maximum(weights, 1)
+
+    means = roll_up(days, sums, weights, known, periods)
+
+    assert len(means) == 2
+    assert means[1] == pytest.approx(sums[31:].sum() / weights[31:].sum())
+    assert_means(means, direct_means(days, sums, weights, known, periods))
+
+
+def test_no_periods():
+    assert roll_up([], np.zeros(0), np.zeros(0), np.zeros(0, dtype=bool), []) == []
@@ -0,0 +1,90 @@
+import os
+import zipfile
+
+import netCDF4
+import numpy as np
+import pytest
+
+from aqi.pollutants import POLLUTANTS
+from aqi.s5p_local import discover_granules, iter_pollutant_data_local
+
+# Two scanlines and a half-degree column inside the AOI, the rest outside
+LATITUDE = [[10.25, 10.25, 10.25, 10.25], [10.75, 10.75, 10.75, 10.75], [12.0, 12.0, 12.0, 12.0]]
+LONGITUDE = [[0.25, 0.75, 1.5, 2.0]] * 3
+AOI = {"type": "Polygon", "coordinates": [[[0, 10], [1, 10], [1, 11], [0, 11], [0, 10]]]}
+
+NO2 = next(pollutant for pollutant in POLLUTANTS if pollutant['name'] == 'NO2')
+CO = next(pollutant for pollutant in POLLUTANTS if pollutant['name'] == 'CO')
+
+
+def write_granule(path: str, variable: str, values, qa):
+    """ Minimal Sentinel-5P L2 layout: PRODUCT group with (time, scanline, ground_pixel) variables. """
+    with netCDF4.Dataset(path, "w") as dataset:
+        product = dataset.createGroup("PRODUCT")
+        product.createDimension("time", 1)
+        product.createDimension("scanline", 3)
+        product.createDimension("ground_pixel", 4)
+        dims = ("time", "scanline", "ground_pixel")
+        product.createVariable("latitude", "f4", dims)[:] = [LATITUDE]
+        product.createVariable("longitude", "f4", dims)[:] = [LONGITUDE]
+        product.createVariable("qa_value", "f4", dims)[:] = [qa]
+
+        *groups, name = variable.split("/")[1:]
+        node = product
+        for group in groups:
+            node = node.groups.get(group) or node.createGroup(group)
+        node.createVariable(name, "f8", dims, fill_value=9.96921e36)[:] = np.ma.masked_invalid([values])
+
+
+@pytest.fixture
+def product_dir(tmp_path):
+    qa = [[1.0, 1.0, 1.0, 1.0], [1.0, 0.5, 1.0, 1.0], [1.0, 1.0, 1.0, 1.0]]
+
+    # January NO2: inside the AOI 1 and 3 count; 4 fails NO2's qa threshold and the fill value is skipped
+    write_granule(
+        str(tmp_path / "S5P_OFFL_L2__NO2____20240105T010000_20240105T020000_32000_03_020600_20240107T000000.nc"),
+        NO2['l2']['variable'],
+        [[1.0, np.nan, 100.0, 100.0], [3.0, 4.0, 100.0, 100.0], [100.0, 100.0, 100.0, 100.0]], qa
+    )
+
+    # February CO, zipped like a sentinel_app download; qa 0.5 passes CO's threshold
+    member = "S5P_OFFL_L2__CO_____20240210T010000_20240210T020000_32500_03_020600_20240212T000000.nc"
+    write_granule(
+        str(tmp_path / member), CO['l2']['variable'],
+        [[2.0, 2.0, 100.0, 100.0], [2.0, 6.0, 100.0, 100.0], [100.0, 100.0, 100.0, 100.0]], qa
+    )
+    with zipfile.ZipFile(tmp_path / "product_1.zip", "w") as archive:
+        archive.write(tmp_path / member, arcname=member)
+    os.remove(tmp_path / member)
+
+    return str(tmp_path)
+
+
+def test_discovers_bare_and_zipped_granules(product_dir):
+    granules = discover_granules(product_dir)
+
+    assert [(granule.product, granule.member is not None) for granule in granules] == [
+        ("L2__NO2___", False), ("L2__CO____", True)
+    ]
+
+
+def test_means_quality_filtered_pixels_inside_the_aoi_per_period(product_dir):
+    records = list(iter_pollutant_data_local(AOI, "2024-01-01", "2024-03-01", "month", product_dir=product_dir))
+    values = {(record['pollutant'], record['period']): record['value'] for record in records}
+
+    assert len(records) == len(POLLUTANTS) * 2
+    assert values[("NO2", "2024-01")] == pytest.approx(2.0)
+    assert values[("NO2", "2024-02")] is None
+    assert values[("CO", "2024-01")] is None
+    assert values[("CO", "2024-02")] == pytest.approx(3.0)
+    # No L2 product for AOD, so no values
+    assert values[("AOD", "2024-01")] is None
+
+
+def test_records_carry_the_same_fields_as_earth_engine_records(product_dir):
+    records = list(iter_pollutant_data_local(AOI, "2024-01-01", "2024-02-01", "month", product_dir=product_dir))
+    scales = {record['pollutant']: record['scale'] for record in records}
+
+    assert all(set(record) == {"period", "pollutant", "value", "interval", "scale"} for record in records)
+    assert scales["NO2"] == NO2['native_scale']
+    assert scales["AOD"] is None
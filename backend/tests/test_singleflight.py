@@ -0,0 +1,120 @@
+import threading
+import time
+import uuid
+
+import pytest
+
+from aqi import progress
+from aqi.progress import JobProgress
+from aqi.singleflight import SingleFlight, request_key
+
+CALLERS = 8
+
+
+class Call:
+    """ A function that blocks until released, counting how often it actually runs. """
+
+    def __init__(self, result=None, error=None):
+        self.result = result
+        self.error = error
+        self.runs = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, value):
+        self.runs += 1
+        self.started.set()
+        progress.emit("computing", value=value)
+        assert self.release.wait(10)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+def wait_until(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def run_concurrently(flight: SingleFlight, key: str, call: Call):
+    """ One leader, then CALLERS - 1 followers joining while it is in flight; returns each caller's outcome and job. """
+    outcomes, jobs = [None] * CALLERS, [JobProgress(str(uuid.uuid4()), "test-worker") for _ in range(CALLERS)]
+
+    def caller(index):
+        with progress.track(jobs[index]):
+            try:
+                outcomes[index] = ("result", flight.do(key, call, 42))
+            except Exception as e:
+                outcomes[index] = ("error", e)
+
+    threads = [threading.Thread(target=caller, args=(index,)) for index in range(CALLERS)]
+    threads[0].start()
+    assert call.started.wait(10)
+    for thread in threads[1:]:
+        thread.start()
+    # Followers register under the flight's lock, so all of them have joined once they are listed
+    wait_until(lambda: len(flight.calls[key].followers) == CALLERS - 1)
+    call.release.set()
+    for thread in threads:
+        thread.join(10)
+    return outcomes, jobs
+
+
+def test_concurrent_calls_share_one_execution_and_its_progress():
+    flight = SingleFlight("test")
+    call = Call(result={"value": 1})
+
+    outcomes, jobs = run_concurrently(flight, "same", call)
+
+    assert call.runs == 1
+    assert outcomes == [("result", {"value": 1})] * CALLERS
+    assert all(outcome[1] is outcomes[0][1] for outcome in outcomes)
+    # The leader's progress during the call reaches every follower's job
+    for job in jobs:
+        assert [(event["stage"], event["value"]) for event in job.events] == [("computing", 42)]
+
+
+def test_an_exception_reaches_every_waiter():
+    flight = SingleFlight("test")
+    error = RuntimeError("Earth Engine quota exceeded")
+    call = Call(error=error)
+
+    outcomes, _ = run_concurrently(flight, "same", call)
+
+    assert call.runs == 1
+    assert outcomes == [("error", error)] * CALLERS
+
+
+@pytest.mark.parametrize("error", [None, RuntimeError("failed")])
+def test_the_key_is_released_once_the_call_lands(error):
+    flight = SingleFlight("test")
+    call = Call(result=1, error=error)
+    run_concurrently(flight, "same", call)
+
+    assert flight.in_flight() == 0
+    again = Call(result=2)
+    again.release.set()
+    assert flight.do("same", again, 0) == 2
+    assert again.runs == 1
+
+
+def test_different_keys_run_separately():
+    flight = SingleFlight("test")
+    first, second = Call(result=1), Call(result=2)
+    first.release.set()
+    second.release.set()
+
+    assert (flight.do("a", first, 0), flight.do("b", second, 0)) == (1, 2)
+    assert (first.runs, second.runs) == (1, 1)
+
+
+def test_request_key_ignores_aoi_vertex_order_and_closing_point():
+    ring = [[77.0, 28.0], [77.1, 28.0], [77.1, 28.1], [77.0, 28.1], [77.0, 28.0]]
+    rotated = [[77.1, 28.1], [77.0, 28.1], [77.0, 28.0], [77.1, 28.0]]
+
+    assert request_key(aoi={"type": "Polygon", "coordinates": [ring]}, interval="month") == \
+        request_key(interval="month", aoi={"type": "Polygon", "coordinates": [rotated]})
+    assert request_key(aoi={"type": "Polygon", "coordinates": [ring]}, interval="month") != \
+        request_key(aoi={"type": "Polygon", "coordinates": [ring]}, interval="week")
@@ -0,0 +1,134 @@
+import numpy as np
+import pytest
+
+from aqi import gee_service
+from aqi.geometry import polygon_area_m2
+from aqi.periods import generate_periods
+from aqi.pixel_plan import ReducePlan
+from aqi.pollutants import POLLUTANTS
+from aqi.tiling import clip_ring, ring_bounds, split_aoi, tile_bounds
+
+SQUARE = {"type": "Polygon", "coordinates": [[[0, 0], [4, 0], [4, 4], [0, 4], [0, 0]]]}
+# Concave: a U open to the north, its notch covering x 1-2, y 1-3
+U_SHAPE = {"type": "Polygon", "coordinates": [[[0, 0], [3, 0], [3, 3], [2, 3], [2, 1], [1, 1], [1, 3], [0, 3], [0, 0]]]}
+HOLED = {"type": "Polygon", "coordinates": [
+    [[0, 0], [4, 0], [4, 4], [0, 4], [0, 0]],
+    [[1, 1], [3, 1], [3, 3], [1, 3], [1, 1]],
+]}
+TRIANGLE = {"type": "Polygon", "coordinates": [[[0, 0], [4, 0], [0, 4], [0, 0]]]}
+
+
+def planar_area(ring):
+    return abs(sum(x1 * y2 - x2 * y1 for (x1, y1), (x2, y2) in zip(ring, ring[1:]))) / 2
+
+
+def polygon_planar_area(polygon):
+    # Clipping is planar in lon/lat, so this is what it conserves exactly
+    outer, *holes = polygon['coordinates']
+    return planar_area(outer) - sum(planar_area(hole) for hole in holes)
+
+
+def test_tile_bounds_cover_the_box_without_overlap():
+    cells = tile_bounds((0, 0, 4, 2), 8)
+
+    assert len(cells) >= 8
+    assert sum((east - west) * (north - south) for west, south, east, north in cells) == pytest.approx(8)
+    # Roughly square cells on a 2:1 box
+    assert {round((east - west) / (north - south), 6) for west, south, east, north in cells} == {1.0}
+
+
+@pytest.mark.parametrize("aoi", [SQUARE, U_SHAPE, HOLED, TRIANGLE], ids=["square", "concave", "holed", "triangle"])
+@pytest.mark.parametrize("tiles", [2, 4, 9, 16])
+def test_split_conserves_area(aoi, tiles):
+    parts = split_aoi(aoi, tiles)
+
+    assert 1 <= len(parts) <= len(tile_bounds(ring_bounds(aoi['coordinates'][0]), tiles))
+    assert sum(polygon_planar_area(part) for part in parts) == pytest.approx(polygon_planar_area(aoi))
+    assert all(polygon_area_m2(part) > 0 for part in parts)
+
+
+def test_clip_keeps_the_part_of_a_concave_ring_inside_the_cell():
+    # The cell spans both arms of the U and the notch between them
+    clipped = clip_ring(U_SHAPE['coordinates'][0], (0.5, 0.5, 2.5, 2.5))
+
+    assert clipped[0] == clipped[-1]
+    assert planar_area(clipped) == pytest.approx(4 - 1.5)
+    assert all(0.5 <= lon <= 2.5 and 0.5 <= lat <= 2.5 for lon, lat in clipped)
+
+
+def test_cells_inside_a_notch_or_off_the_polygon_are_dropped():
+    # 3x3 unit cells: two fall in the U's notch
+    assert len(split_aoi(U_SHAPE, 9)) == 7
+    # 4x4 unit cells: the six beyond the triangle's hypotenuse miss it
+    assert len(split_aoi(TRIANGLE, 16)) == 10
+    assert clip_ring(SQUARE['coordinates'][0], (5, 5, 6, 6)) == []
+
+
+def test_holes_are_clipped_into_the_cells_they_cross():
+    parts = split_aoi(HOLED, 4)
+
+    assert len(parts) == 4
+    for part in parts:
+        outer, *holes = part['coordinates']
+        assert planar_area(outer) == pytest.approx(4)
+        assert [planar_area(hole) for hole in holes] == [pytest.approx(1)]
+
+
+# ------------------ Tiled partial sums ------------------
+
+# Synthetic pixel grid with centres off every tile edge, so each pixel lands in exactly one tile
+LONS, LATS = np.meshgrid(np.arange(0.05, 4, 0.1), np.arange(0.05, 4, 0.1))
+VALUES = np.sin(LONS) * 10 + LATS ** 2
+
+
+def inside_ring(ring, lons, lats):
+    """ Even-odd ray casting for every pixel centre. """
+    inside = np.zeros(lons.shape, dtype=bool)
+    for (x1, y1), (x2, y2) in zip(ring, ring[1:]):
+        crosses = (y1 > lats) != (y2 > lats)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            edge_lon = x1 + (lats - y1) * (x2 - x1) / (y2 - y1)
+        inside ^= crosses & (lons < edge_lon)
+    return inside
+
+
+def fake_partial_sums(pollutant, aoi, start_date, end_date, date_ranges, plan):
+    outer, *holes = aoi['coordinates']
+    mask = inside_ring(outer, LONS, LATS)
+    for hole in holes:
+        mask &= ~inside_ring(hole, LONS, LATS)
+    # Each period scales the field differently; pixels weighted by their latitude like an area weight would
+    weights = np.cos(np.radians(LATS))
+    return {
+        period.label: (float((VALUES * (index + 1) * weights)[mask].sum()), float(weights[mask].sum()))
+        for index, period in enumerate(date_ranges)
+    }
+
+
+@pytest.mark.parametrize("aoi", [U_SHAPE, HOLED, TRIANGLE], ids=["concave", "holed", "triangle"])
+def test_merged_tile_sums_reproduce_the_untiled_mean(aoi, monkeypatch):
+    monkeypatch.setattr(gee_service, "reduce_partial_sums", fake_partial_sums)
+    periods = generate_periods("2024-01-01", "2024-04-01", "month")
+    plan = ReducePlan(scale=1000, tile_scale=1, best_effort=True, max_pixels=1e9, estimated_pixels=0)
+
+    untiled = gee_service.fetch_partial_sums(POLLUTANTS[0], aoi, None, None, periods, plan, tiles=1)
+    tiled = gee_service.fetch_partial_sums(POLLUTANTS[0], aoi, None, None, periods, plan, tiles=9)
+
+    assert set(tiled) == {period.label for period in periods}
+    for label, partial_sum in untiled.items():
+        assert tiled[label] == pytest.approx(partial_sum)
+        assert gee_service.partial_mean(tiled[label]) == pytest.approx(gee_service.partial_mean(partial_sum))
+
+
+def test_a_failed_tile_fails_the_whole_reduction(monkeypatch):
+    def flaky(pollutant, aoi, *args):
+        if ring_bounds(aoi['coordinates'][0])[0] > 0:
+            raise RuntimeError("Computation timed out.")
+        return fake_partial_sums(pollutant, aoi, *args)
+
+    monkeypatch.setattr(gee_service, "reduce_partial_sums", flaky)
+    periods = generate_periods("2024-01-01", "2024-02-01", "month")
+    plan = ReducePlan(scale=1000, tile_scale=1, best_effort=True, max_pixels=1e9, estimated_pixels=0)
+
+    with pytest.raises(RuntimeError, match="tile .* failed"):
+        gee_service.fetch_partial_sums(POLLUTANTS[0], SQUARE, None, None, periods, plan, tiles=4)
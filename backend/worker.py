@@ -0,0 +1,82 @@
+"""
+Report job worker: claims queued report jobs from the database and runs them.
+Start as many as needed, on any host that shares the database; each process runs `--concurrency` jobs at once.
+Workers and the API must share ARTIFACT_SIGNING_KEY (or ROOT_SECRET_KEY) and ARTIFACT_DIR: workers render the
+PDFs and sign their download links, the API verifies the links and serves the files.
+
+    python worker.py [--processes 2] [--concurrency 2] [--kinds report,batch_report,results]
+"""
+import argparse
+import multiprocessing
+import signal
+import sys
+import threading
+from typing import List, Optional
+
+from config import ARTIFACT_SIGNING_KEY, JOB_WORKER_CONCURRENCY
+
+
+def run_worker(concurrency: int, kinds: Optional[List[str]]):
+    from aqi import job_queue
+    # Registers the report job handlers
+    import routes.report_routes  # noqa: F401
+
+    worker = job_queue.Worker(concurrency=concurrency, kinds=kinds)
+    stopped = threading.Event()
+
+    def shutdown(signum, frame):
+        print(f"🛑 Worker {worker.worker_id} stopping, finishing running jobs")
+        stopped.set()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    worker.start()
+    stopped.wait()
+    worker.stop()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", type=int, default=1, help="worker processes to start (default: 1)")
+    parser.add_argument("--concurrency", type=int, default=JOB_WORKER_CONCURRENCY,
+                        help="jobs run at once by each process (default: $JOB_WORKER_CONCURRENCY or 2)")
+    parser.add_argument("--kinds", help="comma-separated job kinds to run (default: all)")
+    args = parser.parse_args()
+    kinds = args.kinds.split(",") if args.kinds else None
+    if not ARTIFACT_SIGNING_KEY:
+        parser.error("ARTIFACT_SIGNING_KEY or ROOT_SECRET_KEY must be set to the API's value, "
+                     "or the download links emailed by this worker will be rejected")
+
+    # Create the tables once, before the workers race to do it
+    import db.models
+    from db.database import engine
+    db.models.Base.metadata.create_all(bind=engine)
+
+    if args.processes <= 1:
+        run_worker(args.concurrency, kinds)
+        return 0
+
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(target=run_worker, args=(args.concurrency, kinds), name=f"report-worker-{index}")
+        for index in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+
+    # Forward shutdown to the children, which finish their running jobs before exiting
+    def shutdown(signum, frame):
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl+C already reaches every process in the group
+    for process in processes:
+        process.join()
+    return max((process.exitcode or 0) for process in processes)
+
+
+if __name__ == "__main__":
+    sys.exit(main())